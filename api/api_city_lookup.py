@@ -1,7 +1,14 @@
-"""Api_city_lookup.py contains two functions who return the longitude and latitude of the provided city name."""
+"""Api_city_lookup.py contains two functions who return the longitude and latitude of the provided city name.
+Additionally it holds offline coordinates of all tier cities, which are used where no live lookup is needed (e.g. seed data),
+and get_coords_batch() which geocodes many names at once (e.g. trip imports)."""
 
+import time
 import requests
 from typing import Optional, Tuple, Dict, Any
+from tracing import span
+from settings import get_settings
+
+from ml.tiers import normalize_city, CITY_ALIASES
 
 # Nominatim (OpenStreetMap) endpoint
 NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
@@ -11,6 +18,50 @@ HEADERS = {
     "User-Agent": "HorizonTravelApp/1.0 (schirin.salih@student.unisg.ch)"
 }
 
+# Offline coordinates (lat, lon) of all cities in the tier lists of ml/tiers.py
+OFFLINE_CITY_COORDS: Dict[str, Tuple[float, float]] = {
+    # Tier 1
+    "Zurich": (47.3769, 8.5417), "Geneva": (46.2044, 6.1432), "Basel": (47.5596, 7.5886),
+    "Lausanne": (46.5197, 6.6323), "Zermatt": (46.0207, 7.7491), "St. Moritz": (46.4908, 9.8355),
+    "Davos": (46.8027, 9.8360), "Klosters": (46.8690, 9.8810), "Verbier": (46.0960, 7.2286),
+    "Gstaad": (46.4750, 7.2861), "Andermatt": (46.6356, 8.5939), "Grindelwald": (46.6242, 8.0414),
+    "Wengen": (46.6083, 7.9222), "Mürren": (46.5590, 7.8924), "Saas-Fee": (46.1080, 7.9276),
+    "Arosa": (46.7784, 9.6790), "Lenzerheide": (46.7282, 9.5580), "Flims": (46.8352, 9.2840),
+    "Laax": (46.8070, 9.2580), "Engelberg": (46.8196, 8.4036), "Crans-Montana": (46.3117, 7.4793),
+    "Montreux": (46.4312, 6.9107), "Lucerne": (47.0502, 8.3093), "Ascona": (46.1540, 8.7727),
+    "Zug": (47.1662, 8.5155),
+    # Tier 2
+    "Bern": (46.9480, 7.4474), "Winterthur": (47.4988, 8.7237), "St. Gallen": (47.4245, 9.3767),
+    "Biel": (47.1368, 7.2468), "Schaffhausen": (47.6973, 8.6349), "Chur": (46.8508, 9.5320),
+    "Thun": (46.7580, 7.6280), "Neuchâtel": (46.9900, 6.9293), "Fribourg": (46.8065, 7.1620),
+    "Sion": (46.2331, 7.3606), "Brig": (46.3160, 7.9870), "Bellinzona": (46.1955, 9.0238),
+    "Interlaken": (46.6863, 7.8632), "Kloten": (47.4515, 8.5849), "Lugano": (46.0037, 8.9511),
+    "Locarno": (46.1709, 8.7995),
+    # Tier 3
+    "Solothurn": (47.2088, 7.5323), "Olten": (47.3499, 7.9033), "Rapperswil": (47.2267, 8.8184),
+    "Uster": (47.3470, 8.7205), "Baden": (47.4724, 8.3064), "Wil": (47.4615, 9.0455),
+    "Arbon": (47.5167, 9.4333), "Romanshorn": (47.5658, 9.3790), "Spiez": (46.6864, 7.6801),
+    "Steffisburg": (46.7780, 7.6330), "Villars-sur-Glâne": (46.7906, 7.1192), "Pfäffikon": (47.2010, 8.7780),
+    "Wetzikon": (47.3260, 8.7980),
+}
+
+_OFFLINE_INDEX = {normalize_city(city): coords for city, coords in OFFLINE_CITY_COORDS.items()}
+for _alias, _city in CITY_ALIASES.items():
+    _OFFLINE_INDEX[normalize_city(_alias)] = OFFLINE_CITY_COORDS[_city]
+
+
+def get_offline_coords(city_name: str) -> Optional[Tuple[float, float]]:
+    """
+    Returns (lat, lon) of a city from the offline table without any network request.
+
+    Args:
+        city_name: Name of the city in any spelling known to ml/tiers.py, e.g. "Zürich" or "Zurich".
+
+    Returns:
+        (latitude, longitude) as floats, or None if the city is not in the offline table.
+    """
+    return _OFFLINE_INDEX.get(normalize_city(city_name))
+
 
 def search_city(city_name: str, country: str = "Switzerland") -> Optional[Dict[str, Any]]:
     """
@@ -33,12 +84,13 @@ def search_city(city_name: str, country: str = "Switzerland") -> Optional[Dict[s
         "addressdetails": 1,
     }
 
-    resp = requests.get(
-        NOMINATIM_URL,
-        params=params,
-        headers=HEADERS,
-        timeout=10,
-    )
+    with span("http", "Nominatim search", city=city_name):
+        resp = requests.get(
+            NOMINATIM_URL,
+            params=params,
+            headers=HEADERS,
+            timeout=get_settings().http_timeout_s,
+        )
     resp.raise_for_status()
     results = resp.json()
 
@@ -66,3 +118,41 @@ def get_city_coords(city_name: str, country: str = "Switzerland") -> Optional[Tu
     lat = float(result["lat"])
     lon = float(result["lon"])
     return lat, lon
+
+
+# Nominatim allows at most one request per second
+NOMINATIM_MIN_INTERVAL_S = get_settings().nominatim_min_interval_s
+
+
+def get_coords_batch(city_names, country: str = "Switzerland") -> Dict[str, Optional[Tuple[float, float]]]:
+    """
+    Geocodes many city names at once, e.g. for an import: every distinct name is looked up only once,
+    first in the offline table and only if it is not there with Nominatim (respecting its rate limit).
+
+    Args:
+        city_names: Iterable of city names, duplicates are allowed.
+        country: Optional country filter for Nominatim, default "Switzerland".
+
+    Returns:
+        dict mapping each distinct name to (latitude, longitude), or None if it was not found or the lookup failed.
+    """
+    coords: Dict[str, Optional[Tuple[float, float]]] = {}
+    online = []
+    for name in dict.fromkeys(city_names):
+        offline = get_offline_coords(name)
+        if offline is not None:
+            coords[name] = offline
+        else:
+            online.append(name)
+
+    last_request = 0.0
+    for name in online:
+        wait = NOMINATIM_MIN_INTERVAL_S - (time.monotonic() - last_request)
+        if wait > 0:
+            time.sleep(wait)
+        last_request = time.monotonic()
+        try:
+            coords[name] = get_city_coords(name, country=country)
+        except requests.RequestException:
+            coords[name] = None
+    return coords
@@ -1,32 +1,16 @@
 import pyodbc
 import streamlit as st
 import requests
+from db.query_log import logged_connect
+from tracing import span, traced
 from pathlib import Path
 from datetime import date
-from sqlalchemy import create_engine
-
-# The engine serves as a central gateway to the database (MS Azure SQL). 
-# It manages the connections and translates Python commands into the appropriate SQL dialect.
-# pandas requires this!
-DATABASE_URI = st.secrets["azure_db"]["ENGINE"]
-engine = create_engine(DATABASE_URI)
-
-# Fetching for all information in the st.secrets and defining the connection string for the normal connection where pandas is not involved
-SERVER_NAME = st.secrets["azure_db"]["SERVER_NAME"]
-DATABASE_NAME = st.secrets["azure_db"]["DATABASE_NAME"]
-USERNAME = st.secrets["azure_db"]["USERNAME"]
-PASSWORD = st.secrets["azure_db"]["PASSWORD"]
-
-CONNECTION_STRING = (
-    'DRIVER={ODBC Driver 17 for SQL Server};'
-    f'SERVER={SERVER_NAME};'
-    f'DATABASE={DATABASE_NAME};'
-    f'UID={USERNAME};'
-    f'PWD={PASSWORD};'
-    'Encrypt=yes;'  
-    'TrustServerCertificate=no;'
-)
+from settings import get_settings
 
+# connection string for the normal connection where pandas is not involved
+CONNECTION_STRING = get_settings().db.connection_string
+
+@traced("db", "connect")
 def connect():
     """Connects to Azure SQL-database.
     
@@ -37,7 +21,7 @@ def connect():
         None
     """
     try:
-        conn = pyodbc.connect(CONNECTION_STRING)
+        conn = logged_connect(CONNECTION_STRING)
         return conn
     except pyodbc.Error as ex:
         sqlstate = ex.args[0]
@@ -81,7 +65,7 @@ def get_upcoming_trips_for_user():
 
 # --- Fetch news from Mediastack API ---
 def fetch_news_for_city(destination: str):
-    API_KEY = "ad63614ff90fc6ae7308e5cb4c0796d0"
+    API_KEY = get_settings().mediastack_api_key
 
     url = "http://api.mediastack.com/v1/news"
     params = {
@@ -94,7 +78,8 @@ def fetch_news_for_city(destination: str):
     }
 
     try:
-        resp = requests.get(url, params=params)
+        with span("http", "Mediastack news", city=destination):
+            resp = requests.get(url, params=params, timeout=get_settings().http_timeout_s)
         data = resp.json()
 
         # falls nichts zurückkommt
@@ -115,7 +100,11 @@ def fetch_news_for_city(destination: str):
 
 # --- MAIN WIDGET: Works exactly like the weather widget ---
 def news_widget(destination: str):
-    """Zeigt News zu einem Reiseziel an."""
+    """Zeigt News zu einem Reiseziel an, nur wenn MEDIASTACK_API_KEY gesetzt ist."""
+
+    # without an API key there are no news, the widget is skipped
+    if not get_settings().mediastack_api_key:
+        return
 
     if not destination:
         st.info("Bitte gib eine Stadt ein, zu der News gesucht werden sollen.")
@@ -1,44 +1,107 @@
 # api/api_transportation.py
 
+import threading
+import time
 import streamlit as st
-import googlemaps
 from datetime import datetime, timedelta
-import polyline
 import requests
-import folium
-from streamlit_folium import st_folium
+from tracing import span
+from settings import get_settings
 import pandas as pd
 
+# googlemaps, folium, streamlit_folium and polyline are imported in the functions that use them:
+# folium and streamlit_folium alone take about a second to import, which would slow down every dashboard.
+
 # global client, initialized on None to prevent ImportError
 gmaps = None
 
-# helper functions
-def get_route(origin: str, destination: str, mode: str = "driving"):
+# Directions results per (origin, destination, mode), shared by all sessions of the process: the comparison of the
+# manager, the maps of the employees and the carpool proposals (db/carpool.py) ask for the same city pairs again
+DIRECTIONS_CACHE_TTL_S = get_settings().directions_cache_ttl_s
+DIRECTIONS_CACHE_MAX_ENTRIES = 1024
+_directions_cache = {}
+_directions_lock = threading.Lock()
+
+
+def get_client():
     """
-    Fetch a single route (first alternative) from Google Directions API.
-    
+    Returns the Google Maps client. If transportation_managerview did not create it yet, it is created
+    with GOOGLE_API_KEY of the settings.
+
+    Returns:
+        googlemaps.Client or None if there is no API key.
+    """
+    global gmaps
+
+    if gmaps is None:
+        key = get_settings().google_api_key.strip()
+        if not key:
+            return None
+        import googlemaps
+        gmaps = googlemaps.Client(key=key)
+    return gmaps
+
+
+def cached_directions(origin: str, destination: str, mode: str = "driving") -> list:
+    """
+    Fetch the routes between two places from Google Directions API, or from the cache if the same
+    route was requested less than DIRECTIONS_CACHE_TTL_S seconds ago.
+
     Args:
         origin (str): The origin of the trip
         destination (str): The destination of the trip
         mode (str): The travel method (car (driving) or public transport (transit))
-        
-    Returns:
-        directions (dict): First trip details of the api.
-    """
-    global gmaps
 
-    if gmaps is None: # gmaps should be initialized via transportation_managerview
-        st.error("Google Maps client is not initialised. Call transportation_managerview first.")
-        return None
+    Returns:
+        list: The routes as returned by googlemaps.Client.directions(), empty if there is none.
 
-    try:
-        directions = gmaps.directions(
+    Raises:
+        RuntimeError: If there is no API key.
+        googlemaps.exceptions.ApiError and friends: If the request fails, nothing is cached then.
+    """
+    cache_key = (origin.strip().casefold(), destination.strip().casefold(), mode)
+    with _directions_lock:
+        entry = _directions_cache.get(cache_key)
+    if entry is not None and time.monotonic() - entry[1] < DIRECTIONS_CACHE_TTL_S:
+        with span("http", f"Google Directions {mode}", cache="hit"):
+            return entry[0]
+
+    client = get_client()
+    if client is None:
+        raise RuntimeError("Google Maps API key missing.")
+    with span("http", f"Google Directions {mode}", cache="miss"):
+        directions = client.directions(
             origin,
             destination,
             mode=mode,
             departure_time="now",
             language="en",
         )
+
+    with _directions_lock:
+        if len(_directions_cache) >= DIRECTIONS_CACHE_MAX_ENTRIES:
+            # drop the oldest entry (dicts keep insertion order)
+            _directions_cache.pop(next(iter(_directions_cache)))
+        _directions_cache.pop(cache_key, None)
+        _directions_cache[cache_key] = (directions, time.monotonic())
+    return directions
+
+
+# helper functions
+def get_route(origin: str, destination: str, mode: str = "driving"):
+    """
+    Fetch a single route (first alternative) from Google Directions API (cached, see cached_directions()).
+    
+    Args:
+        origin (str): The origin of the trip
+        destination (str): The destination of the trip
+        mode (str): The travel method (car (driving) or public transport (transit))
+        
+    Returns:
+        directions (dict): First trip details of the api.
+    """
+    try:
+        directions = cached_directions(origin, destination, mode)
         if not directions:
             return None
         return directions[0]
@@ -123,7 +186,8 @@ def get_ticket_price_opendata(
     }
 
     try:
-        r = requests.get(url, params=params, timeout=8)
+        with span("http", "SBB opendata connections"):
+            r = requests.get(url, params=params, timeout=8)
         r.raise_for_status()
         data = r.json()
 
@@ -212,6 +276,9 @@ def create_map(route: dict, origin: str, destination: str):
     if not route:
         return None
 
+    import folium
+    import polyline
+
     leg0 = route["legs"][0]
     start_coords = [
         leg0["start_location"]["lat"],
@@ -280,7 +347,7 @@ def transportation_managerview(origin: str, destination: str, api_key: str | Non
     key = (api_key or "").strip()
     if not key:
         # st.secrets is called here
-        key = st.session_state.get("GOOGLE_API_KEY", st.secrets.get("GOOGLE_API_KEY", "")).strip()
+        key = st.session_state.get("GOOGLE_API_KEY", get_settings().google_api_key).strip()
 
     if not key:
         st.warning("Please provide a Google Maps API Key to calculate routes.")
@@ -290,6 +357,7 @@ def transportation_managerview(origin: str, destination: str, api_key: str | Non
     if gmaps is None:
         try:
             # important: use the local key
+            import googlemaps
             gmaps = googlemaps.Client(key=key) 
         except Exception as e:
             st.error(f"Could not initialise Google Maps client: {e}")
@@ -370,6 +438,10 @@ def show_transportation_details(method_transport, origin, destination, start_dat
     Returns:
         details of chosen transport method as visualization but no argument is returned
     """
+    import folium
+    import polyline
+    from streamlit_folium import st_folium
+
         # ---- Styling für DataFrame kleiner & kompakter ----
     st.markdown("""
         <style>
@@ -399,28 +471,14 @@ def show_transportation_details(method_transport, origin, destination, start_dat
         # instead of requesting the url we try to use the client gmaps if it exists
         # if transportation_managerview already got called the client will be initialized otherwise we call the key here and initialize the client a second time
         
-        key = st.secrets.get("GOOGLE_API_KEY", "")
+        key = get_settings().google_api_key
         if not key:
             st.warning("Cannot show map: API Key missing.")
             return
 
-        # ensuring that gmaps is initialized
-        global gmaps
-        if gmaps is None:
-            try:
-                gmaps = googlemaps.Client(key=key)
-            except Exception as e:
-                st.error(f"Could not initialise Google Maps client for map: {e}")
-                return
-        
-        # calling dates via client
+        # calling dates via client, the route is cached for all employees of the trip
         try:
-            directions = gmaps.directions(
-                origin,
-                destination,
-                mode="driving",
-                language="en",
-            )
+            directions = cached_directions(origin, destination, mode="driving")
         except Exception as e:
             st.warning(f"Could not retrieve driving route via Google Maps client: {e}")
             return
@@ -485,7 +543,8 @@ def show_transportation_details(method_transport, origin, destination, start_dat
         }
 
         try:
-            r = requests.get(sbb_url, params=params, timeout=10)
+            with span("http", "SBB opendata connections"):
+                r = requests.get(sbb_url, params=params, timeout=10)
             r.raise_for_status()
             sbb_data = r.json()
             connections = sbb_data.get("connections", [])
@@ -548,21 +607,16 @@ def show_transportation_details(method_transport, origin, destination, start_dat
         
         # right column folium map
         with col2:
-            key = st.secrets.get("GOOGLE_API_KEY", "")
+            key = get_settings().google_api_key
             if not key:
                 st.warning("Cannot show map: API Key missing.")
                 return
 
-            g_url = "https://maps.googleapis.com/maps/api/directions/json"
-            g_params = {
-                "origin": origin,
-                "destination": destination,
-                "mode": "transit",
-                "key": key, # using lokal key
-            }
-
-            g_resp = requests.get(g_url, params=g_params)
-            g_data = g_resp.json()
+            try:
+                routes = cached_directions(origin, destination, mode="transit")
+            except Exception:
+                routes = []
+            g_data = {"status": "OK" if routes else "ZERO_RESULTS", "routes": routes} # shape of the REST response
 
             if g_data.get("status") == "OK":
                 leg = g_data["routes"][0]["legs"][0]
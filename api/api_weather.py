@@ -6,6 +6,7 @@ import requests
 import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
+from tracing import span
 
 GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
 FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
@@ -25,7 +26,8 @@ def robust_get(url, params=None, retries=3, timeout=20):
         r as json script of the request"""
     for attempt in range(retries):
         try:
-            r = requests.get(url, params=params, timeout=timeout)
+            with span("http", f"Open-Meteo {url.rsplit('/', 1)[-1]}", attempt=attempt + 1):
+                r = requests.get(url, params=params, timeout=timeout)
             r.raise_for_status()
             return r.json()
         except requests.exceptions.Timeout:
@@ -0,0 +1,239 @@
+"""fake_services.py contains local stand-ins for the external services of the app, so benchmarks and load tests
+neither depend on the internet nor use up API quotas:
+
+- Nominatim (nominatim.openstreetmap.org)
+- Open-Meteo geocoding and forecast (geocoding-api.open-meteo.com, api.open-meteo.com)
+- Google Directions (maps.googleapis.com, requests and the googlemaps client)
+- SBB opendata (transport.opendata.ch)
+- Mediastack (api.mediastack.com)
+
+FakeServices runs a small threaded HTTP server on 127.0.0.1 that answers with plausible fixed data after an
+injectable latency per service and counts the calls. redirect_requests() sends all requests of the process to
+these hosts to the local server instead (other hosts are not touched). The app code is not changed.
+
+    with FakeServices(latency_ms={"google": 150}) as fakes, redirect_requests(fakes):
+        ...
+        print(fakes.counts())
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+# host of the real service -> name of the fake
+SERVICE_HOSTS = {
+    "nominatim.openstreetmap.org": "nominatim",
+    "geocoding-api.open-meteo.com": "open-meteo",
+    "api.open-meteo.com": "open-meteo",
+    "maps.googleapis.com": "google",
+    "transport.opendata.ch": "sbb",
+    "api.mediastack.com": "mediastack",
+}
+
+DEFAULT_LATENCY_MS = {
+    "nominatim": 300,
+    "open-meteo": 150,
+    "google": 200,
+    "sbb": 250,
+    "mediastack": 300,
+}
+
+# a few points in Switzerland, the fakes answer with one of them depending on the name
+_PLACES = [(47.3769, 8.5417), (46.2044, 6.1432), (46.9480, 7.4474), (47.5596, 7.5886), (46.0037, 8.9511)]
+# encoded polyline between Zurich and Bern
+_POLYLINE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def _place(name: str):
+    return _PLACES[sum(map(ord, name or "")) % len(_PLACES)]
+
+
+def _nominatim(path: str, query: dict):
+    name = query.get("q", [""])[0].split(",")[0]
+    lat, lon = _place(name)
+    return [{"lat": str(lat), "lon": str(lon), "display_name": f"{name}, Schweiz", "address": {"country_code": "ch"}}]
+
+
+def _open_meteo(path: str, query: dict):
+    if path.endswith("/search"):
+        name = query.get("name", [""])[0]
+        lat, lon = _place(name)
+        return {"results": [{"name": name, "admin1": "Zürich", "country_code": "CH", "latitude": lat, "longitude": lon}]}
+    start = datetime.now().replace(minute=0, second=0, microsecond=0)
+    hours = [start + timedelta(hours=h) for h in range(7 * 24)]
+    return {
+        "current_weather": {"temperature": 12.0, "weathercode": 1, "windspeed": 8.0},
+        "hourly": {
+            "time": [h.strftime("%Y-%m-%dT%H:%M") for h in hours],
+            "temperature_2m": [8 + 6 * ((h.hour - 4) % 24 < 12) for h in hours],
+            "precipitation_probability": [(h.hour * 7) % 100 for h in hours],
+        },
+    }
+
+
+def _google(path: str, query: dict):
+    origin = query.get("origin", [""])[0]
+    destination = query.get("destination", [""])[0]
+    (lat1, lng1), (lat2, lng2) = _place(origin), _place(destination)
+    departure = datetime.now().replace(second=0, microsecond=0)
+    step = {
+        "travel_mode": "TRANSIT",
+        "transit_details": {
+            "departure_stop": {"name": f"{origin} HB"},
+            "arrival_stop": {"name": f"{destination} HB"},
+            "departure_time": {"text": departure.strftime("%H:%M")},
+            "arrival_time": {"text": (departure + timedelta(minutes=75)).strftime("%H:%M")},
+            "line": {"short_name": "IC1"},
+        },
+    }
+    return {
+        "status": "OK",
+        "routes": [{
+            "legs": [{
+                "distance": {"value": 120_000, "text": "120 km"},
+                "duration": {"value": 4_500, "text": "1 hour 15 mins"},
+                "start_location": {"lat": lat1, "lng": lng1},
+                "end_location": {"lat": lat2, "lng": lng2},
+                "steps": [step],
+            }],
+            "overview_polyline": {"points": _POLYLINE},
+        }],
+    }
+
+
+def _sbb(path: str, query: dict):
+    origin = query.get("from", [""])[0]
+    destination = query.get("to", [""])[0]
+    date = query.get("date", [datetime.now().strftime("%Y-%m-%d")])[0]
+    time_ = query.get("time", ["08:00"])[0]
+    departure = datetime.strptime(f"{date} {time_}", "%Y-%m-%d %H:%M")
+    connections = []
+    for i in range(int(query.get("limit", ["3"])[0])):
+        dep = departure + timedelta(minutes=30 * i)
+        connections.append({
+            "from": {"station": {"name": origin}, "departure": dep.strftime("%Y-%m-%dT%H:%M:%S+0100"), "platform": str(3 + i)},
+            "to": {"station": {"name": destination}, "arrival": (dep + timedelta(minutes=75)).strftime("%Y-%m-%dT%H:%M:%S+0100")},
+            "products": ["IC 1"],
+            "fare": 42.0,
+        })
+    return {"connections": connections}
+
+
+def _mediastack(path: str, query: dict):
+    keyword = query.get("keywords", [""])[0]
+    return {"data": [{"title": f"News {i + 1} aus {keyword}", "description": "Lorem ipsum dolor sit amet."} for i in range(3)]}
+
+
+_HANDLERS = {
+    "nominatim": _nominatim,
+    "open-meteo": _open_meteo,
+    "google": _google,
+    "sbb": _sbb,
+    "mediastack": _mediastack,
+}
+
+
+class FakeServices:
+    """Local HTTP server with the fake services; use it as context manager or call start() and stop()."""
+
+    def __init__(self, latency_ms: dict | None = None, port: int = 0):
+        """
+        Args:
+            latency_ms (dict | None): Latency per service name, missing services use DEFAULT_LATENCY_MS.
+            port (int): Port of the server, 0 for a free one.
+        """
+        self.latency_ms = {**DEFAULT_LATENCY_MS, **(latency_ms or {})}
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        fakes = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                host, _, path = parts.path.lstrip("/").partition("/")
+                service = SERVICE_HOSTS.get(host)
+                if service is None:
+                    self.send_error(404, f"No fake for host {host}")
+                    return
+                fakes._record(service)
+                time.sleep(fakes.latency_ms.get(service, 0) / 1000)
+                body = json.dumps(_HANDLERS[service]("/" + path, parse_qs(parts.query))).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _record(self, service: str):
+        with self._lock:
+            self._counts[service] += 1
+
+    def counts(self) -> dict:
+        """Returns the number of calls per service since the start or the last reset()."""
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        """Sets all call counts to 0."""
+        with self._lock:
+            self._counts.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def redirect_requests(fakes: FakeServices | str):
+    """Sends all requests (also those of the googlemaps client) to the hosts in SERVICE_HOSTS to the fakes.
+
+    Args:
+        fakes (FakeServices | str): The running fakes, or their base_url in another process (load_test.py).
+
+    Yields:
+        None
+    """
+    base_url = fakes if isinstance(fakes, str) else fakes.base_url
+    original = requests.Session.request
+
+    def request(session, method, url, *args, **kwargs):
+        parts = urlsplit(url)
+        if parts.hostname in SERVICE_HOSTS:
+            url = f"{base_url}/{parts.hostname}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+        return original(session, method, url, *args, **kwargs)
+
+    requests.Session.request = request
+    try:
+        yield
+    finally:
+        requests.Session.request = original
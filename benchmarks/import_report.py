@@ -0,0 +1,160 @@
+"""import_report.py contains the import-time report of the pages: how long does a fresh server process (after a
+restart or a scale-out) spend importing the modules of each page before the first line of the page runs, and
+which packages take that time?
+
+Every page is measured in a new interpreter started with "python -X importtime" that executes only the import
+statements at the top of the page. The report lists the total import time per page and the top-level packages
+that take the most of it. Heavy packages that show up on a page that does not use them belong
+into the function that needs them (see e.g. ml_backends.py or api_transportation.py).
+
+    python -m benchmarks.import_report
+    python -m benchmarks.import_report pages/user_overview.py --top 15 --runs 5
+
+The app modules read the secrets when they are imported; --secrets points to the secrets file (default: the
+one of the benchmarks if it exists, otherwise .streamlit/secrets.toml). No database connection is opened.
+"""
+
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_PAGES = ["main.py", *sorted(str(p.relative_to(APP_ROOT)) for p in (APP_ROOT / "pages").glob("*.py"))]
+DEFAULT_SECRETS = Path(__file__).resolve().parent / "secrets.toml"
+
+# executed in the child: streamlit first (it is loaded before any page in the server), then the imports of the page
+_MARKER = "--- page imports ---"
+_CHILD = """
+import sys, time
+sys.path.insert(0, {root!r})
+import streamlit as st
+if {secrets!r}:
+    st.config.set_option("secrets.files", [{secrets!r}])
+print({marker!r}, file=sys.stderr, flush=True)
+t0 = time.perf_counter()
+exec(compile({source!r}, {page!r}, "exec"), {{}})
+print("TOTAL_MS", (time.perf_counter() - t0) * 1000)
+print("MODULES", len(sys.modules))
+"""
+
+
+def page_imports(page: Path) -> str:
+    """Returns the source of the import statements at the top level of a page.
+
+    Args:
+        page (Path): The page script.
+
+    Returns:
+        str: The import statements, one per line.
+    """
+    tree = ast.parse(page.read_text(encoding="utf-8"))
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Sums the import time per top-level package from the output of -X importtime.
+
+    The self time of every module is added to its top-level package, so the time of pandas imported by
+    db.db_functions_users counts for pandas, not for db, and the sum over all packages is the total.
+
+    Args:
+        stderr (str): Output of the child interpreter after the start of the page imports.
+
+    Returns:
+        dict: Milliseconds per top-level package.
+    """
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+    return dict(packages)
+
+
+def measure_page(page: str, secrets: str | None) -> dict:
+    """Measures the imports of a page in a fresh interpreter.
+
+    Args:
+        page (str): Path of the page relative to the app root.
+        secrets (str | None): Secrets file for the app modules.
+
+    Returns:
+        dict: total_ms, modules and packages (ms per top-level package).
+
+    Raises:
+        RuntimeError: If the imports fail.
+    """
+    path = APP_ROOT / page
+    code = _CHILD.format(root=str(APP_ROOT), secrets=secrets or "", source=page_imports(path), page=str(path),
+                         marker=_MARKER)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=APP_ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {page} failed:\n{proc.stderr.splitlines()[-1] if proc.stderr else ''}")
+
+    out = dict(line.split(" ", 1) for line in proc.stdout.splitlines() if line.startswith(("TOTAL_MS", "MODULES")))
+    # everything imported before the marker belongs to streamlit and the interpreter, not to the page
+    return {
+        "total_ms": float(out["TOTAL_MS"]),
+        "modules": int(out["MODULES"]),
+        "packages": parse_importtime(proc.stderr.partition(_MARKER)[2]),
+    }
+
+
+def report(pages: list, secrets: str | None, runs: int, top: int) -> list:
+    """Measures every page runs times and prints the median import time and the heaviest packages.
+
+    Args:
+        pages (list): Page paths relative to the app root.
+        secrets (str | None): Secrets file for the app modules.
+        runs (int): Measurements per page, the median is reported.
+        top (int): Number of packages listed per page.
+
+    Returns:
+        list: One dict per page with page, total_ms, modules and packages.
+    """
+    results = []
+    for page in pages:
+        measurements = [measure_page(page, secrets) for _ in range(runs)]
+        packages = defaultdict(list)
+        for m in measurements:
+            for name, ms in m["packages"].items():
+                packages[name].append(ms)
+        result = {
+            "page": page,
+            "total_ms": round(statistics.median(m["total_ms"] for m in measurements)),
+            "modules": measurements[0]["modules"],
+            "packages": dict(sorted(((name, round(statistics.median(ms))) for name, ms in packages.items()),
+                                    key=lambda item: item[1], reverse=True)),
+        }
+        results.append(result)
+        heaviest = ", ".join(f"{name} {ms:,} ms" for name, ms in list(result["packages"].items())[:top])
+        print(f"{page:<32} {result['total_ms']:>7,} ms  {result['modules']:>5} modules  {heaviest}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time of the pages in a fresh interpreter.")
+    parser.add_argument("pages", nargs="*", default=DEFAULT_PAGES, help="pages relative to the app root")
+    parser.add_argument("--runs", type=int, default=3, help="measurements per page, the median is reported")
+    parser.add_argument("--top", type=int, default=6, help="packages listed per page")
+    parser.add_argument("--secrets", default=str(DEFAULT_SECRETS) if DEFAULT_SECRETS.exists() else None,
+                        help="secrets file of the app")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    try:
+        results = report(args.pages, args.secrets, args.runs, args.top)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
@@ -0,0 +1,408 @@
+"""load_test.py contains the load generator for capacity planning: how many concurrent managers and employees can
+one server process handle? It simulates N concurrent sessions of one journey at a time against the local stand-ins
+of run_benchmarks.py (local SQL Server, fake external services) and reports per journey:
+
+- throughput: completed journeys and script runs per second,
+- latency of every step (one script run each): p50, p95, p99 and max,
+- resource usage of the session processes: CPU (average and peak, 100% = one core), memory and threads,
+  added up over the processes,
+- SQL statements and external calls per journey.
+
+The journeys:
+
+- login: open main.py, log in (bcrypt), land on the dashboard
+- manager: log in, rerun the dashboard, create a trip with a participant
+- employee: log in, rerun the dashboard, open a past trip, submit an expense report (geocoding, model retraining)
+
+Every simulated session runs in its own process (started with spawn): the test harness of Streamlit (AppTest)
+replaces process-wide state on every script run and is not safe to use from several threads. Unlike the sessions
+of one Streamlit server, the sessions therefore share neither the in-process caches nor the connection pools;
+they share the database and the fakes. Each process is warmed up with one unmeasured run of main.py before the
+phase starts. Every virtual user logs in as its own seeded manager or employee; the seeded data is deleted at
+the end.
+
+    python -m benchmarks.load_test --sessions 1 5 10 20 --duration 60 --output benchmarks/results/load.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.fake_services import DEFAULT_LATENCY_MS, FakeServices, redirect_requests
+from benchmarks.run_benchmarks import parse_latency
+from benchmarks.scenarios import (DEFAULT_SECRETS, MAIN_SCRIPT, RUN_TIMEOUT_S, ScenarioError, configure_app,
+                                  fill_login, first_trip_ID)
+
+LOAD_PASSWORD = "Load123!"
+JOURNEYS = ("login", "manager", "employee")
+SAMPLE_INTERVAL_S = 0.5
+# time a session process may take to import the app and run its warm-up
+STARTUP_TIMEOUT_S = 120
+
+
+def percentile(values: list, p: float) -> float:
+    """Returns the p-th percentile of the values (nearest rank)."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def _rss_mb():
+    """Returns the resident memory of the process in MB, None if it cannot be determined."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ResourceSampler:
+    """Samples CPU, memory and threads of the process in a background thread while it is used as context manager."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+
+    def _run(self):
+        last_cpu, last_wall = sum(os.times()[:2]), time.perf_counter()
+        while not self._stop.wait(self.interval):
+            cpu, wall = sum(os.times()[:2]), time.perf_counter()
+            self.samples.append({
+                "cpu_pct": 100 * (cpu - last_cpu) / (wall - last_wall),
+                "rss_mb": _rss_mb(),
+                "threads": threading.active_count(),
+            })
+            last_cpu, last_wall = cpu, wall
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> dict:
+        """Returns cpu_avg_pct, cpu_peak_pct, rss_peak_mb and threads_peak."""
+        if not self.samples:
+            return {}
+        cpu = [s["cpu_pct"] for s in self.samples]
+        rss = [s["rss_mb"] for s in self.samples if s["rss_mb"] is not None]
+        return {
+            "cpu_avg_pct": round(statistics.mean(cpu)),
+            "cpu_peak_pct": round(max(cpu)),
+            "rss_peak_mb": round(max(rss)) if rss else None,
+            "threads_peak": max(s["threads"] for s in self.samples),
+        }
+
+
+class VirtualUser:
+    """One simulated session; every step is one script run and is timed."""
+
+    def __init__(self, manager: str, employee: str, record, rng: random.Random):
+        """
+        Args:
+            manager (str): Username of the manager of this virtual user.
+            employee (str): Username of the employee of this virtual user.
+            record: Callable(step, ms, error) that collects the measurements.
+            rng (random.Random): Random generator for the entered data.
+        """
+        self.manager = manager
+        self.employee = employee
+        self.record = record
+        self.rng = rng
+        self.at = None
+
+        from db.db_functions_users import get_user_ID
+        self.employee_ID = get_user_ID(employee)
+
+    def step(self, name: str):
+        """Runs the script once and records the duration as step name.
+
+        Raises:
+            ScenarioError: If the script raised an exception.
+        """
+        t0 = time.perf_counter()
+        error = None
+        try:
+            self.at.run(timeout=RUN_TIMEOUT_S)
+            if self.at.exception:
+                error = self.at.exception[0].message
+        except RuntimeError as e:  # timeout
+            error = str(e)
+        self.record(name, (time.perf_counter() - t0) * 1000, error)
+        if error:
+            raise ScenarioError(f"{name}: {error}")
+
+    def login(self, username: str):
+        """Opens a new session on main.py and logs the user in."""
+        self.at = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=RUN_TIMEOUT_S)
+        self.step("open")
+        fill_login(self.at, username, LOAD_PASSWORD)
+        self.step("login")
+
+    def journey_login(self):
+        self.login(self.rng.choice([self.manager, self.employee]))
+
+    def journey_manager(self):
+        self.login(self.manager)
+        self.step("manager_dashboard")
+
+        at = self.at
+        start = date.today() + timedelta(days=self.rng.randint(30, 300))
+        at.text_input(key="trip_origin").input("Zürich")
+        at.text_input(key="trip_destination").input(self.rng.choice(["Bern", "Basel", "Genf", "Lugano"]))
+        at.date_input(key="trip_start_date").set_value(start)
+        at.date_input(key="trip_end_date").set_value(start + timedelta(days=self.rng.randint(0, 3)))
+        at.text_input(key="trip_occasion").input("Load test")
+        # the options of the multiselect are (user_ID, username) tuples
+        at.multiselect(key="trip_users").select((self.employee_ID, self.employee))
+        next(b for b in at.button if b.label == "Invite").click()
+        self.step("create_trip")
+
+    def journey_employee(self):
+        self.login(self.employee)
+        self.step("employee_dashboard")
+
+        trip_ID = first_trip_ID(self.at, "employee_past_trip_")
+        if trip_ID is None:
+            return
+        self.at.session_state[f"employee_past_trip_{trip_ID}"] = True
+        self.step("open_past_trip")
+        self.at.button(key=f"open_exp_{trip_ID}").click()
+        self.step("open_expense_form")
+        for field, high in (("hotel_cost", 600), ("transport_cost", 200), ("meals_cost", 150), ("other_cost", 50)):
+            self.at.number_input(key=f"{field}_{trip_ID}").set_value(float(self.rng.randint(0, high)))
+        self.at.button(key=f"save_{trip_ID}").click()
+        self.step("submit_expense")
+
+
+def _session_process(i: int, journey: str, args, users: list, base_url: str, ready, start, results):
+    """Main function of one session process: runs the journey until the end of the phase and puts its
+    measurements into the results queue.
+
+    AppTest swaps process-wide state on every run (the Streamlit runtime, config options), so concurrent
+    sessions have to run in separate processes, not in threads.
+
+    Args:
+        i (int): Number of the session.
+        journey (str): One of JOURNEYS.
+        args: The parsed command line arguments.
+        users (list): (manager, employee) per virtual user.
+        base_url (str): Base URL of the fakes of the parent process.
+        ready: Barrier of the phase, passed when the session process is warmed up.
+        start: Event set by the parent when the phase starts.
+        results: Queue for the measurements.
+    """
+    steps, errors, journeys = {}, [], 0
+    queries, resources = [], {}
+
+    def record(step, ms, error):
+        steps.setdefault(step, []).append(ms)
+        if error:
+            errors.append(f"{step}: {error}")
+
+    try:
+        configure_app(args.secrets, args.allow_remote)
+        from db.query_log import query_stats, reset_query_stats
+
+        with redirect_requests(base_url):
+            # imports the app modules, like a server process that served its first request
+            AppTest.from_file(str(MAIN_SCRIPT), default_timeout=RUN_TIMEOUT_S).run()
+            manager, employee = users[i % len(users)]
+            user = VirtualUser(manager, employee, record, random.Random(args.seed + i))
+            run = getattr(user, f"journey_{journey}")
+            reset_query_stats()
+
+            ready.wait()
+            start.wait()
+            deadline = time.time() + args.duration
+            with ResourceSampler() as sampler:
+                # spread the start of the sessions over the ramp-up
+                time.sleep(args.ramp_up * i / args.phase_sessions)
+                while time.time() < deadline:
+                    try:
+                        run()
+                        journeys += 1
+                    except ScenarioError:
+                        pass
+                    except Exception as e:  # a broken session must not end the phase
+                        record("journey", 0, f"{type(e).__name__}: {e}")
+                    time.sleep(args.think_time * user.rng.uniform(0.5, 1.5))
+            queries, resources = query_stats(), sampler.summary()
+    except Exception as e:
+        record("journey", 0, f"session {i} failed: {type(e).__name__}: {e}")
+        ready.abort()
+    results.put({"steps": steps, "errors": errors, "journeys": journeys, "queries": queries, "resources": resources})
+
+
+def _sum_resources(summaries: list) -> dict:
+    """Adds up the resource usage of the session processes; the peaks are upper bounds."""
+    summaries = [s for s in summaries if s]
+    if not summaries:
+        return {}
+    rss = [s["rss_peak_mb"] for s in summaries if s.get("rss_peak_mb") is not None]
+    return {
+        "processes": len(summaries),
+        "cpu_avg_pct": sum(s["cpu_avg_pct"] for s in summaries),
+        "cpu_peak_pct": sum(s["cpu_peak_pct"] for s in summaries),
+        "rss_peak_mb": sum(rss) if rss else None,
+        "threads_peak": max(s["threads_peak"] for s in summaries),
+    }
+
+
+def run_phase(journey: str, sessions: int, args, users: list, fakes) -> dict:
+    """Runs a journey in a number of concurrent sessions, each in its own process, for the configured duration.
+
+    Args:
+        journey (str): One of JOURNEYS.
+        sessions (int): Number of concurrent sessions.
+        args: The parsed command line arguments.
+        users (list): (manager, employee) per virtual user.
+        fakes (FakeServices): The running fakes.
+
+    Returns:
+        dict: The measurements of the phase.
+    """
+    # spawn: the session processes must not inherit the threads and locks of this one
+    ctx = multiprocessing.get_context("spawn")
+    ready, start, results = ctx.Barrier(sessions + 1), ctx.Event(), ctx.Queue()
+    phase_args = argparse.Namespace(**vars(args), phase_sessions=sessions)
+    processes = [
+        ctx.Process(target=_session_process, name=f"session-{i}",
+                    args=(i, journey, phase_args, users, fakes.base_url, ready, start, results))
+        for i in range(sessions)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        ready.wait(timeout=STARTUP_TIMEOUT_S)
+    except threading.BrokenBarrierError:
+        pass  # a session failed to start, it reports the error below
+    # the warm-up runs are not part of the phase
+    fakes.reset()
+    t0 = time.perf_counter()
+    start.set()
+
+    timeout = args.duration + args.ramp_up + STARTUP_TIMEOUT_S + RUN_TIMEOUT_S * 10
+    outcomes = [results.get(timeout=timeout) for _ in processes]
+    wall_s = time.perf_counter() - t0
+    for process in processes:
+        process.join()
+
+    steps, errors, stats = {}, [], []
+    for outcome in outcomes:
+        for step, times in outcome["steps"].items():
+            steps.setdefault(step, []).extend(times)
+        errors += outcome["errors"]
+        stats += outcome["queries"]
+    journeys = sum(outcome["journeys"] for outcome in outcomes)
+
+    n = max(journeys, 1)
+    return {
+        "journey": journey,
+        "sessions": sessions,
+        "wall_s": round(wall_s, 1),
+        "journeys": journeys,
+        "journeys_per_s": round(journeys / wall_s, 3),
+        "runs_per_s": round(sum(len(v) for k, v in steps.items() if k != "journey") / wall_s, 2),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "steps": {
+            step: {
+                "runs": len(times),
+                "p50_ms": round(percentile(times, 50)),
+                "p95_ms": round(percentile(times, 95)),
+                "p99_ms": round(percentile(times, 99)),
+                "max_ms": round(max(times)),
+            } for step, times in steps.items() if step != "journey"
+        },
+        "queries_per_journey": round(sum(s["count"] for s in stats) / n, 1),
+        "sql_ms_per_journey": round(sum(s["total_ms"] for s in stats) / n),
+        "http_per_journey": {service: round(calls / n, 1) for service, calls in fakes.counts().items()},
+        "resources": _sum_resources([outcome["resources"] for outcome in outcomes]),
+    }
+
+
+def print_phase(result: dict):
+    r = result["resources"]
+    print(f"\n{result['journey']} x {result['sessions']} sessions: {result['journeys']} journeys in "
+          f"{result['wall_s']} s = {result['journeys_per_s']}/s, {result['runs_per_s']} runs/s, "
+          f"{result['errors']} errors")
+    print(f"  CPU avg {r.get('cpu_avg_pct')}% peak {r.get('cpu_peak_pct')}%, RSS peak {r.get('rss_peak_mb')} MB, "
+          f"threads peak {r.get('threads_peak')}; per journey {result['queries_per_journey']} queries "
+          f"({result['sql_ms_per_journey']} ms), http {result['http_per_journey']}")
+    print(f"  {'step':<20} {'runs':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for step, s in result["steps"].items():
+        print(f"  {step:<20} {s['runs']:>6} {s['p50_ms']:>8,} {s['p95_ms']:>8,} {s['p99_ms']:>8,} {s['max_ms']:>8,}")
+    for error in result["error_samples"]:
+        print(f"  ! {error[:200]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulates concurrent sessions against local stand-ins.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10], help="concurrent sessions per phase")
+    parser.add_argument("--journeys", nargs="+", choices=JOURNEYS, default=list(JOURNEYS))
+    parser.add_argument("--duration", type=float, default=60, help="seconds per phase")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds until all sessions of a phase started")
+    parser.add_argument("--think-time", type=float, default=1, help="average pause between journeys in seconds")
+    parser.add_argument("--trips", type=int, default=2000, help="number of seeded trips")
+    parser.add_argument("--employees", type=int, default=5, help="seeded employees per manager")
+    parser.add_argument("--latency", nargs="*", metavar="SERVICE=MS",
+                        help=f"latency of the fake services (default {DEFAULT_LATENCY_MS})")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the generated data")
+    parser.add_argument("--secrets", default=str(DEFAULT_SECRETS), help="secrets.toml of the stand-in database")
+    parser.add_argument("--allow-remote", action="store_true", help="allow a database server that is not local")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    try:
+        configure_app(args.secrets, args.allow_remote)
+        latency = parse_latency(args.latency)
+    except (FileNotFoundError, RuntimeError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    from db.seed_org import delete_population, populate
+
+    # one manager (and team) per virtual user of the largest phase
+    managers = max(args.sessions)
+    prefix = f"load{time.strftime('%H%M%S')}"
+    print(f"Seeding {managers} managers, {args.employees} employees each and {args.trips} trips ({prefix}) ...")
+    populate(managers, args.employees, args.trips, prefix, LOAD_PASSWORD, seed=args.seed)
+    users = [(f"{prefix}_m{i}", f"{prefix}_m{i}_e0") for i in range(managers)]
+
+    results = []
+    try:
+        with FakeServices(latency_ms=latency) as fakes, redirect_requests(fakes):
+            for journey in args.journeys:
+                for sessions in args.sessions:
+                    results.append(run_phase(journey, sessions, args, users, fakes))
+                    print_phase(results[-1])
+    finally:
+        print(f"\nDeleted {delete_population(prefix)} seeded users.")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "config": {key: value for key, value in vars(args).items() if key not in ("secrets", "output")},
+            "results": results,
+        }, indent=2), encoding="utf-8")
+        print(f"Results written to {output}")
@@ -0,0 +1,176 @@
+"""run_benchmarks.py contains the end-to-end benchmark of the main pages. It seeds a synthetic organization of a
+given size into a local SQL Server (docker-compose.yml), answers all external calls with the fakes of
+fake_services.py and drives the pages headlessly with the scenarios of scenarios.py. Per scenario and data size
+it reports the first (cold) and the following (warm) script runs: wall time, SQL statements and calls of the
+external services.
+
+    docker compose -f benchmarks/docker-compose.yml up -d
+    cp benchmarks/secrets.example.toml benchmarks/secrets.toml
+    python -m benchmarks.run_benchmarks --sizes 100 1000 --output benchmarks/results/baseline.json
+
+The seeded users and trips are deleted afterwards. Compare two JSON results with --compare.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.fake_services import DEFAULT_LATENCY_MS, FakeServices, redirect_requests
+from benchmarks.scenarios import DEFAULT_SECRETS, SCENARIOS, ScenarioError, configure_app, run_scenario
+
+BENCH_PASSWORD = "Bench123!"
+
+
+def summarize(measurements: list) -> dict:
+    """Aggregates the measurements of one step.
+
+    Args:
+        measurements (list): Measurements as returned by scenarios.measure().
+
+    Returns:
+        dict: runs, p50_ms, max_ms, queries (median) and http (calls per service of the first measurement).
+    """
+    times = [m["ms"] for m in measurements]
+    return {
+        "runs": len(times),
+        "p50_ms": round(statistics.median(times), 1),
+        "max_ms": round(max(times), 1),
+        "queries": int(statistics.median(m["queries"] for m in measurements)),
+        "http": measurements[0]["http"],
+    }
+
+
+def run_size(trips: int, args, fakes) -> list:
+    """Seeds an organization with the given number of trips, runs all scenarios on it and deletes it again.
+
+    Args:
+        trips (int): Total number of trips.
+        args: The parsed command line arguments.
+        fakes (FakeServices): The running fakes.
+
+    Returns:
+        list: One result dict per scenario and step.
+    """
+    from db.seed_org import delete_population, populate
+
+    prefix = f"bench{time.strftime('%H%M%S')}"
+    print(f"\nSeeding {args.managers} managers, {args.employees} employees each and {trips} trips ({prefix}) ...")
+    populate(args.managers, args.employees, trips, prefix, BENCH_PASSWORD, seed=args.seed)
+    users = {
+        "manager": f"{prefix}_m0",
+        "employee": f"{prefix}_m0_e0",
+        "admin": "Admin",  # created by main.create_first_users()
+    }
+
+    results = []
+    try:
+        for name in args.scenarios:
+            steps = {}
+            for _ in range(args.runs):
+                # a new session per run, the process-wide caches stay warm after the first one
+                try:
+                    for step, measurement in run_scenario(name, users, BENCH_PASSWORD, fakes, args.reruns):
+                        steps.setdefault(step, []).append(measurement)
+                except ScenarioError as e:
+                    print(f"  {name}: failed: {e}")
+                    break
+            for step, measurements in steps.items():
+                result = {"size": trips, "scenario": name, "step": step,
+                          "cold": summarize(measurements[:1]), "warm": summarize(measurements[1:] or measurements)}
+                results.append(result)
+                print(f"  {name:<20} {step:<11} cold {result['cold']['p50_ms']:>9,.0f} ms "
+                      f"warm p50 {result['warm']['p50_ms']:>9,.0f} ms  {result['warm']['queries']:>4} queries  "
+                      f"http {result['cold']['http']}")
+    finally:
+        deleted = delete_population(prefix)
+        print(f"Deleted {deleted} seeded users.")
+    return results
+
+
+def print_comparison(baseline: dict, current: dict):
+    """Prints the warm p50 times and query counts of two benchmark results side by side.
+
+    Args:
+        baseline (dict): Older result file.
+        current (dict): Newer result file.
+
+    Returns:
+        None
+    """
+    def key(r):
+        return r["size"], r["scenario"], r["step"]
+
+    old = {key(r): r for r in baseline["results"]}
+    print(f"{'size':>7} {'scenario':<20} {'step':<11} {'before ms':>10} {'after ms':>10} {'change':>8} {'queries':>11}")
+    for r in current["results"]:
+        before = old.get(key(r))
+        if before is None:
+            continue
+        b, a = before["warm"]["p50_ms"], r["warm"]["p50_ms"]
+        change = f"{(a - b) / b:+.0%}" if b else "-"
+        print(f"{r['size']:>7} {r['scenario']:<20} {r['step']:<11} {b:>10,.0f} {a:>10,.0f} {change:>8} "
+              f"{before['warm']['queries']:>5}→{r['warm']['queries']:<5}")
+
+
+def parse_latency(values: list) -> dict:
+    """Parses service=ms pairs of --latency."""
+    latency = {}
+    for value in values or []:
+        service, _, ms = value.partition("=")
+        if service not in DEFAULT_LATENCY_MS or not ms:
+            raise argparse.ArgumentTypeError(f"Expected one of {', '.join(DEFAULT_LATENCY_MS)}=<ms>, got {value}")
+        latency[service] = float(ms)
+    return latency
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the main pages against local stand-ins.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000], help="total number of trips per run")
+    parser.add_argument("--managers", type=int, default=5, help="number of seeded managers")
+    parser.add_argument("--employees", type=int, default=10, help="employees per manager")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=3, help="sessions per scenario, the first one is the cold run")
+    parser.add_argument("--reruns", type=int, default=2, help="measured reruns within each session")
+    parser.add_argument("--latency", nargs="*", metavar="SERVICE=MS",
+                        help=f"latency of the fake services (default {DEFAULT_LATENCY_MS})")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the generated data")
+    parser.add_argument("--secrets", default=str(DEFAULT_SECRETS), help="secrets.toml of the stand-in database")
+    parser.add_argument("--allow-remote", action="store_true", help="allow a database server that is not local")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two JSON result files instead of running the benchmark")
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (json.loads(Path(p).read_text(encoding="utf-8")) for p in args.compare)
+        print_comparison(baseline, current)
+        sys.exit(0)
+
+    try:
+        configure_app(args.secrets, args.allow_remote)
+        latency = parse_latency(args.latency)
+    except (FileNotFoundError, RuntimeError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    results = []
+    with FakeServices(latency_ms=latency) as fakes, redirect_requests(fakes):
+        for size in args.sizes:
+            results += run_size(size, args, fakes)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "config": {"managers": args.managers, "employees": args.employees, "runs": args.runs,
+                       "reruns": args.reruns, "latency_ms": fakes.latency_ms, "seed": args.seed},
+            "results": results,
+        }, indent=2), encoding="utf-8")
+        print(f"\nResults written to {output}")
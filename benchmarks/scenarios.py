@@ -0,0 +1,200 @@
+"""scenarios.py contains the user journeys that benchmarks and load tests drive through the app headlessly with
+Streamlit's AppTest. Every scenario starts a new session on main.py, logs a user in by setting the session state
+like main.py does, switches to the page and runs it; some scenarios then open the first trip of the list.
+
+Each step is one script run and is measured on its own: wall time, SQL statements (db/query_log.py) and calls of
+the fake external services (fake_services.py).
+
+The app modules read the secrets when they are imported, so configure_app() has to run before anything of the app
+is imported.
+"""
+
+import os
+import time
+from pathlib import Path
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+MAIN_SCRIPT = APP_ROOT / "main.py"
+DEFAULT_SECRETS = Path(__file__).resolve().parent / "secrets.toml"
+RUN_TIMEOUT_S = 300
+
+# page and role of the scenarios; "open" is the key prefix of the trip expanders opened in the second step
+SCENARIOS = {
+    "login_page": {"page": None, "user": None},
+    "login_submit": {"page": None, "user": "manager", "submit": True},
+    "manager_dashboard": {"page": "pages/manager_overview.py", "user": "manager"},
+    "manager_trip": {"page": "pages/manager_overview.py", "user": "manager", "open": "manager_trip_"},
+    "employee_dashboard": {"page": "pages/user_overview.py", "user": "employee"},
+    "employee_trip": {"page": "pages/user_overview.py", "user": "employee", "open": "employee_trip_"},
+    "admin_dashboard": {"page": "pages/admin_overview.py", "user": "admin"},
+    "analytics": {"page": "pages/analytics_overview.py", "user": "manager"},
+}
+
+
+class ScenarioError(RuntimeError):
+    """A script run of a scenario raised an exception."""
+
+
+def configure_app(secrets_path: str | Path = DEFAULT_SECRETS, allow_remote: bool = False):
+    """Points the app at the secrets of the benchmark database and switches off its background jobs.
+
+    Args:
+        secrets_path (str | Path): secrets.toml with [azure_db] of the stand-in database, [dummy] ADMIN and
+            GOOGLE_API_KEY (see secrets.example.toml).
+        allow_remote (bool): Allow a database server that is not on this machine.
+
+    Raises:
+        FileNotFoundError: If the secrets file does not exist.
+        RuntimeError: If the database server is not local and allow_remote is False.
+    """
+    secrets_path = Path(secrets_path)
+    if not secrets_path.exists():
+        raise FileNotFoundError(f"{secrets_path} not found, copy benchmarks/secrets.example.toml and adapt it.")
+    st.config.set_option("secrets.files", [str(secrets_path)])
+
+    server = st.secrets["azure_db"]["SERVER_NAME"]
+    host = server.removeprefix("tcp:").split(",")[0].split("\\")[0].lower()
+    if host not in ("localhost", "127.0.0.1", "::1", ".") and not allow_remote:
+        raise RuntimeError(f"The benchmarks write test data, refusing to use the database server '{server}'. "
+                           "Use a local stand-in or pass --allow-remote.")
+
+    # the scheduled jobs would add their queries to the measurements
+    os.environ.setdefault("TRIP_MAINTENANCE_IN_APP", "0")
+    os.environ.setdefault("EXPENSE_SUMMARY_IN_APP", "0")
+    os.environ.setdefault("QUERY_LOG_FILE", "")
+
+
+def session_for(username: str) -> dict:
+    """Returns the session state main.py sets after a successful login of the user.
+
+    Args:
+        username (str): An existing user.
+
+    Returns:
+        dict: username, role, role_sortkey, user_ID and manager_ID.
+    """
+    from db.db_functions_users import get_manager_ID, get_role_sortkey, get_user, get_user_ID
+
+    user = get_user(username)
+    if user is None:
+        raise ScenarioError(f"User {username} does not exist.")
+    role = user.role
+    return {
+        "username": username,
+        "role": role,
+        "role_sortkey": get_role_sortkey(role),
+        "user_ID": get_user_ID(username),
+        "manager_ID": get_manager_ID(username),
+    }
+
+
+def measure(at: AppTest, fakes) -> dict:
+    """Runs the script of an AppTest once and measures it.
+
+    Args:
+        at (AppTest): The session.
+        fakes (FakeServices | None): The fake services whose calls are counted.
+
+    Returns:
+        dict: ms, queries and http (calls per service).
+
+    Raises:
+        ScenarioError: If the script raised an exception.
+    """
+    from db.query_log import query_stats, reset_query_stats
+
+    reset_query_stats()
+    if fakes is not None:
+        fakes.reset()
+    t0 = time.perf_counter()
+    at.run(timeout=RUN_TIMEOUT_S)
+    ms = (time.perf_counter() - t0) * 1000
+    if at.exception:
+        raise ScenarioError(at.exception[0].message)
+    return {
+        "ms": ms,
+        "queries": sum(s["count"] for s in query_stats()),
+        "http": fakes.counts() if fakes is not None else {},
+    }
+
+
+def first_trip_ID(at: AppTest, key_prefix: str):
+    """Returns the trip_ID of the first trip expander whose key starts with key_prefix.
+
+    Args:
+        at (AppTest): The session after a run of the page.
+        key_prefix (str): e.g. "manager_trip_" or "employee_past_trip_".
+
+    Returns:
+        int | None: The trip_ID, None if the page shows no such trip.
+    """
+    for expander in at.expander:
+        key = expander.key or ""
+        if key.startswith(key_prefix) and key[len(key_prefix):].isdigit():
+            return int(key[len(key_prefix):])
+    return None
+
+
+def fill_login(at: AppTest, username: str, password: str):
+    """Fills the login form of main.py and clicks Login; the next run logs the user in.
+
+    Args:
+        at (AppTest): The session after a run of main.py.
+        username (str): Username.
+        password (str): Password.
+
+    Returns:
+        None
+    """
+    at.text_input[0].input(username)
+    at.text_input[1].input(password)
+    next(b for b in at.button if b.label == "Login").click()
+
+
+def run_scenario(name: str, users: dict, password: str, fakes=None, reruns: int = 3) -> list:
+    """Runs a scenario in a new session.
+
+    Args:
+        name (str): Key of SCENARIOS.
+        users (dict): Username per role ("manager", "employee", "admin").
+        password (str): Password of the users (for login_submit).
+        fakes (FakeServices | None): The fake services.
+        reruns (int): Measured reruns after the first run of each step.
+
+    Returns:
+        list: (step, measurement) tuples; step is "first", "rerun", "open" or "open_rerun".
+    """
+    scenario = SCENARIOS[name]
+    at = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=RUN_TIMEOUT_S)
+    results = []
+
+    if scenario["page"] is None and not scenario.get("submit"):
+        results.append(("first", measure(at, fakes)))
+        results += [("rerun", measure(at, fakes)) for _ in range(reruns)]
+        return results
+
+    # first run of main.py: tables, roles and the login form
+    measure(at, fakes)
+    if scenario.get("submit"):
+        fill_login(at, users[scenario["user"]], password)
+        # main.py switches to the dashboard after the login (and a sleep of 1 s), the measurement includes its first run
+        results.append(("first", measure(at, fakes)))
+        return results
+
+    for key, value in session_for(users[scenario["user"]]).items():
+        at.session_state[key] = value
+    at.switch_page(scenario["page"])
+    results.append(("first", measure(at, fakes)))
+    results += [("rerun", measure(at, fakes)) for _ in range(reruns)]
+
+    if scenario.get("open"):
+        trip_ID = first_trip_ID(at, scenario["open"])
+        if trip_ID is None:
+            return results
+        at.session_state[f"{scenario['open']}{trip_ID}"] = True
+        results.append(("open", measure(at, fakes)))
+        results += [("open_rerun", measure(at, fakes)) for _ in range(reruns)]
+    return results
@@ -0,0 +1,296 @@
+"""analytics.py contains the summary table behind the cost analytics page (pages/analytics_overview.py) and the
+watermark job that keeps it up to date.
+
+expense_summary holds the spend of expenses_user_data aggregated per month, team (manager_ID of the user who
+reported the expense) and destination. The job only aggregates the expense rows whose id is above the watermark
+stored in summary_watermarks and adds them to the summary with one MERGE per batch, so its cost depends on the
+number of new expenses, not on the size of the history. The page reads the small summary table and rolls it up
+by month, team, destination and tier (tiers.py) in pandas, without a GROUP BY over the expenses.
+
+Expenses are only appended, never changed, so the incremental sums stay exact. A user who changes team keeps the
+expenses already summarized in the old team; rebuild_expense_summary() recomputes everything.
+
+In the app, start_summary_scheduler() refreshes the summary every SUMMARY_REFRESH_INTERVAL_S seconds (set
+EXPENSE_SUMMARY_IN_APP=0 in the settings to disable it when the job runs as its own process).
+From the repository root:
+    python -m db.analytics --once
+    python -m db.analytics --loop --interval 60
+    python -m db.analytics --rebuild
+"""
+
+import argparse
+import threading
+import time
+
+import pandas as pd
+from db.query_cache import invalidate, read_sql_cached
+from ml.tiers import tier_of
+from settings import get_settings
+from db.query_log import logged_connect, get_engine
+
+CONNECTION_STRING = get_settings().db.connection_string
+
+SUMMARY_TABLE = "expense_summary"
+WATERMARK_NAME = "expense_summary"
+SUMMARY_BATCH_ROWS = get_settings().summary_batch_rows
+SUMMARY_REFRESH_INTERVAL_S = get_settings().summary_refresh_interval_s
+APP_LOCK = "expense_summary_refresh"
+# month of the expenses without a valid date
+UNKNOWN_MONTH = "1900-01-01"
+
+CREATE_SUMMARY_SQL = f"""
+    IF OBJECT_ID('{SUMMARY_TABLE}', 'U') IS NULL
+    BEGIN
+        CREATE TABLE {SUMMARY_TABLE} (
+            month DATE NOT NULL,                -- first day of the month, {UNKNOWN_MONTH} if the date is missing
+            manager_ID INT NOT NULL,            -- 0 if the user has no manager (e.g. seed data)
+            dest_city NVARCHAR(100) NOT NULL,
+            expenses INT NOT NULL,
+            total_cost FLOAT NOT NULL,
+            total_days FLOAT NOT NULL,
+            total_km FLOAT NOT NULL,
+            PRIMARY KEY (month, manager_ID, dest_city)
+        );
+    END
+    IF OBJECT_ID('summary_watermarks', 'U') IS NULL
+    BEGIN
+        CREATE TABLE summary_watermarks (
+            name NVARCHAR(100) PRIMARY KEY,
+            last_id INT NOT NULL,
+            refreshed_at DATETIME2 NULL
+        );
+    END
+    IF NOT EXISTS (SELECT 1 FROM summary_watermarks WHERE name = '{WATERMARK_NAME}')
+        INSERT INTO summary_watermarks (name, last_id) VALUES ('{WATERMARK_NAME}', 0);
+"""
+
+# Aggregates the expenses with last_id < id <= upper and adds them to the summary. READCOMMITTEDLOCK waits for
+# inserts that are not committed yet instead of skipping them, so no expense ends up below the watermark unsummarized
+MERGE_BATCH_SQL = f"""
+    MERGE {SUMMARY_TABLE} AS s
+    USING (
+        SELECT COALESCE(DATEFROMPARTS(YEAR(x.d), MONTH(x.d), 1), '{UNKNOWN_MONTH}'),
+               COALESCE(u.manager_ID, 0), COALESCE(e.dest_city, ''),
+               COUNT(*), SUM(COALESCE(e.total_cost, 0)), SUM(COALESCE(e.duration_days, 0)),
+               SUM(COALESCE(e.distance_km, 0))
+        FROM expenses_user_data e WITH (READCOMMITTEDLOCK)
+        CROSS APPLY (SELECT TRY_CAST(e.date AS DATE) AS d) x
+        LEFT JOIN users u ON u.user_ID = TRY_CAST(e.user_id AS INT)
+        WHERE e.id > ? AND e.id <= ?
+        GROUP BY COALESCE(DATEFROMPARTS(YEAR(x.d), MONTH(x.d), 1), '{UNKNOWN_MONTH}'),
+                 COALESCE(u.manager_ID, 0), COALESCE(e.dest_city, '')
+    ) AS src (month, manager_ID, dest_city, expenses, total_cost, total_days, total_km)
+    ON s.month = src.month AND s.manager_ID = src.manager_ID AND s.dest_city = src.dest_city
+    WHEN MATCHED THEN UPDATE SET
+        s.expenses = s.expenses + src.expenses,
+        s.total_cost = s.total_cost + src.total_cost,
+        s.total_days = s.total_days + src.total_days,
+        s.total_km = s.total_km + src.total_km
+    WHEN NOT MATCHED THEN
+        INSERT (month, manager_ID, dest_city, expenses, total_cost, total_days, total_km)
+        VALUES (src.month, src.manager_ID, src.dest_city, src.expenses, src.total_cost, src.total_days, src.total_km);
+"""
+
+SUMMARY_SQL = f"""
+    SELECT s.month, s.manager_ID, m.username AS manager, s.dest_city, s.expenses, s.total_cost, s.total_days, s.total_km
+    FROM {SUMMARY_TABLE} s
+    LEFT JOIN users m ON m.user_ID = s.manager_ID
+    {{where}}
+"""
+
+_scheduler = {"thread": None, "last_run": None, "last_result": None}
+_scheduler_lock = threading.Lock()
+
+
+def create_summary_tables(conn=None):
+    """Creates expense_summary and summary_watermarks if they don't exist.
+
+    Args:
+        conn (pyodbc.Connection): Open connection; None to open and close one.
+
+    Returns:
+        None
+    """
+    own = conn is None
+    if own:
+        conn = logged_connect(CONNECTION_STRING)
+    try:
+        c = conn.cursor()
+        c.execute(CREATE_SUMMARY_SQL)
+        conn.commit()
+    finally:
+        if own:
+            conn.close()
+
+
+def _get_app_lock(conn) -> bool:
+    """Takes the session lock of the job; False if another process is refreshing."""
+    c = conn.cursor()
+    c.execute("""
+        SET NOCOUNT ON;
+        DECLARE @result INT;
+        EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Session', @LockTimeout = 0;
+        SELECT @result;
+    """, (APP_LOCK,))
+    acquired = c.fetchone()[0] >= 0
+    conn.commit()
+    return acquired
+
+
+def refresh_expense_summary(batch_rows: int = SUMMARY_BATCH_ROWS) -> dict | None:
+    """Adds all expenses above the watermark to the summary, in batches of batch_rows expenses
+    that are committed together with the new watermark.
+
+    Args:
+        batch_rows (int): Expenses per batch and transaction.
+
+    Returns:
+        dict: Number of summarized expenses, the new watermark and the duration,
+        None if another process holds the lock.
+    """
+    t0 = time.perf_counter()
+    summarized = 0
+    conn = logged_connect(CONNECTION_STRING)
+    try:
+        create_summary_tables(conn)
+        if not _get_app_lock(conn):
+            return None
+
+        c = conn.cursor()
+        c.execute("SELECT last_id FROM summary_watermarks WHERE name = ?", (WATERMARK_NAME,))
+        last_id = c.fetchone()[0]
+        while True:
+            # upper end of the next batch: the id of the batch_rows-th expense above the watermark
+            c.execute("""
+                SELECT MAX(id), COUNT(*) FROM (
+                    SELECT TOP (?) id FROM expenses_user_data WHERE id > ? ORDER BY id
+                ) AS batch
+            """, (batch_rows, last_id))
+            upper, count = c.fetchone()
+            if not count:
+                break
+            c.execute(MERGE_BATCH_SQL, (last_id, upper))
+            c.execute("UPDATE summary_watermarks SET last_id = ?, refreshed_at = SYSUTCDATETIME() WHERE name = ?",
+                      (upper, WATERMARK_NAME))
+            conn.commit()
+            last_id = upper
+            summarized += count
+            if count < batch_rows:
+                break
+
+        c.execute("UPDATE summary_watermarks SET refreshed_at = SYSUTCDATETIME() WHERE name = ?", (WATERMARK_NAME,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    invalidate(SUMMARY_TABLE)
+    return {"summarized": summarized, "watermark": last_id, "duration_s": round(time.perf_counter() - t0, 2)}
+
+
+def rebuild_expense_summary(batch_rows: int = SUMMARY_BATCH_ROWS) -> dict | None:
+    """Empties the summary, resets the watermark and summarizes all expenses again.
+
+    Args:
+        batch_rows (int): Expenses per batch and transaction.
+
+    Returns:
+        dict: As refresh_expense_summary(), None if another process holds the lock.
+    """
+    conn = logged_connect(CONNECTION_STRING)
+    try:
+        create_summary_tables(conn)
+        if not _get_app_lock(conn):
+            return None
+        c = conn.cursor()
+        c.execute(f"TRUNCATE TABLE {SUMMARY_TABLE}")
+        c.execute("UPDATE summary_watermarks SET last_id = 0, refreshed_at = NULL WHERE name = ?", (WATERMARK_NAME,))
+        conn.commit()
+    finally:
+        # releases the lock, refresh_expense_summary() takes it again
+        conn.close()
+    return refresh_expense_summary(batch_rows)
+
+
+def load_summary(manager_ID: int | None = None) -> pd.DataFrame:
+    """Reads the summary for the analytics page.
+
+    Args:
+        manager_ID (int | None): Only this manager's team; None for all teams.
+
+    Returns:
+        pd.DataFrame: One row per month, team and destination with the columns of expense_summary, the
+        manager's username, the tier of the destination and the month as text ("unknown" without date).
+    """
+    if manager_ID is None:
+        df = read_sql_cached(SUMMARY_SQL.format(where=""), get_engine(), tags=(SUMMARY_TABLE, "users"))
+    else:
+        df = read_sql_cached(SUMMARY_SQL.format(where="WHERE s.manager_ID = ?"), get_engine(), params=(manager_ID,),
+                             tags=(SUMMARY_TABLE, "users"))
+
+    df["month"] = pd.to_datetime(df["month"]).dt.strftime("%Y-%m").where(df["month"].astype(str) != UNKNOWN_MONTH,
+                                                                         "unknown")
+    df["manager"] = df["manager"].fillna(df["manager_ID"].map(lambda m: "no team" if m == 0 else f"#{m}"))
+    df["tier"] = tier_of(df["dest_city"]).astype(str)
+    return df
+
+
+def last_refresh():
+    """Returns the time of the last refresh of the summary (UTC), None if it never ran."""
+    df = read_sql_cached("SELECT refreshed_at FROM summary_watermarks WHERE name = ?", get_engine(),
+                         params=(WATERMARK_NAME,), tags=(SUMMARY_TABLE,))
+    return None if df.empty else df.iloc[0, 0]
+
+
+def _scheduler_loop(interval_s: float):
+    while True:
+        try:
+            result = refresh_expense_summary()
+            _scheduler["last_result"] = result
+        except Exception as e:
+            _scheduler["last_result"] = {"error": str(e)}
+            print(f"Expense summary refresh failed: {e}")
+        _scheduler["last_run"] = time.time()
+        time.sleep(interval_s)
+
+
+def start_summary_scheduler(interval_s: float = SUMMARY_REFRESH_INTERVAL_S) -> bool:
+    """Starts the refresh thread of this process if it is not running yet. Safe to call on every rerun.
+
+    Args:
+        interval_s (float): Seconds between two refreshes; the first one starts immediately.
+
+    Returns:
+        bool: True if the scheduler runs in this process.
+    """
+    if not get_settings().expense_summary_in_app:
+        return False
+    with _scheduler_lock:
+        thread = _scheduler["thread"]
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_scheduler_loop, args=(interval_s,), name="expense-summary", daemon=True)
+            thread.start()
+            _scheduler["thread"] = thread
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the expense summary of the analytics page.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--once", action="store_true", help="refresh once and exit (default)")
+    mode.add_argument("--loop", action="store_true", help="refresh every --interval seconds")
+    mode.add_argument("--rebuild", action="store_true", help="recompute the whole summary and exit")
+    parser.add_argument("--interval", type=float, default=SUMMARY_REFRESH_INTERVAL_S, help="seconds between runs with --loop")
+    parser.add_argument("--batch-rows", type=int, default=SUMMARY_BATCH_ROWS, help="expenses per batch and transaction")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(rebuild_expense_summary(args.batch_rows) or "Skipped, another run holds the lock.")
+    else:
+        while True:
+            print(refresh_expense_summary(args.batch_rows) or "Skipped, another run holds the lock.")
+            if not args.loop:
+                break
+            time.sleep(args.interval)
@@ -0,0 +1,289 @@
+"""bulk_import.py contains the bulk import of trips from a CSV or Excel file, e.g. to plan an offsite for a whole team
+at once instead of one create_trip_dropdown() submission per trip.
+
+The file has one trip per row (see IMPORT_COLUMNS and TEMPLATE_CSV); the participants are usernames separated by ";".
+A CSV is read in chunks of CHUNK_ROWS rows. For every chunk the rows are validated at once, all new usernames are
+resolved with one query, all new cities are geocoded once (offline table first, see get_coords_batch()), and the
+trips and their participants are inserted in one transaction with batched statements. Invalid rows are skipped
+and reported with their line number, the other rows are imported.
+
+Run it from the repository root for large files:
+    python -m db.bulk_import trips.csv --manager-id 12
+"""
+
+import argparse
+import time
+
+import pandas as pd
+import streamlit as st
+
+from api.api_city_lookup import get_coords_batch
+from db.db_bulk import MAX_PARAMS, chunked, executemany_fast, insert_returning_ids
+from db.db_functions_trips import connect
+from db.query_cache import invalidate
+
+IMPORT_COLUMNS = [
+    "origin", "destination", "start_date", "end_date", "start_time", "end_time",
+    "occasion", "method_transport", "participants",
+]
+REQUIRED_COLUMNS = ["origin", "destination", "start_date", "end_date"]
+CHUNK_ROWS = 5_000
+PARTICIPANT_SEPARATOR = ";"
+DEFAULT_START_TIME = "09:00"
+DEFAULT_END_TIME = "17:00"
+
+# accepted spellings of the transport method, stored as in create_trip_dropdown (0 = car, 1 = public transport)
+TRANSPORT_METHODS = {
+    "": 0, "0": 0, "car": 0,
+    "1": 1, "public transport": 1, "public": 1, "train": 1,
+}
+
+TEMPLATE_CSV = (
+    ",".join(IMPORT_COLUMNS) + "\n"
+    "Zurich,Geneva,2026-03-02,2026-03-04,08:00,18:00,Customer meeting,public transport,alice;bob\n"
+    "Bern,Lugano,2026-03-09,2026-03-13,07:30,17:00,Team offsite,car,alice;bob;carol\n"
+)
+
+
+def read_import_file(file, filename: str):
+    """Reads an import file chunk by chunk.
+
+    Args:
+        file: Path or file-like object.
+        filename (str): Name of the file, the extension decides between CSV and Excel.
+
+    Returns:
+        generator of pd.DataFrame with string columns; the index is the row number (0 = first data row).
+
+    Raises:
+        ImportError: For Excel files if openpyxl is not installed.
+    """
+    if filename.lower().endswith((".xlsx", ".xls")):
+        # Excel files can't be streamed, they are read at once
+        yield pd.read_excel(file, dtype=str).fillna("")
+    else:
+        yield from pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS, skipinitialspace=True)
+
+
+def validate_chunk(df: pd.DataFrame):
+    """Checks and converts the values of a chunk.
+
+    Args:
+        df (pd.DataFrame): Rows as read by read_import_file().
+
+    Returns:
+        (pd.DataFrame, list): The valid rows with converted values and a list of (line, error) of the invalid rows.
+    """
+    df = df.reindex(columns=IMPORT_COLUMNS, fill_value="").fillna("").astype(str).apply(lambda col: col.str.strip())
+
+    start = pd.to_datetime(df["start_date"], format="%Y-%m-%d", errors="coerce")
+    end = pd.to_datetime(df["end_date"], format="%Y-%m-%d", errors="coerce")
+    start_time = pd.to_datetime(df["start_time"].replace("", DEFAULT_START_TIME), format="%H:%M", errors="coerce")
+    end_time = pd.to_datetime(df["end_time"].replace("", DEFAULT_END_TIME), format="%H:%M", errors="coerce")
+    method = df["method_transport"].str.lower().map(TRANSPORT_METHODS)
+
+    checks = [
+        (df["origin"] == "", "origin is missing"),
+        (df["destination"] == "", "destination is missing"),
+        (start.isna(), "start_date is not a date (YYYY-MM-DD)"),
+        (end.isna(), "end_date is not a date (YYYY-MM-DD)"),
+        (end < start, "end_date is before start_date"),
+        (start_time.isna(), "start_time is not a time (HH:MM)"),
+        (end_time.isna(), "end_time is not a time (HH:MM)"),
+        (method.isna(), "method_transport must be 'car' or 'public transport'"),
+    ]
+    messages = pd.Series("", index=df.index)
+    for mask, message in checks:
+        messages[mask] += message + "; "
+
+    invalid = messages != ""
+    errors = [(int(i) + 2, msg.rstrip("; ")) for i, msg in messages[invalid].items()]
+
+    valid = pd.DataFrame({
+        "origin": df["origin"],
+        "destination": df["destination"],
+        "start_date": start.dt.date,
+        "end_date": end.dt.date,
+        "start_time": start_time.dt.strftime("%H:%M"),
+        "end_time": end_time.dt.strftime("%H:%M"),
+        "occasion": df["occasion"],
+        "method_transport": method,
+        "participants": df["participants"].map(
+            lambda s: list(dict.fromkeys(u.strip() for u in s.split(PARTICIPANT_SEPARATOR) if u.strip()))
+        ),
+    })[~invalid]
+    return valid, errors
+
+
+def resolve_usernames(conn, usernames, manager_ID: int) -> dict:
+    """Looks up the user_IDs of the given usernames among the users of a manager, with one query per
+    MAX_PARAMS names.
+
+    Args:
+        conn (pyodbc.Connection): Open connection.
+        usernames (iterable): Usernames to resolve.
+        manager_ID (int): Only users of this manager can be assigned.
+
+    Returns:
+        dict: username -> user_ID for all usernames that were found.
+    """
+    found = {}
+    c = conn.cursor()
+    for batch in chunked(list(usernames), MAX_PARAMS - 1):
+        marks = ", ".join("?" * len(batch))
+        c.execute(f"SELECT username, user_ID FROM users WHERE manager_ID = ? AND username IN ({marks})",
+                  (manager_ID, *batch))
+        found.update({username: user_ID for username, user_ID in c.fetchall()})
+    return found
+
+
+def import_trips(file, filename: str, manager_ID: int, geocode: bool = True) -> dict:
+    """Imports all valid trips of a file for a manager.
+
+    Args:
+        file: Path or file-like object (e.g. a Streamlit UploadedFile).
+        filename (str): Name of the file, ".csv", ".xlsx" or ".xls".
+        manager_ID (int): Manager of the imported trips.
+        geocode (bool): Reject rows whose origin or destination can't be geocoded.
+
+    Returns:
+        dict: rows (read), imported (trips), assignments (participants), errors (list of (line, error)), duration_s.
+
+    Raises:
+        ValueError: If required columns are missing.
+        RuntimeError: If there is no connection to the database.
+    """
+    t0 = time.perf_counter()
+    report = {"rows": 0, "imported": 0, "assignments": 0, "errors": []}
+    user_ids = {}   # resolved usernames of all chunks
+    checked = set() # usernames already looked up
+    coords = {}     # geocoded cities of all chunks
+
+    conn = connect()
+    if conn is None:
+        raise RuntimeError("No connection to the database.")
+
+    try:
+        for chunk in read_import_file(file, filename):
+            missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Missing columns: {', '.join(missing)}")
+            report["rows"] += len(chunk)
+
+            rows, errors = validate_chunk(chunk)
+            report["errors"].extend(errors)
+
+            # one query for all usernames of the chunk that were not looked up yet
+            new_names = {u for names in rows["participants"] for u in names} - checked
+            if new_names:
+                user_ids.update(resolve_usernames(conn, new_names, manager_ID))
+                checked |= new_names
+
+            if geocode:
+                new_cities = (set(rows["origin"]) | set(rows["destination"])) - coords.keys()
+                if new_cities:
+                    coords.update(get_coords_batch(new_cities))
+
+            trip_rows, participants, lines = [], [], []
+            for i, row in rows.iterrows():
+                unknown_users = [u for u in row.participants if u not in user_ids]
+                unknown_cities = [city for city in (row.origin, row.destination) if geocode and coords.get(city) is None]
+                problems = []
+                if unknown_users:
+                    problems.append(f"unknown users: {', '.join(unknown_users)}")
+                if unknown_cities:
+                    problems.append(f"unknown cities: {', '.join(unknown_cities)}")
+                if problems:
+                    report["errors"].append((int(i) + 2, "; ".join(problems)))
+                    continue
+
+                trip_rows.append((
+                    row.origin, row.destination, row.start_date, row.end_date, row.start_time, row.end_time,
+                    row.occasion, manager_ID, int(row.method_transport),
+                ))
+                participants.append([user_ids[u] for u in row.participants])
+                lines.append(int(i) + 2)
+
+            if not trip_rows:
+                continue
+
+            # one transaction per chunk: trips first, then their participants
+            try:
+                trip_ids = insert_returning_ids(conn, "trips", [
+                    "origin", "destination", "start_date", "end_date", "start_time", "end_time",
+                    "occasion", "manager_ID", "method_transport",
+                ], trip_rows, "trip_ID")
+                assignments = [(trip_id, uid) for trip_id, uids in zip(trip_ids, participants) for uid in uids]
+                executemany_fast(conn, "INSERT INTO user_trips (trip_ID, user_ID) VALUES (?, ?)", assignments)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                report["errors"].extend((line, f"not imported, the batch failed: {e}") for line in lines)
+                continue
+
+            report["imported"] += len(trip_ids)
+            report["assignments"] += len(assignments)
+    finally:
+        conn.close()
+        if report["imported"]:
+            invalidate("trips", "user_trips")
+
+    report["errors"].sort()
+    report["duration_s"] = round(time.perf_counter() - t0, 2)
+    return report
+
+
+def bulk_import_dropdown(title: str = "Import trips"):
+    """This function creates the expander to import trips of the logged in manager from a CSV or Excel file.
+
+    Args:
+        title (str): The title of the expander.
+
+    Returns:
+        None
+    """
+    with st.expander(title, expanded=False):
+        st.caption(
+            f"One trip per row with the columns {', '.join(IMPORT_COLUMNS)}. Dates as YYYY-MM-DD, times as HH:MM, "
+            f"participants as usernames separated by '{PARTICIPANT_SEPARATOR}'."
+        )
+        st.download_button("Download template", TEMPLATE_CSV, file_name="trip_import_template.csv", mime="text/csv")
+
+        uploaded = st.file_uploader("CSV or Excel file", type=["csv", "xlsx", "xls"], key="trip_import_file")
+        geocode = st.checkbox("Reject unknown cities (looked up online if needed)", value=True, key="trip_import_geocode")
+
+        if uploaded is None or not st.button("Import trips", type="primary", key="trip_import_start"):
+            return
+
+        manager_ID = int(st.session_state["user_ID"])
+        with st.spinner("Importing trips..."):
+            try:
+                report = import_trips(uploaded, uploaded.name, manager_ID, geocode=geocode)
+            except ImportError:
+                st.error("Reading Excel files needs the package openpyxl. Please upload a CSV file.")
+                return
+            except (ValueError, RuntimeError) as e:
+                st.error(f"Import failed: {e}")
+                return
+
+        st.success(
+            f"Imported {report['imported']} of {report['rows']} trips with "
+            f"{report['assignments']} participants in {report['duration_s']} s."
+        )
+        if report["errors"]:
+            st.warning(f"{len(report['errors'])} rows were not imported:")
+            st.dataframe(pd.DataFrame(report["errors"], columns=["line", "error"]), hide_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import trips with participants from a CSV or Excel file.")
+    parser.add_argument("file", help="CSV or Excel file, see TEMPLATE_CSV")
+    parser.add_argument("--manager-id", type=int, required=True, help="manager of the imported trips")
+    parser.add_argument("--no-geocode", action="store_true", help="do not check the cities")
+    args = parser.parse_args()
+
+    result = import_trips(args.file, args.file, args.manager_id, geocode=not args.no_geocode)
+    for line, error in result["errors"]:
+        print(f"line {line}: {error}")
+    print(f"Imported {result['imported']} of {result['rows']} trips with {result['assignments']} participants "
+          f"in {result['duration_s']}s, {len(result['errors'])} rows skipped.")
@@ -0,0 +1,195 @@
+"""bulk_users.py contains the bulk onboarding of users from a CSV file for managers and admins, instead of one
+register_user_dropdown() submission per user.
+
+bcrypt is deliberately slow (about 0.2 s per password), so the passwords are hashed in a small thread pool; bcrypt
+releases the GIL while hashing. The pool is bounded (PASSWORD_HASH_WORKERS), so one upload cannot take every core
+of the server, and no processes are forked from the multithreaded Streamlit server.
+All usernames of the file are checked for collisions with one query, and all new users are inserted in one
+transaction with batched statements. Invalid rows are skipped and reported with their line number.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+import pandas as pd
+import streamlit as st
+
+from db.db_bulk import MAX_PARAMS, chunked, executemany_fast
+from db.db_functions_users import connect
+from db.db_roles import roles_below
+from db.query_cache import invalidate
+from settings import get_settings
+
+USER_COLUMNS = ["username", "email", "password", "role", "manager_ID"]
+REQUIRED_COLUMNS = ["username", "password"]
+DEFAULT_ROLE = "User"
+MAX_USERS = 10_000
+# below this number one thread is fast enough
+MIN_PARALLEL = 4
+
+TEMPLATE_CSV = (
+    ",".join(USER_COLUMNS) + "\n"
+    "alice,alice@example.com,Start123!,User,\n"
+    "bob,bob@example.com,Start123!,User,\n"
+)
+
+
+def _hash_password(password: str) -> bytes:
+    """Hashes one password, runs in the worker threads."""
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+
+
+def hash_passwords(passwords: list, workers: int | None = None) -> list:
+    """Hashes many passwords with bcrypt in parallel.
+
+    Args:
+        passwords (list): Plain text passwords.
+        workers (int | None): Number of threads, default: PASSWORD_HASH_WORKERS of the settings; at most the number of cores.
+
+    Returns:
+        list: The hashes in the order of passwords.
+    """
+    workers = min(workers or get_settings().password_hash_workers or 1, os.cpu_count() or 1)
+    if len(passwords) < MIN_PARALLEL or workers == 1:
+        return [_hash_password(pw) for pw in passwords]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt") as pool:
+        return list(pool.map(_hash_password, passwords))
+
+
+def existing_usernames(conn, usernames) -> set:
+    """Returns the usernames that already exist, with one query per MAX_PARAMS names.
+
+    Args:
+        conn (pyodbc.Connection): Open connection.
+        usernames (iterable): Usernames to check.
+
+    Returns:
+        set: The usernames found in the table users.
+    """
+    found = set()
+    c = conn.cursor()
+    for batch in chunked(list(usernames), MAX_PARAMS):
+        c.execute(f"SELECT username FROM users WHERE username IN ({', '.join('?' * len(batch))})", batch)
+        found.update(row[0] for row in c.fetchall())
+    return found
+
+
+def onboard_users(file, sortkey: int, manager_ID: int | None, workers: int | None = None) -> dict:
+    """Creates all valid users of a CSV file.
+
+    Args:
+        file: Path or file-like object of the CSV file (see USER_COLUMNS).
+        sortkey (int): Sortkey of the current user, only roles below it can be created.
+        manager_ID (int | None): Manager of all new users (for managers); None to take the column manager_ID (for admins).
+        workers (int | None): Threads for hashing, default: PASSWORD_HASH_WORKERS of the settings.
+
+    Returns:
+        dict: rows, created, errors (list of (line, error)) and the duration in seconds.
+
+    Raises:
+        ValueError: If required columns are missing or the file has too many rows.
+        RuntimeError: If there is no connection to the database.
+    """
+    t0 = time.perf_counter()
+    df = pd.read_csv(file, dtype=str, keep_default_na=False, skipinitialspace=True)
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    if len(df) > MAX_USERS:
+        raise ValueError(f"At most {MAX_USERS} users can be imported at once.")
+    df = df.reindex(columns=USER_COLUMNS, fill_value="").astype(str).apply(lambda col: col.str.strip())
+    df["role"] = df["role"].replace("", DEFAULT_ROLE)
+
+    allowed_roles = {name for name, _ in roles_below(sortkey)}
+    errors = []
+    candidates = []
+    seen = set()
+    for i, row in df.iterrows():
+        line = int(i) + 2
+        if not row.username or not row.password:
+            errors.append((line, "username and password are required"))
+        elif row.username in seen:
+            errors.append((line, f"username '{row.username}' appears more than once in the file"))
+        elif row.role not in allowed_roles:
+            errors.append((line, f"you are not allowed to add the role '{row.role}'"))
+        elif manager_ID is None and row.manager_ID and not row.manager_ID.isdigit():
+            errors.append((line, "manager_ID must be a number"))
+        else:
+            seen.add(row.username)
+            user_manager = manager_ID if manager_ID is not None else (int(row.manager_ID) if row.manager_ID else None)
+            candidates.append((line, row.username, row.email, row.password, row.role, user_manager))
+
+    conn = connect()
+    if conn is None:
+        raise RuntimeError("No connection to the database.")
+
+    try:
+        # collisions with existing users, one query for the whole file
+        taken = existing_usernames(conn, [cand[1] for cand in candidates])
+        errors.extend((line, f"username '{username}' exists already")
+                      for line, username, *_ in candidates if username in taken)
+        candidates = [cand for cand in candidates if cand[1] not in taken]
+
+        hashes = hash_passwords([cand[3] for cand in candidates], workers)
+        rows = [(username, hashed, email, role, user_manager)
+                for (_, username, email, _, role, user_manager), hashed in zip(candidates, hashes)]
+
+        # all users in one transaction
+        try:
+            executemany_fast(conn, "INSERT INTO users (username, password, email, role, manager_ID) VALUES (?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            errors.extend((cand[0], f"not created, the import failed: {e}") for cand in candidates)
+            rows = []
+    finally:
+        conn.close()
+
+    if rows:
+        invalidate("users")
+    errors.sort()
+    return {"rows": len(df), "created": len(rows), "errors": errors, "duration_s": round(time.perf_counter() - t0, 2)}
+
+
+def bulk_user_dropdown(title: str = "Import users", admin: bool = False):
+    """Dropdown in Streamlit to create many users from a CSV file, accessible by managers and admins.
+    Users imported by a manager are assigned to this manager; admins give the manager_ID per row.
+
+    Args:
+        title (str): The title of the dropdown.
+        admin (bool): Use the column manager_ID instead of the current user as manager.
+
+    Returns:
+        None
+    """
+    if "role_sortkey" not in st.session_state:
+        st.warning("You're not authorized to add new users")
+        return
+
+    with st.expander(title, expanded=False):
+        st.caption(
+            f"One user per row with the columns {', '.join(USER_COLUMNS)}. "
+            f"An empty role creates a '{DEFAULT_ROLE}'"
+            + (", manager_ID is the ID of the user's manager." if admin else ", manager_ID is ignored.")
+        )
+        st.download_button("Download template", TEMPLATE_CSV, file_name="user_import_template.csv", mime="text/csv",
+                           key="user_import_template")
+        uploaded = st.file_uploader("CSV file", type=["csv"], key="user_import_file")
+
+        if uploaded is None or not st.button("Import users", type="primary", key="user_import_start"):
+            return
+
+        manager_ID = None if admin else int(st.session_state["user_ID"])
+        with st.spinner("Creating users..."):
+            try:
+                report = onboard_users(uploaded, st.session_state["role_sortkey"], manager_ID)
+            except (ValueError, RuntimeError) as e:
+                st.error(f"Import failed: {e}")
+                return
+
+        st.success(f"Created {report['created']} of {report['rows']} users in {report['duration_s']} s.")
+        if report["errors"]:
+            st.warning(f"{len(report['errors'])} rows were not imported:")
+            st.dataframe(pd.DataFrame(report["errors"], columns=["line", "error"]), hide_index=True)
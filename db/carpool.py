@@ -0,0 +1,267 @@
+"""carpool.py contains the grouping of upcoming car trips with common routes: trips of a manager whose origins and
+destinations are close to each other and which depart within a few days are proposed as one shared travel plan,
+so the participants fill fewer cars and the route is priced once instead of once per trip.
+
+The endpoints are geocoded (offline table first, see api_city_lookup.get_coords_batch()) and put into grid cells
+of the size of the search radius, so a trip is compared only with the trips in the neighbouring cells. The trips
+are swept in the order of their departure; a trip joins the open group whose first trip (the anchor) departs at
+most window_days earlier and whose origin and destination are both within radius_km, otherwise it opens a new
+group. Groups that need fewer cars than their trips on their own are priced with one Directions query of the
+anchor route, which is cached (api_transportation.cached_directions()).
+
+Only trips planned by car (method_transport = 0) are considered; public transport is paid per person, so sharing
+it does not save anything.
+"""
+
+import math
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
+from itertools import product
+
+import streamlit as st
+from api.api_city_lookup import get_coords_batch
+from api.api_transportation import cached_directions, calculate_costs_auto
+from db.db_functions_trips import connect
+from db.query_cache import cached_query
+
+CARPOOL_TRIPS_SQL = """
+    SELECT t.trip_ID, t.origin, t.destination, t.start_date, t.start_time, COUNT(ut.user_ID) AS participants
+    FROM trips t
+    LEFT JOIN user_trips ut ON ut.trip_ID = t.trip_ID
+    WHERE t.manager_ID = ?
+    AND t.start_date >= CAST(GETDATE() AS DATE)
+    AND t.show_trip_m = 1
+    AND t.method_transport = 0
+    GROUP BY t.trip_ID, t.origin, t.destination, t.start_date, t.start_time
+"""
+
+SEATS_PER_CAR = 4
+DEFAULT_RADIUS_KM = 10
+DEFAULT_WINDOW_DAYS = 0
+# road distance per straight-line distance, used when the route cannot be queried
+ROAD_FACTOR = 1.3
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+@dataclass(frozen=True)
+class PlannedTrip:
+    """An upcoming car trip with its geocoded endpoints."""
+
+    trip_ID: int
+    origin: str
+    destination: str
+    start_date: date
+    start_time: str
+    participants: int
+    origin_coords: tuple
+    destination_coords: tuple
+
+
+def haversine_km(a: tuple, b: tuple) -> float:
+    """Returns the great-circle distance in km between two (lat, lon) points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def _grid(trips: list, radius_km: float):
+    """Returns a function that maps (lat, lon) to its grid cell (row, column) with cells of radius_km.
+
+    Longitudes are scaled with the cosine of the highest latitude of the trips, so two points within radius_km
+    are never more than one cell apart and the 3 x 3 neighbouring cells contain all candidates.
+    """
+    max_lat = max(abs(coords[0]) for trip in trips for coords in (trip.origin_coords, trip.destination_coords))
+    lat_step = radius_km / KM_PER_DEGREE
+    lon_step = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(max_lat)), 0.01))
+
+    def cell(coords: tuple) -> tuple:
+        return math.floor(coords[0] / lat_step), math.floor(coords[1] / lon_step)
+
+    return cell
+
+
+def _neighbours(cell: tuple) -> list:
+    return [(cell[0] + dr, cell[1] + dc) for dr, dc in product((-1, 0, 1), repeat=2)]
+
+
+def group_trips(trips: list, radius_km: float = DEFAULT_RADIUS_KM, window_days: int = DEFAULT_WINDOW_DAYS) -> list:
+    """Groups trips with nearby origins and destinations that depart within window_days of each other.
+
+    Args:
+        trips (list): PlannedTrips.
+        radius_km (float): Maximal distance of the origin and of the destination to those of the anchor trip.
+        window_days (int): Maximal number of days between the departure of the anchor and of the other trips.
+
+    Returns:
+        list: Groups (lists of PlannedTrips, the anchor first) with at least two trips, ordered by departure.
+    """
+    if not trips:
+        return []
+    cell = _grid(trips, radius_km)
+    trips = sorted(trips, key=lambda trip: (trip.start_date, trip.start_time or "", trip.trip_ID))
+
+    buckets = {}      # (origin cell, destination cell) of the anchor -> open groups
+    open_groups = deque()  # (anchor, key, group) in the order of the anchors' departure
+    groups = []
+    for trip in trips:
+        # groups whose anchor departs too early for this trip cannot take any later trip either
+        while open_groups and (trip.start_date - open_groups[0][0].start_date).days > window_days:
+            _, key, group = open_groups.popleft()
+            buckets[key].remove(group)
+
+        origin_cell, destination_cell = cell(trip.origin_coords), cell(trip.destination_coords)
+        match = None
+        for key in product(_neighbours(origin_cell), _neighbours(destination_cell)):
+            for group in buckets.get(key, ()):
+                anchor = group[0]
+                if (haversine_km(anchor.origin_coords, trip.origin_coords) <= radius_km
+                        and haversine_km(anchor.destination_coords, trip.destination_coords) <= radius_km):
+                    if match is None or anchor.start_date < match[0].start_date:
+                        match = group
+        if match is not None:
+            match.append(trip)
+            continue
+
+        group = [trip]
+        key = (origin_cell, destination_cell)
+        buckets.setdefault(key, []).append(group)
+        open_groups.append((trip, key, group))
+        groups.append(group)
+
+    return [group for group in groups if len(group) > 1]
+
+
+def cars_needed(participants: int, seats: int = SEATS_PER_CAR) -> int:
+    """Returns the number of cars for a number of participants, at least one per trip."""
+    return max(1, math.ceil(participants / seats))
+
+
+def plan_group(group: list, seats: int = SEATS_PER_CAR) -> dict | None:
+    """Prices the shared travel plan of a group with one route query for the route of its anchor.
+
+    Args:
+        group (list): PlannedTrips as returned by group_trips(), the anchor first.
+        seats (int): Seats per car.
+
+    Returns:
+        dict: trips, participants, cars_separate, cars_shared, distance_km, estimated (no route available),
+        cost_separate, cost_shared and savings in CHF; None if sharing does not save a car.
+    """
+    participants = sum(trip.participants for trip in group)
+    cars_separate = sum(cars_needed(trip.participants, seats) for trip in group)
+    cars_shared = cars_needed(participants, seats)
+    if cars_shared >= cars_separate:
+        return None
+
+    anchor = group[0]
+    distance_km, estimated = None, False
+    try:
+        routes = cached_directions(anchor.origin, anchor.destination, mode="driving")
+        if routes and routes[0]["legs"]:
+            distance_km = routes[0]["legs"][0]["distance"]["value"] / 1000
+    except Exception:
+        pass
+    if distance_km is None:
+        distance_km = haversine_km(anchor.origin_coords, anchor.destination_coords) * ROAD_FACTOR
+        estimated = True
+
+    cost_per_car = calculate_costs_auto(distance_km)["total"]
+    return {
+        "trips": group,
+        "participants": participants,
+        "cars_separate": cars_separate,
+        "cars_shared": cars_shared,
+        "distance_km": distance_km,
+        "estimated": estimated,
+        "cost_separate": cars_separate * cost_per_car,
+        "cost_shared": cars_shared * cost_per_car,
+        "savings": (cars_separate - cars_shared) * cost_per_car,
+    }
+
+
+def propose_carpools(manager_ID: int, radius_km: float = DEFAULT_RADIUS_KM,
+                     window_days: int = DEFAULT_WINDOW_DAYS) -> list | None:
+    """Returns the shared travel plans for the upcoming car trips of a manager, cached until trips or
+    participants change.
+
+    Args:
+        manager_ID (int): ID of the manager.
+        radius_km (float): See group_trips().
+        window_days (int): See group_trips().
+
+    Returns:
+        list | None: Plans as returned by plan_group(), the largest savings first; None without a connection.
+    """
+    def load():
+        conn = connect()
+        if conn is None:
+            return None
+        try:
+            c = conn.cursor()
+            c.execute(CARPOOL_TRIPS_SQL, (manager_ID,))
+            rows = c.fetchall()
+        finally:
+            conn.close()
+
+        # every distinct city once, offline coordinates first
+        coords = get_coords_batch([name for row in rows for name in (row.origin, row.destination)])
+        trips = [
+            PlannedTrip(int(row.trip_ID), row.origin, row.destination, row.start_date,
+                        str(row.start_time)[:5] if row.start_time else "", int(row.participants),
+                        coords[row.origin], coords[row.destination])
+            for row in rows
+            if coords.get(row.origin) and coords.get(row.destination)
+        ]
+        plans = [plan for plan in map(plan_group, group_trips(trips, radius_km, window_days)) if plan]
+        return sorted(plans, key=lambda plan: plan["savings"], reverse=True)
+
+    return cached_query(CARPOOL_TRIPS_SQL, (manager_ID, radius_km, window_days), ("trips", "user_trips"), load)
+
+
+def carpool_dropdown(title: str = "Shared routes"):
+    """This function creates the expander with the carpool proposals for the upcoming car trips of the manager.
+    The proposals are computed on click, geocoding unknown cities can take a second per city.
+
+    Args:
+        title (str): The title of the expander.
+
+    Returns:
+        None
+    """
+    with st.expander(title, expanded=False):
+        col1, col2 = st.columns(2)
+        radius_km = col1.number_input("Max. distance of origins and destinations (km)", min_value=1, max_value=100,
+                                      value=DEFAULT_RADIUS_KM, key="carpool_radius")
+        window_days = col2.number_input("Max. days between departures", min_value=0, max_value=14,
+                                        value=DEFAULT_WINDOW_DAYS, key="carpool_window")
+
+        if st.button("Find shared routes", key="carpool_find"):
+            st.session_state["carpool_params"] = (int(radius_km), int(window_days))
+        if st.session_state.get("carpool_params") != (int(radius_km), int(window_days)):
+            return
+
+        with st.spinner("Grouping trips..."):
+            plans = propose_carpools(int(st.session_state["user_ID"]), int(radius_km), int(window_days))
+        if plans is None:
+            return
+        if not plans:
+            st.info("No upcoming car trips share a route closely enough to save a car.")
+            return
+
+        st.metric("Possible savings (CHF)", f"{sum(plan['savings'] for plan in plans):,.2f}")
+        for plan in plans:
+            anchor = plan["trips"][0]
+            distance = f"~{plan['distance_km']:.0f} km" if plan["estimated"] else f"{plan['distance_km']:.0f} km"
+            st.markdown(
+                f"**{anchor.origin} → {anchor.destination}** ({distance}): {len(plan['trips'])} trips, "
+                f"{plan['participants']} participants in {plan['cars_shared']} instead of {plan['cars_separate']} "
+                f"cars, saves CHF {plan['savings']:,.2f}"
+            )
+            st.dataframe(
+                [{"Trip": trip.trip_ID, "Origin": trip.origin, "Destination": trip.destination,
+                  "Departure": f"{trip.start_date} {trip.start_time}".strip(), "Participants": trip.participants}
+                 for trip in plan["trips"]],
+                hide_index=True,
+            )
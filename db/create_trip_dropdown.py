@@ -8,14 +8,14 @@ import time
 import streamlit as st
 import pandas as pd
 from api.api_transportation import transportation_managerview
-from db.db_functions_trips import add_trip
-from sqlalchemy import create_engine
-import urllib
-from utils import load_secrets
+from db.db_functions_trips import add_trip, connect
+from db.trip_conflicts import trip_window, find_conflicts, conflict_label, describe_trips
+from db.query_cache import read_sql_cached
+from db.db_roles import role_filter
+from settings import get_settings
+from db.query_log import get_engine
 
-CONNECTION_STRING = load_secrets()
-connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(CONNECTION_STRING)
-engine = create_engine(connect_uri, fast_executemany=True)
+CONNECTION_STRING = get_settings().db.connection_string
 
 
 def create_trip_dropdown(title: str = "Create new trip"): 
@@ -63,6 +63,11 @@ def create_trip_dropdown(title: str = "Create new trip"):
 
     with st.expander(title, expanded=False):
 
+        # double bookings of the trip created in the last run, shown once after its rerun
+        conflict_notice = st.session_state.pop("trip_conflict_notice", None)
+        if conflict_notice:
+            st.warning(conflict_notice)
+
         # Trip Form: details => users => API key => comparison => transport choice => invite
         with st.form("Create a trip", clear_on_submit=False):
 
@@ -78,23 +83,30 @@ def create_trip_dropdown(title: str = "Create new trip"):
             occasion = st.text_input("Occasion", key="trip_occasion")
             manager_ID = int(st.session_state["user_ID"])
             
-            user_df = pd.read_sql_query("""
+            role_sql, role_params = role_filter(3)
+            user_df = read_sql_cached(f"""
                 SELECT u.user_ID, u.username FROM users u 
-                JOIN roles r ON u.role = r.role 
-                WHERE r.sortkey < 3
+                WHERE {role_sql}
                 AND u.manager_ID = ? 
-                ORDER BY username""", engine, params=(manager_ID,),
+                ORDER BY username""", get_engine(), params=(*role_params, manager_ID), tags=("users",),
             )
 
             options = list(zip(user_df["user_ID"], user_df["username"]))
-            selected = st.multiselect("Assign users", options=options, format_func=lambda x: x[1], key="trip_users")
+
+            # employees already travelling in this period are marked; inside the form the dates are the
+            # ones of the last submit (e.g. "Do the comparison")
+            window = trip_window(start_date, end_date, start_time, end_time)
+            conflicts = find_conflicts(manager_ID, connect, user_df["user_ID"], window)
+            selected = st.multiselect("Assign users", options=options, format_func=lambda x: conflict_label(x[1], conflicts.get(x[0])), key="trip_users")
             user_ids = [opt[0] for opt in selected]
+            if conflicts:
+                st.caption(f"⚠️ {len(conflicts)} employee(s) already travel between departure and return.")
 
             # 2) API-Key and comparison
             st.markdown("---")
             st.subheader("Method of Transport")
 
-            api_key = st.secrets["GOOGLE_API_KEY"]
+            api_key = get_settings().google_api_key
 
             compare_clicked = st.form_submit_button("Do the comparison", type="secondary")
 
@@ -147,9 +159,18 @@ def create_trip_dropdown(title: str = "Create new trip"):
                 transport_choice = st.session_state.get("trip_transport_method", "Car")
                 method_transport = 0 if transport_choice == "Car" else 1
 
+                # checked before add_trip, afterwards the new trip would conflict with itself
+                window = trip_window(start_date, end_date, start_time_val, end_time_val)
+                conflicts = find_conflicts(manager_ID, connect, user_ids, window)
+                usernames = dict(selected)
+
                 # call add_trip with values from session_state
                 try:
                     add_trip(origin, destination, start_date, end_date, start_time_str, end_time_str, occasion, manager_ID, user_ids, method_transport)
+                    if conflicts:
+                        st.session_state["trip_conflict_notice"] = "Double-booked: " + "; ".join(
+                            f"{usernames.get(uid, uid)} is also on {describe_trips(trips)}" for uid, trips in conflicts.items()
+                        )
                     # request a safe clear before the next widgets are created and rerun
                     st.session_state["trip_clear_requested"] = True
                     st.session_state["transport_comparison_done"] = False
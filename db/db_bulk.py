@@ -0,0 +1,90 @@
+"""db_bulk.py contains helpers for batched writes to the Azure SQL database. They are used by the tools and
+forms that create many rows at once (load test data, bulk imports), instead of one INSERT per row."""
+
+# SQL Server accepts at most 2100 parameters per statement
+MAX_PARAMS = 2000
+BATCH_SIZE = 10_000
+
+
+def chunked(rows, size: int):
+    """Yields consecutive slices of rows with at most size elements.
+
+    Args:
+        rows (list): The rows to split.
+        size (int): Maximal length of a slice.
+
+    Returns:
+        generator of lists
+    """
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def executemany_fast(conn, sql: str, rows: list, batch_size: int = BATCH_SIZE):
+    """Runs an INSERT/UPDATE/DELETE statement for many parameter rows with pyodbc's fast_executemany,
+    which sends each batch as one parameter array instead of one round trip per row. Nothing is committed here.
+
+    Args:
+        conn (pyodbc.Connection): Open connection, the caller commits or rolls back.
+        sql (str): Statement with ? placeholders.
+        rows (list): List of parameter tuples.
+        batch_size (int): Number of rows sent per executemany call.
+
+    Returns:
+        None
+    """
+    if not rows:
+        return
+    c = conn.cursor()
+    c.fast_executemany = True
+    for batch in chunked(rows, batch_size):
+        c.executemany(sql, batch)
+    c.close()
+
+
+def insert_returning_ids(conn, table: str, columns: list, rows: list, id_column: str) -> list:
+    """Inserts many rows and returns their generated identity values in the order of rows.
+
+    A plain multi-row INSERT ... OUTPUT does not guarantee the order of the returned IDs. Therefore the rows are
+    inserted with MERGE ... ON 1 = 0, which can output the row number of the source row next to the new ID.
+    Each statement carries as many rows as fit into the parameter limit. Nothing is committed here.
+
+    Args:
+        conn (pyodbc.Connection): Open connection, the caller commits or rolls back.
+        table (str): Target table.
+        columns (list): Names of the inserted columns.
+        rows (list): List of tuples with one value per column.
+        id_column (str): Identity column of the table.
+
+    Returns:
+        list: The new identity values, ids[i] belongs to rows[i].
+    """
+    if not rows:
+        return []
+
+    col_list = ", ".join(columns)
+    src_list = ", ".join(f"src.{col}" for col in columns)
+    placeholders = "(" + ", ".join(["?"] * (len(columns) + 1)) + ")"
+    rows_per_statement = max(1, MAX_PARAMS // (len(columns) + 1))
+
+    ids = [None] * len(rows)
+    c = conn.cursor()
+    for offset in range(0, len(rows), rows_per_statement):
+        batch = rows[offset:offset + rows_per_statement]
+        params = []
+        for i, row in enumerate(batch):
+            params.append(offset + i)
+            params.extend(row)
+
+        c.execute(f"""
+            MERGE INTO {table} AS t
+            USING (VALUES {", ".join([placeholders] * len(batch))}) AS src (rn, {col_list})
+            ON 1 = 0
+            WHEN NOT MATCHED THEN
+                INSERT ({col_list}) VALUES ({src_list})
+            OUTPUT src.rn, INSERTED.{id_column};
+        """, params)
+        for rn, new_id in c.fetchall():
+            ids[rn] = new_id
+    c.close()
+    return ids
@@ -8,20 +8,62 @@ from api.api_city_lookup import get_city_coords
 from ml.ml_model import retrain_model
 from db.expenses_user import insert_expense_for_training
 from datetime import date, datetime, time as dtime
-from geopy.distance import geodesic
 #from api.weather import weather_widget
 from api.api_transportation import show_transportation_details
 from api.api_weather import show_trip_weather
-from sqlalchemy import create_engine
-import urllib
+from tracing import traced
 from api.api_news import news_widget
-from utils import load_secrets
-
-
-CONNECTION_STRING = load_secrets()
-connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(CONNECTION_STRING)
-engine = create_engine(connect_uri, fast_executemany=True)
-
+from db.pagination import paginated_trips
+from db.query_cache import read_sql_cached, invalidate
+from settings import get_settings
+from db.query_log import logged_connect, get_engine
+
+
+CONNECTION_STRING = get_settings().db.connection_string
+
+# Queries of the employee list views, also run by index_advisor.py to check their plans. They are keyset
+# pagination templates (see db/pagination.py): TOP (?) is the page size, {keyset} the start of the page
+EMPLOYEE_UPCOMING_TRIPS_SQL = """
+    SELECT TOP (?)
+    t.trip_ID,
+    t.origin,
+    t.destination,
+    t.start_date,
+    t.end_date,
+    t.start_time,
+    t.end_time,
+    t.occasion,
+    t.show_trip_e
+    FROM trips t
+    JOIN user_trips ut ON t.trip_ID = ut.trip_ID
+    WHERE ut.user_ID = ?
+    AND ? <= t.end_date
+    AND t.show_trip_e = 1
+    {keyset}
+    ORDER BY t.start_date ASC, t.trip_ID ASC
+"""
+
+EMPLOYEE_PAST_TRIPS_SQL = """
+    SELECT TOP (?)
+    t.trip_ID,
+    t.origin,
+    t.destination,
+    t.start_date,
+    t.end_date,
+    t.start_time,
+    t.end_time,
+    t.occasion,
+    t.show_trip_e
+    FROM trips t
+    JOIN user_trips ut ON t.trip_ID = ut.trip_ID
+    WHERE ut.user_ID = ?
+    AND ? > t.end_date
+    AND t.show_trip_e = 1
+    {keyset}
+    ORDER BY t.start_date ASC, t.trip_ID ASC
+"""
+
+@traced("db", "connect")
 def connect():
     """Connects to Azure SQL-database.
     
@@ -32,7 +74,7 @@ def connect():
         None
     """
     try:
-        conn = pyodbc.connect(CONNECTION_STRING)
+        conn = logged_connect(CONNECTION_STRING)
         return conn
     except pyodbc.Error as ex:
         sqlstate = ex.args[0]
@@ -43,6 +85,7 @@ def connect():
 def employee_listview():
     """
     Returns all trips assigned to a given user (employee) using the user_trips mapping table.
+    The trips are shown page by page, details are only loaded for opened trips.
     Args:
         None
     Returns:
@@ -63,24 +106,10 @@ def employee_listview():
         st.error("Could not connect to the database.")
         return
     try:
-        trip_df = pd.read_sql_query("""
-            SELECT 
-            t.trip_ID,
-            t.origin,
-            t.destination,
-            t.start_date,
-            t.end_date,
-            t.start_time,
-            t.end_time,
-            t.occasion,
-            t.show_trip_e
-            FROM trips t
-            JOIN user_trips ut ON t.trip_ID = ut.trip_ID
-            WHERE ut.user_ID = ?
-            AND ? <= t.end_date
-            AND t.show_trip_e = 1
-            ORDER BY t.start_date ASC
-            """, engine, params=(user_id, date.today()))
+        trip_df, render_navigation = paginated_trips(
+            "employee_upcoming", get_engine(), EMPLOYEE_UPCOMING_TRIPS_SQL, (user_id, date.today()), alias="t",
+            tags=("trips", "user_trips"),
+        )
     
     except pd.io.sql.DatabaseError as e:
         st.error(f"Error fetching trips from database: {e}")
@@ -111,10 +140,11 @@ def employee_listview():
         trip_id = row.trip_ID
         is_active = wiz["active_trip_id"] == trip_id
 
-        with st.expander(
+        trip_expander = st.expander(
             f"{row.trip_ID}: - {row.origin} → {row.destination} ({row.start_date} → {row.end_date})",
-            expanded=is_active,
-        ):
+            expanded=is_active, key=f"employee_trip_{trip_id}", on_change="rerun",
+        )
+        with trip_expander:
 
             destination = row.destination
 
@@ -126,6 +156,10 @@ def employee_listview():
                 st.markdown(f"**Start Time:** {row.start_time}")
                 st.markdown(f"**End Time:** {row.end_time}")
 
+            # weather, participants, transport and news are only loaded for the opened trip
+            if not trip_expander.open:
+                continue
+
             with c2:
                 show_trip_weather(
                     destination=row.destination,
@@ -135,13 +169,13 @@ def employee_listview():
 
             #load participants into table
             try:
-                participants = pd.read_sql_query("""
+                participants = read_sql_cached("""
                     SELECT u.username, u.email
                     FROM users u
                     JOIN user_trips ut ON ut.user_ID = u.user_ID
                     WHERE ut.trip_ID = ?
                     ORDER BY u.username
-                """, engine, params=(row.trip_ID,))
+                """, get_engine(), params=(row.trip_ID,), tags=("users", "user_trips"))
 
                 st.markdown("**Participants:**")
                 st.dataframe(participants, hide_index=True)
@@ -152,9 +186,9 @@ def employee_listview():
             st.markdown("Transportation Details")
 
             #Transport method loading
-            method_row = pd.read_sql_query("""
+            method_row = read_sql_cached("""
                 SELECT method_transport FROM trips WHERE trip_ID = ?
-            """, engine, params=(row.trip_ID,))
+            """, get_engine(), params=(row.trip_ID,), tags=("trips",))
 
             method_transport = method_row.iloc[0]["method_transport"] if not method_row.empty else None
 
@@ -171,10 +205,13 @@ def employee_listview():
             except Exception as e:
                 st.error(f"Error: {e}")
 
+    render_navigation()
+
 
 def past_trip_view_employee():
     """
     Returns all past trips assigned to a given user (employee) using the user_trips mapping table. Also adds the expense report wizard.
+    The trips are shown page by page, participants and the wizard are only rendered for opened trips.
     
     Args:
         None
@@ -195,24 +232,10 @@ def past_trip_view_employee():
         return
         
     try:
-        trip_df = pd.read_sql_query("""
-            SELECT 
-            t.trip_ID,
-            t.origin,
-            t.destination,
-            t.start_date,
-            t.end_date,
-            t.start_time,
-            t.end_time,
-            t.occasion,
-            t.show_trip_e
-            FROM trips t
-            JOIN user_trips ut ON t.trip_ID = ut.trip_ID
-            WHERE ut.user_ID = ?
-            AND ? > end_date                      
-            AND t.show_trip_e = 1
-            ORDER BY t.start_date ASC
-            """, engine, params=(user_id, date.today()))
+        trip_df, render_navigation = paginated_trips(
+            "employee_past", get_engine(), EMPLOYEE_PAST_TRIPS_SQL, (user_id, date.today()), alias="t",
+            tags=("trips", "user_trips"),
+        )
 
     except pd.io.sql.DatabaseError as e:
         st.error(f"Error fetching past trips from database: {e}")
@@ -245,10 +268,11 @@ def past_trip_view_employee():
         trip_id = row.trip_ID
         is_active = wiz["active_trip_id"] == trip_id
         
-        with st.expander(
+        trip_expander = st.expander(
             f"{row.trip_ID}: - {row.origin} → {row.destination} ({row.start_date} → {row.end_date})",
-            expanded=is_active
-        ):
+            expanded=is_active, key=f"employee_past_trip_{trip_id}", on_change="rerun"
+        )
+        with trip_expander:
             #list details
             st.markdown(f"**Occasion:** {row.occasion}")
             st.markdown(f"**Start Date:** {row.start_date}")
@@ -256,16 +280,20 @@ def past_trip_view_employee():
             st.markdown(f"**Start Time:** {row.start_time}")
             st.markdown(f"**End Time:** {row.end_time}")
 
+            # participants and the expense report are only loaded for the opened trip
+            if not (trip_expander.open or is_active):
+                continue
+
             #load participants into table
 
             try:
-                participants = pd.read_sql_query("""
+                participants = read_sql_cached("""
                     SELECT u.username, u.email
                     FROM users u
                     JOIN user_trips ut ON ut.user_ID = u.user_ID
                     WHERE ut.trip_ID = ?
                     ORDER BY u.username
-                """, engine, params=(row.trip_ID,))
+                """, get_engine(), params=(row.trip_ID,), tags=("users", "user_trips"))
 
                 st.markdown("**Participants:**")
                 st.dataframe(participants, hide_index=True)
@@ -384,6 +412,7 @@ def past_trip_view_employee():
                     dest_coords = get_city_coords(dest_city)
 
                     if origin_coords and dest_coords:
+                        from geopy.distance import geodesic
                         distance_km = geodesic(
                             origin_coords, dest_coords
                         ).km
@@ -441,6 +470,7 @@ def past_trip_view_employee():
                             AND CAST(GETDATE() AS DATE) > end_date
                         """, (trip_id,))
                         conn.commit()
+                        invalidate("trips")
                         st.success("Archived past trips!")
                         time.sleep(2)
                     except pyodbc.Error as e:
@@ -457,3 +487,5 @@ def past_trip_view_employee():
                         if conn:
                             conn.close()
                         st.rerun()
+
+    render_navigation()
@@ -8,18 +8,79 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 from api.api_city_lookup import get_city_coords
-from geopy.distance import geodesic
-from ml.ml_model import load_model, get_tier
+from ml.ml_model import predict_cost
+from ml.tiers import get_tier
 from api.api_transportation import transportation_managerview
-from sqlalchemy import create_engine
-from utils import load_secrets
-import urllib
-
-CONNECTION_STRING = load_secrets()
-connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(CONNECTION_STRING)
-engine = create_engine(connect_uri, fast_executemany=True)
-
-
+from db.pagination import paginated_trips
+from db.query_cache import read_sql_cached, invalidate
+from db.db_bulk import MAX_PARAMS, chunked, executemany_fast
+from db.trip_conflicts import trip_window, find_conflicts, conflict_label
+from settings import get_settings
+from db.query_log import logged_connect, get_engine
+from tracing import traced
+
+CONNECTION_STRING = get_settings().db.connection_string
+
+# Queries of the manager list views, also run by index_advisor.py to check their plans. They are keyset
+# pagination templates (see db/pagination.py): TOP (?) is the page size, {keyset} the start of the page
+MANAGER_UPCOMING_TRIPS_SQL = """
+    SELECT TOP (?) trip_ID, origin, destination, start_date, end_date, start_time, end_time, occasion, method_transport
+    FROM trips
+    WHERE manager_ID = ?
+    AND CAST(GETDATE() AS DATE) <= end_date
+    AND show_trip_m = 1
+    {keyset}
+    ORDER BY start_date, trip_ID
+"""
+
+MANAGER_PAST_TRIPS_SQL = """
+    SELECT TOP (?) trip_ID, origin, destination, start_date, end_date, start_time, end_time, occasion
+    FROM trips
+    WHERE manager_ID = ?
+    AND CAST(GETDATE() AS DATE) > end_date
+    AND show_trip_m = 1
+    {keyset}
+    ORDER BY start_date, trip_ID
+"""
+
+# Managed indexes (name, table, definition) for the predicates of the queries above. They are created by
+# create_trip_table()/create_trip_users_table() if missing. To change one, give it a new name and add
+# the old name to DROPPED_INDEXES.
+TRIP_INDEXES = [
+    # manager list views: seek on manager and visibility, rows already in page order (start_date, trip_ID),
+    # so TOP (?) stops after one page; no key lookups
+    ("ix_trips_manager_page", "trips",
+     "(manager_ID, show_trip_m, start_date) INCLUDE (origin, destination, end_date, start_time, end_time, occasion, method_transport)"),
+    # employee list views: trips reached through user_trips, filtered on visibility and end_date
+    ("ix_trips_employee_list", "trips",
+     "(show_trip_e, end_date) INCLUDE (origin, destination, start_date, start_time, end_time, occasion)"),
+    # archival and purge of maintenance.py: range on end_date over all managers
+    ("ix_trips_retention", "trips", "(end_date) INCLUDE (show_trip_m, show_trip_e, auto_archived)"),
+]
+
+USER_TRIPS_INDEXES = [
+    # participants of a trip without key lookups for user_ID
+    ("ix_user_trips_trip_user", "user_trips", "(trip_ID) INCLUDE (user_ID)"),
+    ("ix_user_trips_user", "user_trips", "(user_ID)"),
+]
+
+# superseded indexes, dropped during the schema bootstrap
+DROPPED_INDEXES = [
+    ("ix_user_trips_trip", "user_trips"),
+    ("ix_trips_manager_list", "trips"),
+    ("ix_trips_maintenance", "trips"),
+]
+
+TRIP_PARTICIPANTS_SQL = """
+    SELECT u.username, u.email
+    FROM users u
+    JOIN user_trips ut ON ut.user_ID = u.user_ID
+    WHERE ut.trip_ID = ?
+    ORDER BY u.username
+"""
+
+
+@traced("db", "connect")
 def connect():
     """Connects to Azure SQL-database.
     
@@ -30,7 +91,7 @@ def connect():
         None
     """
     try:
-        conn = pyodbc.connect(CONNECTION_STRING)
+        conn = logged_connect(CONNECTION_STRING)
         return conn
     except pyodbc.Error as ex: # raises error in case the connection is not possible
         sqlstate = ex.args[0]
@@ -38,9 +99,39 @@ def connect():
         return None
 
 
+def ensure_indexes(c, indexes: list):
+    """Creates all given indexes which don't exist yet and drops the superseded ones of the same tables.
+
+    Args:
+        c (pyodbc.Cursor): Cursor of an open connection, the caller commits.
+        indexes (list): Tuples (name, table, definition) like TRIP_INDEXES.
+
+    Returns:
+        None
+    """
+    for name, table, definition in indexes:
+        c.execute(f"""
+            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+            BEGIN
+                CREATE INDEX {name} ON {table}{definition};
+            END
+        """)
+
+    # dropped only after the replacements exist
+    tables = {table for _, table, _ in indexes}
+    for name, table in DROPPED_INDEXES:
+        if table in tables:
+            c.execute(f"""
+                IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+                BEGIN
+                    DROP INDEX {name} ON {table};
+                END
+            """)
+
+
 def create_trip_table():
     """This function creates the 'trips' table in the database if it doesn't exists already
-    with all necessary columns.
+    with all necessary columns and the indexes for the list views (TRIP_INDEXES).
     
     Args:
         None
@@ -69,13 +160,30 @@ def create_trip_table():
                     manager_ID INT,
                     show_trip_m INT NOT NULL DEFAULT 1,
                     show_trip_e INT NOT NULL DEFAULT 1,
-                    method_transport INTEGER      -- 0 = Car, 1 = Public transport
+                    method_transport INTEGER,     -- 0 = Car, 1 = Public transport
+                    auto_archived INT NOT NULL DEFAULT 0 -- 1 = archived by maintenance.py, never purged
                 );
             END
         """)
+        # tables created before the retention settings of maintenance.py
+        c.execute("""
+            IF COL_LENGTH('trips', 'auto_archived') IS NULL
+            BEGIN
+                ALTER TABLE trips ADD auto_archived INT NOT NULL DEFAULT 0;
+            END
+        """)
         conn.commit()
     except Exception as e:
         st.error(f"Failed to create table 'trips': {e}")
+        conn.close()
+        return
+
+    try:
+        ensure_indexes(c, TRIP_INDEXES)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Failed to create indexes for 'trips': {e}")
     finally:
         conn.close()
 
@@ -119,19 +227,7 @@ def create_trip_users_table():
         return
 
     try:
-        c.execute("""
-            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_user_trips_trip' AND object_id = OBJECT_ID('user_trips'))
-            BEGIN
-                CREATE INDEX ix_user_trips_trip ON user_trips(trip_ID);
-            END
-        """)
-        
-        c.execute("""
-            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_user_trips_user' AND object_id = OBJECT_ID('user_trips'))
-            BEGIN
-                CREATE INDEX ix_user_trips_user ON user_trips(user_ID);
-            END
-        """)
+        ensure_indexes(c, USER_TRIPS_INDEXES)
         conn.commit()
     except Exception as e:
         conn.rollback()
@@ -183,6 +279,7 @@ def add_trip(origin, destination, start_date, end_date, start_time_str, end_time
             c.executemany("INSERT INTO user_trips (trip_ID, user_ID) VALUES (?, ?)", user_trips_list)
             
         conn.commit()
+        invalidate("trips", "user_trips")
     except Exception as e:
         conn.rollback()
         st.error(f"Unable to add the trip: {e}")
@@ -218,6 +315,7 @@ def del_trip(deleted_tripID: int):
         )
         
         conn.commit()
+        invalidate("trips", "user_trips")
     except Exception as e:
         conn.rollback()
         st.error(f"Unable to delete the trip: {e}")
@@ -225,6 +323,55 @@ def del_trip(deleted_tripID: int):
         conn.close()
 
 
+def sync_trip_participants(trip_ID: int, user_ids) -> tuple:
+    """This function sets the participants of a trip to the given users. Instead of deleting all rows
+    and inserting the whole selection again, it compares the selection with the current participants
+    and only deletes the removed and inserts the added users, all in one transaction. The current rows
+    are read with UPDLOCK, HOLDLOCK, so two managers saving the same trip at once can't interleave.
+
+    Args:
+        trip_ID (int): The trip_ID of the trip
+        user_ids (list): The user_IDs who should participate
+
+    Returns:
+        tuple: (number of added, number of removed participants)
+
+    Raises:
+        RuntimeError: If there is no connection to the database
+        pyodbc.Error: If the update fails, nothing is changed then
+    """
+    conn = connect()
+    if conn is None:
+        raise RuntimeError("No connection to the database.")
+
+    c = conn.cursor()
+    try:
+        c.execute(
+            "SELECT user_ID FROM user_trips WITH (UPDLOCK, HOLDLOCK) WHERE trip_ID = ?",
+            (trip_ID,)
+        )
+        current = {row[0] for row in c.fetchall()}
+        selected = {int(uid) for uid in user_ids}
+        added = sorted(selected - current)
+        removed = sorted(current - selected)
+
+        for batch in chunked(removed, MAX_PARAMS - 1):
+            marks = ", ".join("?" * len(batch))
+            c.execute(f"DELETE FROM user_trips WHERE trip_ID = ? AND user_ID IN ({marks})", (trip_ID, *batch))
+        executemany_fast(conn, "INSERT INTO user_trips (trip_ID, user_ID) VALUES (?, ?)", [(trip_ID, uid) for uid in added])
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if added or removed:
+        invalidate("user_trips")
+    return len(added), len(removed)
+
+
 def del_trip_dropdown(title: str = "Delete trip"):
     """This function creates the expander with the form to delete a trip.
     
@@ -260,6 +407,10 @@ def trip_list_view():
     end time as well as a dataframe with the assigned employees and the cost forecast are 
     displayed. As a small feature the assigned employees and the occasion can be edited at
     every stage. The trips are filtered by the manager_ID which is found in the session_state.
+    Only one page of trips is loaded at a time and the details of a trip are only loaded once its
+    expander is opened, so the view stays fast for long trip lists.
+    Every trip is a fragment (see _manager_trip_card()), so opening a trip or editing it only
+    reruns that trip instead of the whole manager page.
     
     Args:
         None
@@ -270,178 +421,218 @@ def trip_list_view():
     
     manager_ID = int(st.session_state["user_ID"]) # getting the parameter for the query
 
-    # dataframe only for trips whos end dates aren't in the past
-    trip_df = pd.read_sql_query("""
-        SELECT trip_ID, origin, destination, start_date, end_date, start_time, end_time, occasion, method_transport
-        FROM trips
-        WHERE manager_ID = ?
-        AND CAST(GETDATE() AS DATE) <= end_date
-        AND show_trip_m = 1
-        ORDER BY start_date
-    """, engine, params=(manager_ID,))
+    # one page of the trips whos end dates aren't in the past
+    trip_df, render_navigation = paginated_trips("manager_upcoming", get_engine(), MANAGER_UPCOMING_TRIPS_SQL, (manager_ID,), tags=("trips",))
 
     if trip_df.empty:
         st.info("No trips available.")
         return
 
+    # the page was just loaded, so edits from earlier fragment runs are already contained in it
+    st.session_state["edited_occasions"] = {}
+
     for _, row in trip_df.iterrows(): # loop all trips to create the expander
-        with st.expander(
-            f"{row.trip_ID} — {row.origin} → {row.destination} ({row.start_date} → {row.end_date})",
-            expanded=False
-        ):
-            
-            if row.method_transport == 0:
-                transport_method = "by Car"
-            else:
-                transport_method = "by Public Transport"
+        _manager_trip_card(row, manager_ID)
 
-            #list details
-            occasion_text = str(row.occasion) if pd.notna(row.occasion) and row.occasion else "Unknown"
-            st.markdown(f"**Occasion:** {occasion_text}")
-            st.markdown(f"**Start Date:** {row.start_date}")
-            st.markdown(f"**End Date:** {row.end_date}")
-            st.markdown(f"**Start Time:** {row.start_time}")
-            st.markdown(f"**End Time:** {row.end_time}")
-            st.markdown(f"**Transportation Method:** {transport_method}")
-
-            #load participants into table
-            participants = pd.read_sql_query("""
-                SELECT u.username, u.email
-                FROM users u
-                JOIN user_trips ut ON ut.user_ID = u.user_ID
-                WHERE ut.trip_ID = ?
-                ORDER BY u.username
-            """, engine, params=(row.trip_ID,))
-
-            # display the dataframe with the participants
-            st.markdown("**Participants:**")
-            st.dataframe(participants, hide_index=True)
-
-            # ML model for the cost forecast
-            num_participants = len(participants)
-
-            model = load_model()
-            if model is not None and num_participants > 0:
-                # duration in days
-                try:
-                    start_date_obj = pd.to_datetime(row.start_date).date()
-                    end_date_obj = pd.to_datetime(row.end_date).date()
-                    duration_days = (end_date_obj - start_date_obj).days + 1
-                except Exception:
-                    duration_days = 0
-
-                # distance in km based on origin/destination
-                origin_coords = get_city_coords(row.origin)
-                dest_coords = get_city_coords(row.destination)
-
-                if origin_coords and dest_coords:
-                    distance_km = geodesic(origin_coords, dest_coords).km
-                else:
-                    distance_km = 0.0
-                
-                tier = get_tier(row.destination)
-
-                #build one-row dataframe for the model
-                X_pred = pd.DataFrame([{
-                    "tier": tier,
-                    "dest_city": row.destination,
-                    "distance_km": distance_km,
-                    "duration_days": duration_days,
-                }])
-
-                try:
-                    per_employee_cost = float(model.predict(X_pred)[0])
-                    predicted_total = per_employee_cost * num_participants
-                    st.metric(
-                        "Predicted total trip cost for all participants (CHF)",
-                        f"{predicted_total:,.2f}"
-                    )
-                    st.caption(
-                        f"Approx. {per_employee_cost:,.2f} CHF per person."
-                    )
-                except Exception as e:
-                    st.warning(f"Could not compute ML prediction: {e}")
+    render_navigation()
+
+
+@st.fragment
+def _manager_trip_card(row, manager_ID: int):
+    """Renders the expander of one upcoming trip. As a fragment, opening, closing or editing the trip
+    only reruns this function.
+
+    Args:
+        row (pd.Series): The trip as loaded by MANAGER_UPCOMING_TRIPS_SQL.
+        manager_ID (int): ID of the logged in manager.
+
+    Returns:
+        None
+    """
+    trip_expander = st.expander(
+        f"{row.trip_ID} — {row.origin} → {row.destination} ({row.start_date} → {row.end_date})",
+        expanded=False, key=f"manager_trip_{row.trip_ID}", on_change="rerun"
+    )
+    with trip_expander:
+        
+        if row.method_transport == 0:
+            transport_method = "by Car"
+        else:
+            transport_method = "by Public Transport"
+
+        # an occasion saved in this fragment is newer than the row of the page query
+        occasion = st.session_state.get("edited_occasions", {}).get(row.trip_ID, row.occasion)
+
+        #list details
+        occasion_text = str(occasion) if pd.notna(occasion) and occasion else "Unknown"
+        st.markdown(f"**Occasion:** {occasion_text}")
+        st.markdown(f"**Start Date:** {row.start_date}")
+        st.markdown(f"**End Date:** {row.end_date}")
+        st.markdown(f"**Start Time:** {row.start_time}")
+        st.markdown(f"**End Time:** {row.end_time}")
+        st.markdown(f"**Transportation Method:** {transport_method}")
+
+        # participants, forecast and forms are only loaded for the opened trip
+        if not trip_expander.open:
+            return
+
+        _trip_participants(row, manager_ID)
+
+        # edit the occasion of the trip, the submit reruns this card with the new occasion
+        with st.form(f"edit_trip_{row.trip_ID}"):
+            default_occasion = "" if pd.isna(occasion) else str(occasion)
+            st.text_input("Edit occasion", value=default_occasion, key=f"occasion_input_{row.trip_ID}")
+            st.form_submit_button("Save changes", on_click=_save_occasion, args=(row.trip_ID,))
+
+
+def _save_occasion(trip_ID: int):
+    """Callback of the edit occasion form, stores the new occasion before the trip fragment reruns."""
+    new_occasion = st.session_state[f"occasion_input_{trip_ID}"]
+    conn = connect()
+    if conn is None:
+        return
+    try:
+        conn.execute(
+            "UPDATE trips SET occasion = ? WHERE trip_ID = ?",
+            (new_occasion, trip_ID)
+        )
+        conn.commit()
+        invalidate("trips")
+    except Exception as e:
+        conn.rollback()
+        st.toast(f"Failed to update occasion: {e}", icon="⚠️")
+        return
+    finally:
+        conn.close()
+    st.session_state.setdefault("edited_occasions", {})[trip_ID] = new_occasion
+    st.toast("Occasion updated!", icon="✅")
+
+
+@st.fragment
+def _trip_participants(row, manager_ID: int):
+    """Renders the participants of a trip, their cost forecast and the form to change them. The participants
+    are loaded here, so updating them only reruns this fragment.
+
+    Args:
+        row (pd.Series): The trip as loaded by MANAGER_UPCOMING_TRIPS_SQL.
+        manager_ID (int): ID of the logged in manager.
+
+    Returns:
+        None
+    """
+    #load participants into table
+    participants = read_sql_cached(TRIP_PARTICIPANTS_SQL, get_engine(), params=(row.trip_ID,), tags=("users", "user_trips"))
+
+    # display the dataframe with the participants
+    st.markdown("**Participants:**")
+    st.dataframe(participants, hide_index=True)
+
+    # ML model for the cost forecast
+    num_participants = len(participants)
+
+    if num_participants > 0:
+        # duration in days
+        try:
+            start_date_obj = pd.to_datetime(row.start_date).date()
+            end_date_obj = pd.to_datetime(row.end_date).date()
+            duration_days = (end_date_obj - start_date_obj).days + 1
+        except Exception:
+            duration_days = 0
+
+        # distance in km based on origin/destination
+        origin_coords = get_city_coords(row.origin)
+        dest_coords = get_city_coords(row.destination)
+
+        if origin_coords and dest_coords:
+            from geopy.distance import geodesic
+            distance_km = geodesic(origin_coords, dest_coords).km
+        else:
+            distance_km = 0.0
+        
+        tier = get_tier(row.destination)
+
+        try:
+            # memoized per feature tuple and model version, returns None without a model
+            per_employee_cost = predict_cost(tier, row.destination, distance_km, duration_days)
+            if per_employee_cost is not None:
+                predicted_total = per_employee_cost * num_participants
+                st.metric(
+                    "Predicted total trip cost for all participants (CHF)",
+                    f"{predicted_total:,.2f}"
+                )
+                st.caption(
+                    f"Approx. {per_employee_cost:,.2f} CHF per person."
+                )
             else:
                 st.info(
                     "No ML model trained yet. "
                     "Once employees submit expense reports, "
                     "the model will be able to predict costs."
                 )
+        except Exception as e:
+            st.warning(f"Could not compute ML prediction: {e}")
+    else:
+        st.info(
+            "No ML model trained yet. "
+            "Once employees submit expense reports, "
+            "the model will be able to predict costs."
+        )
 
-            # edit the occasion of the trip
-            with st.form(f"edit_trip_{row.trip_ID}"):
-                default_occasion = "" if pd.isna(row.occasion) else str(row.occasion)
-                new_occasion = st.text_input("Edit occasion", value=default_occasion)
-                submitted = st.form_submit_button("Save changes")
-                if submitted:
-                    conn = connect()
-                    conn.execute(
-                        "UPDATE trips SET occasion = ? WHERE trip_ID = ?",
-                        (new_occasion, row.trip_ID)
-                    )
-                    conn.commit()
-                    conn.close()
-                    st.success("Occasion updated!")
-                    time.sleep(2)
-                    st.rerun()
-            
-            # edit participants of the trip
-            with st.form(f"edit_participants_{row.trip_ID}"):
-                st.markdown("**Manage participants**")
-
-                # load all participants to edit them for options afterwards
-                all_users_df = pd.read_sql_query("""SELECT u.user_ID, u.username FROM users u 
-                    WHERE u.manager_ID = ? 
-                    ORDER BY username
-                """, engine, params=(manager_ID,),
-                )
+    # edit participants of the trip
+    with st.form(f"edit_participants_{row.trip_ID}"):
+        st.markdown("**Manage participants**")
 
-                # load participants from this trip for default value afterwards
-                current_df = pd.read_sql_query("""
-                    SELECT u.user_ID, u.username
-                    FROM users u
-                    JOIN user_trips ut ON ut.user_ID = u.user_ID
-                    WHERE ut.trip_ID = ?
-                    AND u.manager_ID = ?
-                """, engine, params=(row.trip_ID, manager_ID), 
-                )
+        # load all participants to edit them for options afterwards
+        all_users_df = read_sql_cached("""SELECT u.user_ID, u.username FROM users u 
+            WHERE u.manager_ID = ? 
+            ORDER BY username
+        """, get_engine(), params=(manager_ID,), tags=("users",),
+        )
 
-                # multiselect to choose from
-                selected_users = st.multiselect(
-                    "Select participants",
-                    options=all_users_df["user_ID"].tolist(),
-                    default=current_df["user_ID"].tolist(),
-                    format_func=lambda uid: all_users_df.loc[all_users_df["user_ID"] == uid, "username"].values[0] # filters only usernames to display in the multiselect
-                )
+        # load participants from this trip for default value afterwards
+        current_df = read_sql_cached("""
+            SELECT u.user_ID, u.username
+            FROM users u
+            JOIN user_trips ut ON ut.user_ID = u.user_ID
+            WHERE ut.trip_ID = ?
+            AND u.manager_ID = ?
+        """, get_engine(), params=(row.trip_ID, manager_ID), tags=("users", "user_trips"),
+        )
 
-                # form submit button to update
-                update_participants = st.form_submit_button("Update participants")
+        # employees who are on another trip at the same time are marked in the options
+        usernames = dict(zip(all_users_df["user_ID"], all_users_df["username"]))
+        window = trip_window(row.start_date, row.end_date, row.start_time, row.end_time)
+        conflicts = find_conflicts(manager_ID, connect, usernames, window, exclude_trip_ID=row.trip_ID)
+
+        # multiselect to choose from
+        st.multiselect(
+            "Select participants",
+            options=all_users_df["user_ID"].tolist(),
+            default=current_df["user_ID"].tolist(),
+            format_func=lambda uid: conflict_label(usernames[uid], conflicts.get(uid)),
+            key=f"participants_select_{row.trip_ID}",
+        )
 
-                if update_participants:
-                    conn = connect()
-                    c = conn.cursor()
+        # form submit button to update, the fragment reruns afterwards with the new participants
+        st.form_submit_button("Update participants", on_click=_save_participants, args=(row.trip_ID, conflicts, usernames))
 
-                    # delete all participants from the trip
-                    c.execute("DELETE FROM user_trips WHERE trip_ID = ?", (row.trip_ID,))
 
-                    # adds all new participants to the trip
-                    user_trips_list = [(row.trip_ID, uid) for uid in selected_users]
-                    try:
-                        c.executemany(
-                            "INSERT INTO user_trips (trip_ID, user_ID) VALUES (?, ?)",
-                        user_trips_list
-                        )
-
-                        conn.commit()
-                        st.success("Participants updated!")
-                    except Exception as e:
-                        conn.rollback()
-                        st.error(f"Failed to update participants: {e}")
-                    finally:
-                        conn.close()
-                        if 'st.error' not in st.session_state:
-                            time.sleep(2)
-                            st.rerun()
+def _save_participants(trip_ID: int, conflicts: dict | None = None, usernames: dict | None = None):
+    """Callback of the manage participants form, applies the changed participants before the fragment reruns
+    and warns about selected employees who are on another trip at the same time."""
+    selected_users = st.session_state[f"participants_select_{trip_ID}"]
+    try:
+        added, removed = sync_trip_participants(trip_ID, selected_users)
+    except Exception as e:
+        st.toast(f"Failed to update participants: {e}", icon="⚠️")
+        return
+    if added or removed:
+        st.toast(f"Participants updated! ({added} added, {removed} removed)", icon="✅")
+    else:
+        st.toast("Participants unchanged.")
+    double_booked = [(usernames or {}).get(uid, str(uid)) for uid in selected_users if uid in (conflicts or {})]
+    if double_booked:
+        st.toast(f"Double-booked: {', '.join(double_booked)}", icon="⚠️")
 
 
 def past_trip_list_view():
@@ -449,6 +640,7 @@ def past_trip_list_view():
     only past trips are displayed without the option to edit those trips or to have a
     cost forecast. There is the option to archive them by clicking on the foreseen 
     button. This will not delete the trips, instead they will just no longer be visible.
+    As above, the trips are paginated and participants are only loaded for opened trips.
     
     Args:
         None
@@ -460,15 +652,8 @@ def past_trip_list_view():
 
     manager_ID = int(st.session_state["user_ID"])
 
-    # dataframe only for trips whos end dates are in the past
-    trip_df = pd.read_sql_query("""
-        SELECT trip_ID, origin, destination, start_date, end_date, start_time, end_time, occasion
-        FROM trips
-        WHERE manager_ID = ?
-        AND CAST(GETDATE() AS DATE) > end_date
-        AND show_trip_m = 1
-        ORDER BY start_date
-    """, engine, params=(manager_ID,))
+    # one page of the trips whos end dates are in the past
+    trip_df, render_navigation = paginated_trips("manager_past", get_engine(), MANAGER_PAST_TRIPS_SQL, (manager_ID,), tags=("trips",))
 
     if trip_df.empty:
         st.info("No trips available.")
@@ -476,10 +661,11 @@ def past_trip_list_view():
 
     # loop all trips for the expander
     for _, row in trip_df.iterrows():
-        with st.expander(
+        trip_expander = st.expander(
             f"{row.trip_ID} — {row.origin} → {row.destination} ({row.start_date} → {row.end_date})",
-            expanded=False
-        ):
+            expanded=False, key=f"manager_past_trip_{row.trip_ID}", on_change="rerun"
+        )
+        with trip_expander:
             # list details
             st.markdown(f"**Occasion:** {row.occasion}")
             st.markdown(f"**Start Date:** {row.start_date}")
@@ -487,17 +673,14 @@ def past_trip_list_view():
             st.markdown(f"**Start Time:** {row.start_time}")
             st.markdown(f"**End Time:** {row.end_time}")
 
-            # load participants into table
-            participants = pd.read_sql_query("""
-                SELECT u.username, u.email
-                FROM users u
-                JOIN user_trips ut ON ut.user_ID = u.user_ID
-                WHERE ut.trip_ID = ?
-                ORDER BY u.username
-            """, engine, params=(row.trip_ID,))
+            # load participants into table, only for the opened trip
+            if trip_expander.open:
+                participants = read_sql_cached(TRIP_PARTICIPANTS_SQL, get_engine(), params=(row.trip_ID,), tags=("users", "user_trips"))
 
-            st.markdown("**Participants:**")
-            st.dataframe(participants, hide_index=True)
+                st.markdown("**Participants:**")
+                st.dataframe(participants, hide_index=True)
+
+    render_navigation()
 
     # form to archive the trips
     with st.form("Archive past trips"):
@@ -516,36 +699,7 @@ def past_trip_list_view():
             """, (manager_ID,))
             conn.commit()
             conn.close()
-            st.success("Archived past trips!")
-            time.sleep(2)
+            invalidate("trips")
+            # the toast survives the rerun, no need to wait before it
+            st.toast("Archived past trips!", icon="✅")
             st.rerun()
-
-
-def del_trip_forever():
-    """This fuction finally deletes tripa automatically after 365 days. As acces increases
-    this number should be adjusted accordingly.
-    
-    Args:
-        None
-        
-    Returns:
-        None
-    """
-    conn = connect()
-    if conn is None:
-        return
-    
-    c = conn.cursor()
-    manager_ID = int(st.session_state["user_ID"])
-    try:
-        c.execute("""DELETE FROM trips 
-            WHERE manager_ID = ?
-            AND show_trip_m = 0
-            AND DATEDIFF(day, end_date, GETDATE()) > 365
-        """, (manager_ID,))
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Failed to delete old archived trips: {e}")
-    finally:
-        conn.close()
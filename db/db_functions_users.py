@@ -4,18 +4,22 @@ initializing the database tables."""
 import pyodbc
 import time
 import streamlit as st
-import pandas as pd
 import bcrypt
-from sqlalchemy import create_engine
-from utils import load_secrets
-import urllib
+from settings import get_settings
+from db.query_log import logged_connect, get_engine
+from tracing import traced
+from db.query_cache import fetchall_cached, read_sql_cached, invalidate
+from db.db_roles import DEFAULT_ROLES, get_roles, sortkey_of, roles_below, role_filter, sort_by_role, refresh_roles
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    import pandas as pd  # only for annotations, the login page does not load pandas
 
-CONNECTION_STRING = load_secrets()
-connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(CONNECTION_STRING)
-engine = create_engine(connect_uri, fast_executemany=True)
 
+CONNECTION_STRING = get_settings().db.connection_string
 
+
+@traced("db", "connect")
 def connect():
     """Connects to Azure SQL-database.
     
@@ -26,7 +30,7 @@ def connect():
         None
     """
     try:
-        conn = pyodbc.connect(CONNECTION_STRING)
+        conn = logged_connect(CONNECTION_STRING)
         return conn
     except pyodbc.Error as ex:
         sqlstate = ex.args[0]
@@ -103,13 +107,7 @@ def initialize_data():
         return
     c = conn.cursor()
 
-    roles_to_insert = [
-        ("Administrator", 3),
-        ("Manager", 2),
-        ("User", 1)
-    ]
-    
-    for role_name, sortkey_val in roles_to_insert:
+    for role_name, sortkey_val in DEFAULT_ROLES:
         # Checks first if role already exists, if not insert it
         try:
             c.execute("""
@@ -124,6 +122,7 @@ def initialize_data():
             pass      
     conn.commit()
     conn.close()
+    refresh_roles() # the role registry reads the table again on the next lookup
 
 def get_user(username):
     """Fetches user data based on the provided username.
@@ -208,6 +207,7 @@ def add_user(username, password, email, role):
             (username, hashed_pw, email, role, manager_ID)
         )
         conn.commit()
+        invalidate("users")
         print(f" User '{username}' sucessfully added!")
     except pyodbc.Error as ex:
         print(f"User '{username}' exists already or another database error occurred: {ex}")
@@ -256,24 +256,14 @@ def get_user_by_credentials(username, password):
 
 
 def get_role_sortkey(role):
-    """Fetches the sortkey for a given role.
+    """Fetches the sortkey for a given role from the role registry (db_roles.py), without a query.
     Args:
         role (str): The role to fetch the sortkey for.
         
     Returns:
         int: Sortkey if found, else None.
     """
-    
-    conn = connect()
-    if conn is None:
-        return
-    c = conn.cursor()
-    c.execute('SELECT sortkey FROM roles WHERE role = ?', (role,))
-    row = c.fetchone()[0]
-    conn.close()
-    if row:
-        return row
-    return None
+    return sortkey_of(role)
 
 
 def list_roles_editable():
@@ -286,23 +276,8 @@ def list_roles_editable():
     """
     
     current_sortkey = st.session_state["role_sortkey"]
-    conn = connect()
-    if conn is None:
-        return
-    c = conn.cursor()
-
-    c.execute("""
-        SELECT role, sortkey
-        FROM roles
-        WHERE sortkey < ?
-        ORDER BY sortkey DESC
-    """, (current_sortkey,))
-
-    roles = c.fetchall()
-    conn.close()
-    if roles:
-        return roles
-    return []
+    # served from the role registry, highest sortkey first
+    return roles_below(current_sortkey)
 
 def get_users_for_current_manager():
     """Fetches all users created by the current manager.
@@ -318,18 +293,14 @@ def get_users_for_current_manager():
 
     manager_id = st.session_state["user_ID"]
 
-    conn = connect()
-    if conn is None:
-        return
-    c = conn.cursor()
-    c.execute("""
+    rows = fetchall_cached("""
         SELECT user_ID, username, email, role
         FROM users
         WHERE manager_ID = ?
         ORDER BY username
-    """, (manager_id,))
-    rows = c.fetchall()
-    conn.close()
+    """, connect, (manager_id,), tags=("users",))
+    if rows is None:
+        return
     if rows:
         return rows
     return []
@@ -452,23 +423,18 @@ def del_user_dropdown(title: str = "Delete user"):
         return
 
     current_sortkey = st.session_state["role_sortkey"]
-    conn = connect()
-    if conn is None:
-        return
-    c = conn.cursor()
-
     manager_id = st.session_state["user_ID"]
 
-    c.execute("""
+    role_sql, role_params = role_filter(current_sortkey)
+    users = fetchall_cached(f"""
         SELECT u.username, u.role
         FROM users u
-        JOIN roles r ON u.role = r.role
-        WHERE r.sortkey < ? 
+        WHERE {role_sql}
         AND u.manager_ID = ?
-        ORDER BY r.sortkey DESC
-    """, (current_sortkey, manager_id))
-    users = c.fetchall()
-    conn.close()
+    """, connect, (*role_params, manager_id), tags=("users",))
+    if users is None:
+        return
+    users = sort_by_role(users, 1)
 
     if not users:
         st.info("No deletable users available.")
@@ -487,6 +453,7 @@ def del_user_dropdown(title: str = "Delete user"):
             try:
                 c.execute("DELETE FROM users WHERE username = ?", (username,))
                 conn.commit()
+                invalidate("users", "user_trips")
                 st.success(f"✅ User '{username}' has been deleted.")
                 time.sleep(2)
                 st.rerun()
@@ -512,20 +479,15 @@ def del_user_dropdown_admin(title: str = "Delete user"):
         return
 
     current_sortkey = st.session_state["role_sortkey"]
-    conn = connect()
-    if conn is None:
-        return
-    c = conn.cursor()
-
-    c.execute("""
+    role_sql, role_params = role_filter(current_sortkey)
+    users = fetchall_cached(f"""
         SELECT u.username, u.role
         FROM users u
-        JOIN roles r ON u.role = r.role
-        WHERE r.sortkey < ? 
-        ORDER BY r.sortkey DESC
-    """, (current_sortkey,))
-    users = c.fetchall()
-    conn.close()
+        WHERE {role_sql}
+    """, connect, role_params, tags=("users",))
+    if users is None:
+        return
+    users = sort_by_role(users, 1)
 
     if not users:
         st.info("No deletable users available.")
@@ -544,6 +506,7 @@ def del_user_dropdown_admin(title: str = "Delete user"):
             try:
                 c.execute("DELETE FROM users WHERE username = ?", (username,))
                 conn.commit()
+                invalidate("users", "user_trips")
                 st.success(f" User '{username}' has been deleted.")
                 time.sleep(2)
                 st.rerun()
@@ -570,21 +533,16 @@ def edit_user_dropdown(title: str = "Edit user"):
     current_sortkey = st.session_state["role_sortkey"]
     manager_id = st.session_state["user_ID"]
 
-    conn = connect()
-    if conn is None:
-        return
-    c = conn.cursor()
-
-    c.execute("""
+    role_sql, role_params = role_filter(current_sortkey)
+    users = fetchall_cached(f"""
         SELECT u.username, u.email, u.password, u.role
         FROM users u
-        JOIN roles r ON u.role = r.role
-        WHERE r.sortkey < ? 
+        WHERE {role_sql}
         AND u.manager_ID = ?
-        ORDER BY r.sortkey DESC
-    """, (current_sortkey, manager_id))
-    users = c.fetchall()
-    conn.close()
+    """, connect, (*role_params, manager_id), tags=("users",))
+    if users is None:
+        return
+    users = sort_by_role(users, 3)
 
     if not users:
         st.info("No editable users available.")
@@ -662,6 +620,7 @@ def edit_user_dropdown(title: str = "Edit user"):
                     """, (new_username, pw_to_store, new_email, new_role, username))
                 
                     conn.commit()
+                    invalidate("users")
                     st.success(f"✅ User '{username}' updated successfully.")
                     time.sleep (2)
                     st.rerun()
@@ -688,20 +647,15 @@ def edit_user_dropdown_admin(title: str = "Edit user"):
 
     current_sortkey = st.session_state["role_sortkey"]
 
-    conn = connect()
-    if conn is None:
-        return
-    c = conn.cursor()
-
-    c.execute("""
+    role_sql, role_params = role_filter(current_sortkey)
+    users = fetchall_cached(f"""
         SELECT u.username, u.email, u.password, u.role, u.manager_ID
         FROM users u
-        JOIN roles r ON u.role = r.role
-        WHERE r.sortkey < ?
-        ORDER BY r.sortkey DESC
-    """, (current_sortkey,))
-    users = c.fetchall()
-    conn.close()
+        WHERE {role_sql}
+    """, connect, role_params, tags=("users",))
+    if users is None:
+        return
+    users = sort_by_role(users, 3)
 
     if not users:
         st.info("No editable users available.")
@@ -779,6 +733,7 @@ def edit_user_dropdown_admin(title: str = "Edit user"):
                 """, (new_username, pw_to_store, new_email, new_role, manager_id_int, username))
                 
                 conn.commit()
+                invalidate("users")
                 st.success(f" User '{username}' updated successfully.")
                 time.sleep (2)
                 st.rerun()
@@ -840,6 +795,7 @@ def register_main(title: str = "Register as manager"):
                         (new_user_id, new_user_id)
                     )
                     conn.commit()
+                    invalidate("users")
                     st.success(f"Manager '{username}' was successfully added. You can now log in.")
                 else:
                     st.warning("User created, but failed to retrieve user_ID for self-assignment.")
@@ -928,6 +884,7 @@ def edit_own_profile(title: str = "My profile"):
             """, (new_email, pw_to_store, user_id))
 
             conn.commit()
+            invalidate("users")
             st.success("Profile has been updated successfully.")
             time.sleep(2)
             st.rerun()
@@ -941,7 +898,7 @@ def edit_own_profile(title: str = "My profile"):
 
 
 
-def get_users_under_me() -> pd.DataFrame | None:
+def get_users_under_me() -> "pd.DataFrame | None":
     """Creates table for admin dashboard to see all registered managers/users.
     Args:
         None
@@ -955,22 +912,24 @@ def get_users_under_me() -> pd.DataFrame | None:
     current = st.session_state["role_sortkey"]
 
     try:
-        sql_query = """
-            SELECT u.username, u.email, u.role, r.sortkey, u.manager_ID
+        role_sql, role_params = role_filter(current)
+        sql_query = f"""
+            SELECT u.username, u.email, u.role, u.manager_ID
             FROM users u
-            JOIN roles r ON u.role = r.role
-            WHERE r.sortkey < ? 
-            ORDER BY r.sortkey DESC, u.username
+            WHERE {role_sql}
         """
         
         # uses pandas to read the sql query into a DataFrame
-        df = pd.read_sql_query(
+        df = read_sql_cached(
             sql_query, 
-            engine, 
-            params=(current,) # params as tuple
+            get_engine(), 
+            params=role_params, # params as tuple
+            tags=("users",),
         )
         if not df.empty:
-            return df
+            # sortkeys come from the role registry instead of a join with 'roles'
+            df.insert(3, "sortkey", df["role"].map(dict(get_roles())))
+            return df.sort_values(["sortkey", "username"], ascending=[False, True], ignore_index=True)
     except Exception as e:
         st.error(f"Error fetching users: {e}")
         return None
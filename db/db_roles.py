@@ -0,0 +1,139 @@
+"""db_roles.py contains the in-process registry of the table 'roles' (role, sortkey). The table has only a few rows
+which do not change while the app runs, so it is loaded once and the sortkey and editable-role lookups are served
+from memory instead of querying or joining 'roles' on every render.
+
+The registry is reloaded after ROLES_TTL_S seconds or when refresh_roles() is called (e.g. after initialize_data()
+inserted missing roles). If the table cannot be read, DEFAULT_ROLES are used until the next reload.
+"""
+
+import threading
+import time
+
+import pyodbc
+from settings import get_settings
+from db.query_log import logged_connect
+
+CONNECTION_STRING = get_settings().db.connection_string
+
+ROLES_TTL_S = get_settings().roles_ttl_s
+
+# roles and sortkeys of a new database, also inserted by initialize_data(); a higher sortkey is a higher role
+DEFAULT_ROLES = [
+    ("Administrator", 3),
+    ("Manager", 2),
+    ("User", 1),
+]
+
+_registry = {"roles": list(DEFAULT_ROLES), "loaded_at": None}
+_registry_lock = threading.Lock()
+
+
+def refresh_roles():
+    """Marks the registry as outdated, the table is read again on the next lookup.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    with _registry_lock:
+        _registry["loaded_at"] = None
+
+
+def _ensure_roles():
+    """Loads the table 'roles' into the registry if it was never loaded or the TTL expired."""
+    loaded_at = _registry["loaded_at"]
+    if loaded_at is not None and time.monotonic() - loaded_at < ROLES_TTL_S:
+        return
+
+    with _registry_lock:
+        if _registry["loaded_at"] is not None and time.monotonic() - _registry["loaded_at"] < ROLES_TTL_S:
+            return
+        # set before querying, so an unreachable database is not queried on every lookup
+        _registry["loaded_at"] = time.monotonic()
+        try:
+            conn = logged_connect(CONNECTION_STRING)
+            try:
+                c = conn.cursor()
+                c.execute("SELECT role, sortkey FROM roles ORDER BY sortkey DESC")
+                rows = [(row[0], int(row[1])) for row in c.fetchall()]
+            finally:
+                conn.close()
+        except pyodbc.Error as e:
+            print(f"Could not load table 'roles', using default roles: {e}")
+            return
+
+        if rows:
+            _registry["roles"] = rows
+
+
+def get_roles() -> list:
+    """Returns all roles.
+
+    Args:
+        None
+
+    Returns:
+        list: (role, sortkey) tuples, highest sortkey first.
+    """
+    _ensure_roles()
+    return list(_registry["roles"])
+
+
+def sortkey_of(role: str):
+    """Returns the sortkey of a role.
+
+    Args:
+        role (str): Name of the role.
+
+    Returns:
+        int: The sortkey, None for unknown roles.
+    """
+    for name, sortkey in get_roles():
+        if name == role:
+            return sortkey
+    return None
+
+
+def roles_below(sortkey: int) -> list:
+    """Returns the roles a user with the given sortkey may manage (all roles with a lower sortkey).
+
+    Args:
+        sortkey (int): Sortkey of the current user.
+
+    Returns:
+        list: (role, sortkey) tuples, highest sortkey first.
+    """
+    return [(name, key) for name, key in get_roles() if key < sortkey]
+
+
+def role_filter(sortkey: int, column: str = "u.role"):
+    """Builds the condition for users whose role is below the given sortkey, replacing a join with 'roles'.
+
+    Args:
+        sortkey (int): Sortkey of the current user.
+        column (str): The role column in the query.
+
+    Returns:
+        (str, tuple): SQL condition and its parameters, e.g. ("u.role IN (?, ?)", ("Manager", "User")).
+    """
+    names = tuple(name for name, _ in roles_below(sortkey))
+    if not names:
+        return "1 = 0", ()
+    return f"{column} IN ({', '.join('?' * len(names))})", names
+
+
+def sort_by_role(rows, role_index: int) -> list:
+    """Sorts rows by the sortkey of their role, highest first, like ORDER BY r.sortkey DESC on a join with 'roles'.
+    Rows with the same role keep their order.
+
+    Args:
+        rows (list): Rows (tuples) containing a role name.
+        role_index (int): Position of the role name in a row.
+
+    Returns:
+        list: The sorted rows.
+    """
+    sortkeys = dict(get_roles())
+    return sorted(rows, key=lambda row: sortkeys.get(row[role_index], 0), reverse=True)
@@ -1,17 +1,17 @@
 import pyodbc
 import streamlit as st
-from utils import load_secrets
-from sqlalchemy import create_engine
-import urllib
+from datetime import date
+from settings import get_settings
+from db.query_log import logged_connect
+from tracing import traced
 
-CONNECTION_STRING = load_secrets()
-connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(CONNECTION_STRING)
-engine = create_engine(connect_uri, fast_executemany=True)
+CONNECTION_STRING = get_settings().db.connection_string
 
+@traced("db", "connect")
 def connect():
     """Connects to Azure SQL-database"""
     try:
-        conn = pyodbc.connect(CONNECTION_STRING)
+        conn = logged_connect(CONNECTION_STRING)
         return conn
     except pyodbc.Error as ex:
         sqlstate = ex.args[0]
@@ -20,7 +20,7 @@ def connect():
         return None
 
 def insert_expense_for_training(dest_city, distance_km, duration_days, total_cost, user_id):
-    """Inserts an expense report into the expenses_user_data table.
+    """Inserts an expense report into the expenses_user_data table, dated today (used by the analytics page).
     Args:
         dest_city (str): Destination city of the trip.
         distance_km (float): Distance traveled in kilometers.
@@ -35,9 +35,9 @@ def insert_expense_for_training(dest_city, distance_km, duration_days, total_cos
     try:
         c = conn.cursor()
         c.execute("""
-            INSERT INTO expenses_user_data (user_id, dest_city, duration_days, distance_km, total_cost)
-            VALUES (?, ?, ?, ?, ?)
-        """, (user_id, dest_city, duration_days, distance_km, total_cost))
+            INSERT INTO expenses_user_data (user_id, date, dest_city, duration_days, distance_km, total_cost)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, date.today().isoformat(), dest_city, duration_days, distance_km, total_cost))
         conn.commit()
         st.success("Successful saved in database")
         return True
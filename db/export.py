@@ -0,0 +1,264 @@
+"""export.py contains the export of trips, their participants (user_trips) and the expense reports
+(expenses_user_data) to CSV or Parquet, for all managers (admins) or the own team (managers), optionally limited
+to a date range.
+
+The rows are streamed from the database in chunks of EXPORT_CHUNK_ROWS (pd.read_sql_query with chunksize on a
+connection with stream_results, so the driver fetches them batch by batch from the open cursor) and every chunk is
+written to the output right away: CSV rows are appended, Parquet gets one row group per chunk. The output is a
+spooled temporary file that moves to disk above SPOOL_MAX_BYTES, so even years of history are never held in memory
+as one DataFrame. In the app the export only runs when the download button is clicked; the finished file is handed
+to the download button as bytes, the only form of its deferred data Streamlit accepts besides open files.
+
+Parquet needs the package pyarrow (requirements.txt); in installations without it only CSV is offered.
+
+Run it from the repository root for large exports:
+    python -m db.export trips --format parquet --manager-id 12 --start 2025-01-01 --end 2025-12-31 -o trips.parquet
+"""
+
+import argparse
+import importlib.util
+import tempfile
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+
+from db.query_log import get_engine
+from settings import get_settings
+
+EXPORT_CHUNK_ROWS = get_settings().export_chunk_rows
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+# dataset -> (query, manager column, condition of the date range with the parameters start and end)
+DATASETS = {
+    "trips": (
+        """
+        SELECT t.trip_ID, t.manager_ID, t.origin, t.destination, t.start_date, t.end_date, t.start_time, t.end_time,
+               t.occasion, t.method_transport, t.show_trip_m, t.show_trip_e
+        FROM trips t
+        WHERE 1 = 1 {filters}
+        ORDER BY t.trip_ID
+        """,
+        "t.manager_ID",
+        "t.end_date >= ? AND t.start_date <= ?",
+    ),
+    "participants": (
+        """
+        SELECT ut.trip_ID, ut.user_ID, u.username, u.email, t.manager_ID, t.origin, t.destination,
+               t.start_date, t.end_date
+        FROM user_trips ut
+        JOIN trips t ON t.trip_ID = ut.trip_ID
+        JOIN users u ON u.user_ID = ut.user_ID
+        WHERE 1 = 1 {filters}
+        ORDER BY ut.trip_ID, ut.user_ID
+        """,
+        "t.manager_ID",
+        "t.end_date >= ? AND t.start_date <= ?",
+    ),
+    "expenses": (
+        # user_id is text ("seed" for the seed data), the date is text in ISO format
+        """
+        SELECT e.id, e.user_id, u.username, u.manager_ID, e.date, e.dest_city, e.duration_days, e.distance_km,
+               e.total_cost
+        FROM expenses_user_data e
+        LEFT JOIN users u ON u.user_ID = TRY_CAST(e.user_id AS INT)
+        WHERE 1 = 1 {filters}
+        ORDER BY e.id
+        """,
+        "u.manager_ID",
+        "TRY_CAST(e.date AS DATE) BETWEEN ? AND ?",
+    ),
+}
+
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def available_formats() -> list:
+    """Returns the export formats that can be written with the installed packages.
+
+    Args:
+        None
+
+    Returns:
+        list: "csv" and, if pyarrow is installed, "parquet".
+    """
+    return [fmt for fmt in FORMATS if fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+
+def build_export_query(dataset: str, manager_ID: int | None = None, start: date | None = None,
+                       end: date | None = None):
+    """Builds the query of a dataset with its filters.
+
+    Args:
+        dataset (str): Key of DATASETS.
+        manager_ID (int | None): Only rows of this manager's team; None for all managers.
+        start (date | None): Start of the date range, None for open.
+        end (date | None): End of the date range, None for open.
+
+    Returns:
+        (str, tuple): The query and its parameters.
+    """
+    sql, manager_column, date_condition = DATASETS[dataset]
+    filters, params = "", []
+    if manager_ID is not None:
+        filters += f" AND {manager_column} = ?"
+        params.append(manager_ID)
+    if start is not None or end is not None:
+        filters += f" AND {date_condition}"
+        params += [start or date.min, end or date.max]
+    return sql.format(filters=filters), tuple(params)
+
+
+def iter_export_chunks(dataset: str, manager_ID: int | None = None, start: date | None = None,
+                       end: date | None = None, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Streams the rows of a dataset from the database.
+
+    Args:
+        dataset (str): Key of DATASETS.
+        manager_ID (int | None): Only rows of this manager's team; None for all managers.
+        start (date | None): Start of the date range.
+        end (date | None): End of the date range.
+        chunk_rows (int): Rows per chunk.
+
+    Returns:
+        generator of pd.DataFrame with at most chunk_rows rows each; nothing for an empty result.
+    """
+    sql, params = build_export_query(dataset, manager_ID, start, end)
+    with get_engine().connect().execution_options(stream_results=True) as conn:
+        yield from pd.read_sql_query(sql, conn, params=params, chunksize=chunk_rows)
+
+
+def _parquet_table(chunk: pd.DataFrame, schema):
+    """Converts a chunk to an Arrow table; the schema of the first chunk is kept for all row groups."""
+    import pyarrow as pa
+
+    if schema is None:
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        # columns that are empty in the first chunk would be typed "null" for the whole file
+        schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                            for field in table.schema])
+        return table.cast(schema), schema
+    return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False), schema
+
+
+def write_export(chunks, fmt: str, out) -> int:
+    """Writes chunks of rows to a binary file, one chunk at a time.
+
+    Args:
+        chunks (iterable): DataFrames with the same columns, e.g. from iter_export_chunks().
+        fmt (str): "csv" or "parquet".
+        out: Binary file-like object or path.
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ImportError: For Parquet if pyarrow is not installed.
+    """
+    rows = 0
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer, schema = None, None
+        try:
+            for chunk in chunks:
+                table, schema = _parquet_table(chunk, schema)
+                if writer is None:
+                    writer = pq.ParquetWriter(out, schema)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    header = True
+    for chunk in chunks:
+        out.write(chunk.to_csv(index=False, header=header).encode("utf-8"))
+        header = False
+        rows += len(chunk)
+    return rows
+
+
+def export_to_file(dataset: str, fmt: str, manager_ID: int | None = None, start: date | None = None,
+                   end: date | None = None):
+    """Exports a dataset for the download button.
+
+    Args:
+        dataset (str): Key of DATASETS.
+        fmt (str): "csv" or "parquet".
+        manager_ID (int | None): Only rows of this manager's team; None for all managers.
+        start (date | None): Start of the date range.
+        end (date | None): End of the date range.
+
+    Returns:
+        bytes: The exported file.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as out:
+        write_export(iter_export_chunks(dataset, manager_ID, start, end), fmt, out)
+        out.seek(0)
+        return out.read()
+
+
+def export_dropdown(title: str = "Export data", admin: bool = False):
+    """This function creates the expander to download trips, participants or expenses as CSV or Parquet.
+    Managers export their own team, admins all managers or one of them.
+
+    Args:
+        title (str): The title of the expander.
+        admin (bool): Allow exporting the data of all managers.
+
+    Returns:
+        None
+    """
+    with st.expander(title, expanded=False):
+        dataset = st.selectbox("Data", list(DATASETS), key="export_dataset")
+        fmt = st.radio("Format", available_formats(), horizontal=True, key="export_format")
+
+        if admin:
+            manager_input = st.text_input("Manager ID (empty for all managers)", key="export_manager")
+            if manager_input.strip() and not manager_input.strip().isdigit():
+                st.error("The manager ID must be a number.")
+                return
+            manager_ID = int(manager_input) if manager_input.strip() else None
+        else:
+            manager_ID = int(st.session_state["user_ID"])
+
+        limit_dates = st.checkbox("Limit to a date range", key="export_limit_dates")
+        start = end = None
+        if limit_dates:
+            col1, col2 = st.columns(2)
+            start = col1.date_input("From", key="export_start")
+            end = col2.date_input("To", key="export_end")
+            if end < start:
+                st.error("The end of the range is before its start.")
+                return
+
+        mime, extension = FORMATS[fmt]
+        # the export runs on click, not on every rerun of the page
+        st.download_button(
+            "Download",
+            data=lambda: export_to_file(dataset, fmt, manager_ID, start, end),
+            file_name=f"{dataset}{extension}",
+            mime=mime,
+            key="export_download",
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export trips, participants or expenses to CSV or Parquet.")
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--manager-id", type=int, help="only this manager's team (default: all managers)")
+    parser.add_argument("--start", type=date.fromisoformat, help="start of the date range, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="end of the date range, YYYY-MM-DD")
+    parser.add_argument("-o", "--output", help="output file (default: <dataset>.<format>)")
+    args = parser.parse_args()
+
+    path = args.output or f"{args.dataset}{FORMATS[args.format][1]}"
+    with open(path, "wb") as f:
+        written = write_export(iter_export_chunks(args.dataset, args.manager_id, args.start, args.end), args.format, f)
+    print(f"Exported {written} rows to {path}.")
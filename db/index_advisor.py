@@ -0,0 +1,221 @@
+"""index_advisor.py runs the canonical queries of the list views against the database and reports their
+execution plans and logical reads, so the managed indexes (TRIP_INDEXES, USER_TRIPS_INDEXES in
+db_functions_trips.py) stay in step with the queries.
+
+For every query the report shows the physical operators with the index they use, the logical reads per table,
+warnings for scans, key lookups and sorts, and SQL Server's missing index suggestions. At the end it lists managed
+indexes that no canonical query used. The batched UPDATE/DELETE statements of maintenance.py are analyzed as
+SELECTs with the same conditions, so the advisor never changes data.
+
+Run it from the repository root (parameters default to the manager/user/trip with the most rows):
+    python -m db.index_advisor
+    python -m db.index_advisor --manager-id 12 --user-id 57
+"""
+
+import argparse
+import re
+import xml.etree.ElementTree as ET
+from datetime import date
+
+from db.db_functions_trips import (
+    connect, MANAGER_UPCOMING_TRIPS_SQL, MANAGER_PAST_TRIPS_SQL, TRIP_PARTICIPANTS_SQL,
+    TRIP_INDEXES, USER_TRIPS_INDEXES,
+)
+from db.db_functions_employees import EMPLOYEE_UPCOMING_TRIPS_SQL, EMPLOYEE_PAST_TRIPS_SQL
+from db.maintenance import ARCHIVE_EMPLOYEE_SQL, ARCHIVE_MANAGER_SQL, BATCH_SIZE, PURGE_SQL
+from db.pagination import PAGE_SIZE
+from db.trip_conflicts import UPCOMING_BOOKINGS_SQL
+
+SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+MANAGER_USERS_SQL = """
+    SELECT u.user_ID, u.username FROM users u
+    WHERE u.manager_ID = ?
+    ORDER BY username
+"""
+
+# the list views are keyset templates, analyzed for their first page
+FIRST_PAGE = PAGE_SIZE + 1
+# age in days of the trips the maintenance statements are analyzed for
+RETENTION_DAYS = 365
+
+
+def as_select(sql: str) -> str:
+    """Returns the read-only form of a maintenance statement: SELECT TOP (?) trip_ID with the same conditions."""
+    return "SELECT TOP (?) trip_ID FROM trips WHERE" + sql.split("WHERE", 1)[1]
+
+
+# (name, sql, parameter builder); the builder gets the sample IDs
+CANONICAL_QUERIES = [
+    ("manager upcoming trips", MANAGER_UPCOMING_TRIPS_SQL.format(keyset=""), lambda ids: (FIRST_PAGE, ids["manager_ID"])),
+    ("manager past trips", MANAGER_PAST_TRIPS_SQL.format(keyset=""), lambda ids: (FIRST_PAGE, ids["manager_ID"])),
+    ("trip participants", TRIP_PARTICIPANTS_SQL, lambda ids: (ids["trip_ID"],)),
+    ("manager users", MANAGER_USERS_SQL, lambda ids: (ids["manager_ID"],)),
+    ("team bookings (conflict index)", UPCOMING_BOOKINGS_SQL, lambda ids: (ids["manager_ID"],)),
+    ("employee upcoming trips", EMPLOYEE_UPCOMING_TRIPS_SQL.format(keyset=""),
+     lambda ids: (FIRST_PAGE, ids["user_ID"], date.today())),
+    ("employee past trips", EMPLOYEE_PAST_TRIPS_SQL.format(keyset=""),
+     lambda ids: (FIRST_PAGE, ids["user_ID"], date.today())),
+    ("maintenance manager archival", as_select(ARCHIVE_MANAGER_SQL), lambda ids: (BATCH_SIZE, -RETENTION_DAYS)),
+    ("maintenance employee archival", as_select(ARCHIVE_EMPLOYEE_SQL), lambda ids: (BATCH_SIZE, -RETENTION_DAYS)),
+    ("maintenance purge", as_select(PURGE_SQL), lambda ids: (BATCH_SIZE, -RETENTION_DAYS)),
+]
+
+WARN_OPS = {
+    "Table Scan": "full table scan",
+    "Clustered Index Scan": "clustered index scan",
+    "Index Scan": "index scan",
+    "Key Lookup": "key lookup, index is not covering",
+    "RID Lookup": "RID lookup, index is not covering",
+    "Sort": "explicit sort",
+}
+
+_READS_RE = re.compile(r"Table '([^']+)'\. Scan count (\d+), logical reads (\d+)")
+
+
+def sample_ids(c) -> dict:
+    """Picks the manager, employee and trip with the most rows as parameters for the canonical queries."""
+    ids = {}
+    c.execute("SELECT TOP 1 manager_ID FROM trips GROUP BY manager_ID ORDER BY COUNT(*) DESC")
+    row = c.fetchone()
+    ids["manager_ID"] = row[0] if row else 0
+    c.execute("SELECT TOP 1 user_ID FROM user_trips GROUP BY user_ID ORDER BY COUNT(*) DESC")
+    row = c.fetchone()
+    ids["user_ID"] = row[0] if row else 0
+    c.execute("SELECT TOP 1 trip_ID FROM user_trips GROUP BY trip_ID ORDER BY COUNT(*) DESC")
+    row = c.fetchone()
+    ids["trip_ID"] = row[0] if row else 0
+    return ids
+
+
+def parse_plan(plan_xml: str) -> dict:
+    """Extracts operators, used indexes and missing index suggestions from an XML showplan.
+
+    Args:
+        plan_xml (str): The actual execution plan as returned by SET STATISTICS XML ON.
+
+    Returns:
+        dict: operators (list of (op, object, estimated rows)), indexes (set of index names),
+            missing (list of suggestion strings).
+    """
+    root = ET.fromstring(plan_xml)
+    operators = []
+    indexes = set()
+    for relop in root.iter(f"{SHOWPLAN_NS}RelOp"):
+        obj_name = ""
+        for child in relop:
+            obj = child.find(f"{SHOWPLAN_NS}Object")
+            if obj is not None:
+                table = (obj.get("Table") or "").strip("[]")
+                index = (obj.get("Index") or "").strip("[]")
+                obj_name = f"{table}.{index}" if index else table
+                if index:
+                    indexes.add(index)
+                break
+        operators.append((relop.get("PhysicalOp"), obj_name, relop.get("EstimateRows")))
+
+    missing = []
+    for group in root.iter(f"{SHOWPLAN_NS}MissingIndexGroup"):
+        for mi in group.iter(f"{SHOWPLAN_NS}MissingIndex"):
+            parts = []
+            for cg in mi.iter(f"{SHOWPLAN_NS}ColumnGroup"):
+                cols = [col.get("Name").strip("[]") for col in cg.iter(f"{SHOWPLAN_NS}Column")]
+                parts.append(f"{cg.get('Usage')}: {', '.join(cols)}")
+            missing.append(f"{mi.get('Table').strip('[]')} (impact {float(group.get('Impact')):.0f} %) " + "; ".join(parts))
+
+    return {"operators": operators, "indexes": indexes, "missing": missing}
+
+
+def analyze_query(c, sql: str, params: tuple) -> dict:
+    """Runs one query with STATISTICS IO and STATISTICS XML and collects rows, reads and plan.
+
+    Args:
+        c (pyodbc.Cursor): Open cursor.
+        sql (str): The query.
+        params (tuple): Query parameters.
+
+    Returns:
+        dict: rows, reads ({table: (scans, logical reads)}) and the parsed plan (see parse_plan).
+    """
+    c.execute("SET STATISTICS IO ON; SET STATISTICS XML ON;")
+    c.execute(sql, params)
+    rows = len(c.fetchall())
+    messages = list(c.messages)
+    plan_xml = None
+    while c.nextset():
+        messages.extend(c.messages)
+        try:
+            row = c.fetchone()
+        except Exception:
+            continue
+        if row and isinstance(row[0], str) and "ShowPlanXML" in row[0]:
+            plan_xml = row[0]
+    c.execute("SET STATISTICS IO OFF; SET STATISTICS XML OFF;")
+
+    reads = {}
+    for _, text in messages:
+        for table, scans, logical in _READS_RE.findall(str(text)):
+            prev_scans, prev_reads = reads.get(table, (0, 0))
+            reads[table] = (prev_scans + int(scans), prev_reads + int(logical))
+
+    plan = parse_plan(plan_xml) if plan_xml else {"operators": [], "indexes": set(), "missing": []}
+    return {"rows": rows, "reads": reads, "plan": plan}
+
+
+def run_advisor(ids: dict | None = None) -> dict:
+    """Analyzes all canonical queries and prints the report.
+
+    Args:
+        ids (dict): Optional manager_ID, user_ID and trip_ID to use; missing ones are sampled.
+
+    Returns:
+        dict: The analysis per query name.
+    """
+    conn = connect()
+    if conn is None:
+        raise RuntimeError("No connection to the database.")
+
+    c = conn.cursor()
+    try:
+        sampled = sample_ids(c)
+        sampled.update({k: v for k, v in (ids or {}).items() if v is not None})
+        print(f"Parameters: {sampled}\n")
+
+        results = {}
+        used_indexes = set()
+        for name, sql, build_params in CANONICAL_QUERIES:
+            result = analyze_query(c, sql, build_params(sampled))
+            results[name] = result
+            used_indexes |= result["plan"]["indexes"]
+
+            total_reads = sum(r for _, r in result["reads"].values())
+            print(f"== {name}: {result['rows']} rows, {total_reads} logical reads")
+            for table, (scans, logical) in sorted(result["reads"].items()):
+                print(f"   {table}: {scans} scans, {logical} logical reads")
+            for op, obj, est_rows in result["plan"]["operators"]:
+                warning = WARN_OPS.get(op)
+                flag = f"   <-- {warning}" if warning else ""
+                print(f"   {op:24s} {obj:45s} est. rows {est_rows}{flag}")
+            for suggestion in result["plan"]["missing"]:
+                print(f"   MISSING INDEX {suggestion}")
+            print()
+
+        managed = [name for name, _, _ in TRIP_INDEXES + USER_TRIPS_INDEXES]
+        unused = [name for name in managed if name not in used_indexes]
+        if unused:
+            print(f"Managed indexes not used by any canonical query: {', '.join(unused)}")
+        else:
+            print("All managed indexes are used by at least one canonical query.")
+        return results
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report plans and logical reads of the app's canonical queries.")
+    parser.add_argument("--manager-id", type=int, default=None)
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--trip-id", type=int, default=None)
+    args = parser.parse_args()
+
+    run_advisor({"manager_ID": args.manager_id, "user_ID": args.user_id, "trip_ID": args.trip_id})
@@ -0,0 +1,193 @@
+"""maintenance.py contains the scheduled maintenance of the trips table, which used to run inside the page renders.
+Every step runs with its number of days from the settings (see settings.py), 0 turns it off:
+
+1. archival (ARCHIVE_AFTER_DAYS): trips that ended longer ago are hidden from the manager lists (show_trip_m = 0)
+   and marked as archived by the job (auto_archived = 1).
+2. employee archival (ARCHIVE_EMPLOYEE_AFTER_DAYS): trips that ended longer ago are hidden from the employee lists
+   (show_trip_e = 0). Employees can no longer enter expenses for these trips, so choose a generous period.
+3. purge (PURGE_AFTER_DAYS): trips that a manager archived by hand ("Archive past trips") and that ended longer
+   ago are deleted with their participants (ON DELETE CASCADE). Trips archived by the job are never deleted.
+
+Retention policy: by default trips are only archived by hand, and hand-archived trips are deleted 365 days after
+their end (PURGE_AFTER_DAYS = 365), as in the first app versions. The automatic archival steps are off by default.
+
+All steps run for all managers at once in batches of batch_size rows, each committed on its own, so no long
+transaction blocks the app. The conditions compare end_date with a precomputed date, so they can seek on the index
+ix_trips_retention. An application lock (sp_getapplock) makes sure only one app process or CLI run works at a time.
+
+In the app, start_scheduler() starts a daemon thread that runs the job every MAINTENANCE_INTERVAL_S seconds
+if a step is on (set TRIP_MAINTENANCE_IN_APP=0 in the settings to disable it when the job runs as its own process).
+From the repository root:
+    python -m db.maintenance --once
+    python -m db.maintenance --loop --interval 3600
+"""
+
+import argparse
+import threading
+import time
+
+from db.query_cache import invalidate
+from settings import get_settings
+from db.query_log import logged_connect
+
+CONNECTION_STRING = get_settings().db.connection_string
+
+ARCHIVE_AFTER_DAYS = get_settings().archive_after_days
+ARCHIVE_EMPLOYEE_AFTER_DAYS = get_settings().archive_employee_after_days
+PURGE_AFTER_DAYS = get_settings().purge_after_days
+BATCH_SIZE = 5_000
+MAINTENANCE_INTERVAL_S = get_settings().maintenance_interval_s
+APP_LOCK = "trip_maintenance"
+
+ARCHIVE_MANAGER_SQL = """
+    UPDATE TOP (?) trips SET show_trip_m = 0, auto_archived = 1
+    WHERE end_date < DATEADD(day, ?, CAST(GETDATE() AS DATE))
+    AND show_trip_m = 1
+"""
+
+ARCHIVE_EMPLOYEE_SQL = """
+    UPDATE TOP (?) trips SET show_trip_e = 0
+    WHERE end_date < DATEADD(day, ?, CAST(GETDATE() AS DATE))
+    AND show_trip_e = 1
+"""
+
+PURGE_SQL = """
+    DELETE TOP (?) FROM trips
+    WHERE end_date < DATEADD(day, ?, CAST(GETDATE() AS DATE))
+    AND show_trip_m = 0
+    AND auto_archived = 0
+"""
+
+_scheduler = {"thread": None, "last_run": None, "last_result": None}
+_scheduler_lock = threading.Lock()
+
+
+def _run_batched(conn, sql: str, days: int, batch_size: int) -> int:
+    """Runs an UPDATE/DELETE TOP (?) statement until it affects less than batch_size rows.
+
+    Args:
+        conn (pyodbc.Connection): Open connection.
+        sql (str): Statement with the parameters batch size and day offset.
+        days (int): Age in days of the end_date, 0 to skip the step.
+        batch_size (int): Rows per batch and transaction.
+
+    Returns:
+        int: Number of affected rows.
+    """
+    if days <= 0:
+        return 0
+    total = 0
+    c = conn.cursor()
+    while True:
+        c.execute(sql, (batch_size, -days))
+        affected = c.rowcount
+        conn.commit()
+        total += max(affected, 0)
+        if affected < batch_size:
+            return total
+
+
+def run_maintenance(batch_size: int = BATCH_SIZE, archive_after_days: int = ARCHIVE_AFTER_DAYS,
+                    purge_after_days: int = PURGE_AFTER_DAYS,
+                    archive_employee_after_days: int = ARCHIVE_EMPLOYEE_AFTER_DAYS) -> dict | None:
+    """Runs archival and purge once for all managers, steps with 0 days are skipped.
+
+    Args:
+        batch_size (int): Rows per batch and transaction.
+        archive_after_days (int): Trips that ended longer ago are archived for the managers.
+        purge_after_days (int): Trips archived by hand that ended longer ago are deleted.
+        archive_employee_after_days (int): Trips that ended longer ago are archived for the employees.
+
+    Returns:
+        dict: Number of archived and purged trips and the duration, None if another process holds the lock.
+    """
+    t0 = time.perf_counter()
+    conn = logged_connect(CONNECTION_STRING)
+    try:
+        c = conn.cursor()
+        # session lock, released when the connection is closed; timeout 0: skip if another run is active
+        c.execute("""
+            SET NOCOUNT ON;
+            DECLARE @result INT;
+            EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Session', @LockTimeout = 0;
+            SELECT @result;
+        """, (APP_LOCK,))
+        if c.fetchone()[0] < 0:
+            return None
+        # NOCOUNT is a session setting: without OFF the batches report rowcount -1 and stop after the first one
+        c.execute("SET NOCOUNT OFF")
+        conn.commit()
+
+        result = {
+            "archived_manager": _run_batched(conn, ARCHIVE_MANAGER_SQL, archive_after_days, batch_size),
+            "archived_employee": _run_batched(conn, ARCHIVE_EMPLOYEE_SQL, archive_employee_after_days, batch_size),
+            "purged": _run_batched(conn, PURGE_SQL, purge_after_days, batch_size),
+        }
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    result["duration_s"] = round(time.perf_counter() - t0, 2)
+    if result["archived_manager"] or result["archived_employee"] or result["purged"]:
+        invalidate("trips", "user_trips")
+    return result
+
+
+def _scheduler_loop(interval_s: float):
+    while True:
+        try:
+            result = run_maintenance()
+            _scheduler["last_result"] = result
+            print(f"Trip maintenance: {result if result is not None else 'skipped, running elsewhere'}")
+        except Exception as e:
+            _scheduler["last_result"] = {"error": str(e)}
+            print(f"Trip maintenance failed: {e}")
+        _scheduler["last_run"] = time.time()
+        time.sleep(interval_s)
+
+
+def start_scheduler(interval_s: float = MAINTENANCE_INTERVAL_S) -> bool:
+    """Starts the maintenance thread of this process if it is not running yet. Safe to call on every rerun.
+
+    Args:
+        interval_s (float): Seconds between two runs; the first run starts immediately.
+
+    Returns:
+        bool: True if the scheduler runs in this process.
+    """
+    if not get_settings().trip_maintenance_in_app:
+        return False
+    if max(ARCHIVE_AFTER_DAYS, ARCHIVE_EMPLOYEE_AFTER_DAYS, PURGE_AFTER_DAYS) <= 0:
+        return False  # all steps are off
+    with _scheduler_lock:
+        thread = _scheduler["thread"]
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_scheduler_loop, args=(interval_s,), name="trip-maintenance", daemon=True)
+            thread.start()
+            _scheduler["thread"] = thread
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive and purge old trips of all managers.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--once", action="store_true", help="run once and exit (default)")
+    mode.add_argument("--loop", action="store_true", help="run every --interval seconds")
+    parser.add_argument("--interval", type=float, default=MAINTENANCE_INTERVAL_S, help="seconds between runs with --loop")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per batch and transaction")
+    parser.add_argument("--archive-after", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive trips for the managers that ended N days ago, 0: off")
+    parser.add_argument("--archive-employee-after", type=int, default=ARCHIVE_EMPLOYEE_AFTER_DAYS,
+                        help="archive trips for the employees that ended N days ago, 0: off")
+    parser.add_argument("--purge-after", type=int, default=PURGE_AFTER_DAYS,
+                        help="delete trips archived by hand that ended N days ago, 0: off")
+    args = parser.parse_args()
+
+    while True:
+        print(run_maintenance(args.batch_size, args.archive_after, args.purge_after, args.archive_employee_after)
+              or "Skipped, another run holds the lock.")
+        if not args.loop:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,135 @@
+"""pagination.py contains the keyset pagination used by the trip list views of managers and employees.
+
+Instead of loading every matching trip, a list view loads one page of PAGE_SIZE trips ordered by
+(start_date, trip_ID). The next page starts after the key of the last row of the current page, so the database
+seeks directly to it, no matter how many trips came before (unlike OFFSET). The start keys of the visited pages
+are kept in the session_state, so "Previous" just goes back to the stored key. Trips without start_date are
+sorted first (as SQL Server sorts NULL) and paged like the others.
+
+The list queries are templates with a "{keyset}" placeholder behind the WHERE clause and "TOP (?)" as first parameter.
+"""
+
+import streamlit as st
+from db.query_cache import read_sql_cached
+from settings import get_settings
+
+PAGE_SIZE = get_settings().page_size
+PAGE_SIZE_OPTIONS = sorted({5, 10, 25, 50, PAGE_SIZE})
+
+
+def _is_null(value) -> bool:
+    """True for None and the NaN/NaT pandas uses for a NULL start_date."""
+    return value is None or value != value
+
+
+def keyset_predicate(alias: str = "", null_start: bool = False) -> str:
+    """Returns the condition that selects all rows after a given (start_date, trip_ID) key.
+
+    NULL start dates sort before all dates, so after a key without start_date come the remaining trips without
+    start_date and all trips with one.
+
+    Args:
+        alias (str): Table alias of the trips table in the query, e.g. "t".
+        null_start (bool): The start_date of the key is NULL.
+
+    Returns:
+        str: SQL with three parameters (start_date, start_date, trip_ID), one (trip_ID) if null_start.
+    """
+    prefix = f"{alias}." if alias else ""
+    if null_start:
+        return f"AND (({prefix}start_date IS NULL AND {prefix}trip_ID > ?) OR {prefix}start_date IS NOT NULL)"
+    return f"AND ({prefix}start_date > ? OR ({prefix}start_date = ? AND {prefix}trip_ID > ?))"
+
+
+def fetch_keyset_page(engine, sql_template: str, params: tuple, after=None, page_size: int = PAGE_SIZE, alias: str = "",
+                      tags: tuple = ("trips",)):
+    """Loads one page of a list query.
+
+    Args:
+        engine: SQLAlchemy engine.
+        sql_template (str): Query with "TOP (?)" and a "{keyset}" placeholder, ordered by start_date, trip_ID.
+        params (tuple): Parameters of the query without page size and keyset.
+        after (tuple): (start_date, trip_ID) of the last row of the previous page, None for the first page.
+        page_size (int): Number of rows per page.
+        alias (str): Table alias of the trips table in the query.
+        tags (tuple): Tables the query reads, for the query cache.
+
+    Returns:
+        (pd.DataFrame, bool): The rows of the page and whether there is a next page.
+    """
+    if after is None:
+        sql = sql_template.format(keyset="")
+        all_params = (page_size + 1, *params)
+    elif _is_null(after[0]):
+        sql = sql_template.format(keyset=keyset_predicate(alias, null_start=True))
+        all_params = (page_size + 1, *params, int(after[1]))
+    else:
+        sql = sql_template.format(keyset=keyset_predicate(alias))
+        all_params = (page_size + 1, *params, after[0], after[0], int(after[1]))
+
+    # one row more than needed tells whether a next page exists
+    df = read_sql_cached(sql, engine, params=all_params, tags=tags)
+    return df.iloc[:page_size], len(df) > page_size
+
+
+def _next_page(list_key: str, key):
+    st.session_state[f"{list_key}_page_keys"].append(key)
+
+
+def _previous_page(list_key: str):
+    keys = st.session_state[f"{list_key}_page_keys"]
+    if len(keys) > 1:
+        keys.pop()
+
+
+def _reset_pages(list_key: str):
+    st.session_state[f"{list_key}_page_keys"] = [None]
+
+
+def paginated_trips(list_key: str, engine, sql_template: str, params: tuple, alias: str = "", tags: tuple = ("trips",)):
+    """Loads the current page of a trip list and renders the page navigation below the list.
+
+    Args:
+        list_key (str): Unique name of the list, used for the session_state and widget keys.
+        engine: SQLAlchemy engine.
+        sql_template (str): List query, see fetch_keyset_page().
+        params (tuple): Parameters of the query.
+        alias (str): Table alias of the trips table in the query.
+        tags (tuple): Tables the query reads, for the query cache.
+
+    Returns:
+        (pd.DataFrame, callable): The rows of the current page and a function that renders the navigation.
+    """
+    keys_name = f"{list_key}_page_keys"
+    if keys_name not in st.session_state:
+        st.session_state[keys_name] = [None]
+    keys = st.session_state[keys_name]
+    page_size = st.session_state.get(f"{list_key}_page_size", PAGE_SIZE)
+
+    df, has_next = fetch_keyset_page(engine, sql_template, params, keys[-1], page_size, alias, tags)
+
+    # e.g. all trips of the last page were archived: start again at the first page
+    if df.empty and len(keys) > 1:
+        _reset_pages(list_key)
+        keys = st.session_state[keys_name]
+        df, has_next = fetch_keyset_page(engine, sql_template, params, None, page_size, alias, tags)
+
+    def render_navigation():
+        if len(keys) == 1 and not has_next:
+            return
+        col_prev, col_page, col_next, col_size = st.columns([1, 2, 1, 2])
+        with col_prev:
+            st.button("← Previous", key=f"{list_key}_prev", disabled=len(keys) == 1,
+                      on_click=_previous_page, args=(list_key,))
+        with col_page:
+            st.caption(f"Page {len(keys)}")
+        with col_next:
+            last_key = (df.iloc[-1]["start_date"], df.iloc[-1]["trip_ID"]) if not df.empty else None
+            st.button("Next →", key=f"{list_key}_next", disabled=not has_next,
+                      on_click=_next_page, args=(list_key, last_key))
+        with col_size:
+            st.selectbox("Trips per page", PAGE_SIZE_OPTIONS, key=f"{list_key}_page_size",
+                         index=PAGE_SIZE_OPTIONS.index(page_size) if page_size in PAGE_SIZE_OPTIONS else 1,
+                         on_change=_reset_pages, args=(list_key,), label_visibility="collapsed")
+
+    return df, render_navigation
@@ -0,0 +1,134 @@
+"""query_cache.py contains a small cache for the read queries of the Streamlit pages, so a rerun with unchanged
+parameters does not go to the database again.
+
+Results are cached per session (in the session_state) under the SQL text and its parameters. Every entry is tagged
+with the tables it reads. Functions that write to a table call invalidate() with that table; this increments a
+process-wide version of the tag, so the entries that read the table are reloaded in every session, not only in
+the one that wrote. Writes from other processes (e.g. the command line tools) are picked up after QUERY_CACHE_TTL_S.
+
+Tags used in this repository: "users", "trips", "user_trips", "expense_summary" (roles are kept in db_roles.py).
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from settings import get_settings
+from tracing import span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+QUERY_CACHE_TTL_S = get_settings().query_cache_ttl_s
+MAX_ENTRIES = get_settings().query_cache_max_entries
+
+_tag_versions = {}
+_tag_lock = threading.Lock()
+
+
+def invalidate(*tags: str):
+    """Marks all cached results that depend on one of the given tables as outdated, in all sessions.
+
+    Args:
+        *tags (str): Names of the tables that were written.
+
+    Returns:
+        None
+    """
+    with _tag_lock:
+        for tag in tags:
+            _tag_versions[tag] = _tag_versions.get(tag, 0) + 1
+
+
+def _versions(tags) -> tuple:
+    return tuple(_tag_versions.get(tag, 0) for tag in tags)
+
+
+def cached_query(sql: str, params: tuple, tags: tuple, load):
+    """Returns the cached result of a query or runs load() and caches its result.
+
+    Outside a Streamlit session (command line tools) nothing is cached.
+
+    Args:
+        sql (str): The query, part of the cache key.
+        params (tuple): The query parameters, part of the cache key.
+        tags (tuple): Tables the query reads.
+        load (callable): Runs the query without arguments and returns the result; None is not cached.
+
+    Returns:
+        The result of load(), possibly from an earlier run.
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return load()
+
+    cache = st.session_state.setdefault("_query_cache", {})
+    key = (sql, tuple(params))
+    tags = tuple(tags)
+    versions = _versions(tags)
+    entry = cache.get(key)
+    if entry is not None:
+        result, entry_versions, loaded_at = entry
+        if entry_versions == versions and time.monotonic() - loaded_at < QUERY_CACHE_TTL_S:
+            with span("db", sql, cache="hit"):
+                return result
+
+    with span("db", sql, cache="miss") as attrs:
+        result = load()
+        if result is not None:
+            attrs["rows"] = len(result)
+    if result is None:
+        # e.g. no connection, try again on the next run
+        return None
+    if len(cache) >= MAX_ENTRIES:
+        # drop the oldest entry (dicts keep insertion order)
+        cache.pop(next(iter(cache)))
+    cache.pop(key, None)
+    cache[key] = (result, versions, time.monotonic())
+    return result
+
+
+def read_sql_cached(sql: str, engine, params: tuple = (), tags: tuple = ()) -> "pd.DataFrame":
+    """Cached version of pd.read_sql_query().
+
+    Args:
+        sql (str): The query.
+        engine: SQLAlchemy engine.
+        params (tuple): Query parameters.
+        tags (tuple): Tables the query reads.
+
+    Returns:
+        pd.DataFrame: A copy of the cached result, so callers can modify it.
+    """
+    # pandas is imported on first use, the login page does not need it
+    import pandas as pd
+
+    df = cached_query(sql, params, tags, lambda: pd.read_sql_query(sql, engine, params=tuple(params)))
+    return df.copy()
+
+
+def fetchall_cached(sql: str, connect, params: tuple = (), tags: tuple = ()):
+    """Cached version of cursor.execute() followed by fetchall().
+
+    Args:
+        sql (str): The query.
+        connect (callable): The connect() function of the calling module, returns a pyodbc connection or None.
+        params (tuple): Query parameters.
+        tags (tuple): Tables the query reads.
+
+    Returns:
+        list: The rows as tuples, or None if there is no connection (not cached).
+    """
+    def load():
+        conn = connect()
+        if conn is None:
+            return None
+        try:
+            c = conn.cursor()
+            c.execute(sql, params)
+            return [tuple(row) for row in c.fetchall()]
+        finally:
+            conn.close()
+
+    return cached_query(sql, params, tags, load)
@@ -0,0 +1,455 @@
+"""query_log.py contains the central log of all SQL statements of the app, for the pyodbc connections as well as
+the SQLAlchemy engines (pandas).
+
+logged_connect() replaces pyodbc.connect() and create_logged_engine() replaces create_engine(): both hand out
+connections whose cursors time every execute() and count the rows fetched afterwards. For every statement the
+normalized SQL text (literals and IN lists replaced, whitespace collapsed), a fingerprint of the parameters, the
+duration, the rows and the calling function of the app are recorded:
+
+- in process-wide statistics per normalized statement (count, rows, p50/p95/p99/max), shown to admins by
+  query_stats_panel(); many executions of the same statement from one caller point to an N+1 pattern,
+  a high p95 to a missing index,
+- as one JSON line in QUERY_LOG_FILE (setting, off by default, e.g. logs/query_log.jsonl). The lines are
+  handed to a background thread, so queries do not wait for the disk, and the file is rotated at
+  QUERY_LOG_MAX_BYTES with QUERY_LOG_BACKUPS old files kept,
+- as a warning on stdout if the statement took longer than SLOW_QUERY_MS (setting, default 500),
+- as a span of the current trace (tracing.py).
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from functools import cache, lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+import pyodbc
+import urllib
+from settings import get_settings
+from tracing import span
+
+SLOW_QUERY_MS = get_settings().slow_query_ms
+QUERY_LOG_FILE = get_settings().query_log_file
+QUERY_LOG_MAX_BYTES = 50 * 2**20
+QUERY_LOG_BACKUPS = 5
+# durations kept per statement for the percentiles
+SAMPLES_PER_STATEMENT = 1_000
+MAX_STATEMENTS = 500
+
+# frames of these modules are skipped when looking for the calling function
+_INTERNAL_PREFIXES = ("db.query_log", "db.query_cache", "db.pagination", "db.db_bulk", "sqlalchemy", "pandas", "tracing")
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w@#.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2_048)
+def normalize_sql(sql: str) -> str:
+    """Normalizes a statement, so executions with different values are counted together.
+
+    Args:
+        sql (str): The statement as executed.
+
+    Returns:
+        str: The statement with literals replaced by ?, IN and multi-row VALUES lists collapsed and
+        whitespace collapsed, e.g. "SELECT * FROM users WHERE user_ID IN (...)".
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = " ".join(sql.split())
+    sql = _VALUES_LIST.sub("VALUES (...), ...", sql)
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def params_fingerprint(params) -> str:
+    """Returns a short hash of the parameter values, equal for repeated executions with the same values.
+
+    Args:
+        params: Parameters of execute(), a sequence or None.
+
+    Returns:
+        str: 10 hex digits, "" without parameters.
+    """
+    if not params:
+        return ""
+    return hashlib.blake2b(repr(tuple(params)).encode("utf-8", "replace"), digest_size=5).hexdigest()
+
+
+def _caller() -> str:
+    """Returns module.function:line of the first frame outside the database layers."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_INTERNAL_PREFIXES) and module != __name__:
+            return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "?"
+
+
+@cache
+def _query_logger() -> logging.Logger | None:
+    """Returns the logger of the log file, writing in a background thread; None if the file cannot be opened."""
+    try:
+        path = Path(QUERY_LOG_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=QUERY_LOG_MAX_BYTES, backupCount=QUERY_LOG_BACKUPS,
+                                           encoding="utf-8")
+    except OSError as e:
+        print(f"Could not open query log: {e}")
+        return None
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    # writes the lines still in the queue
+    atexit.register(listener.stop)
+
+    logger = logging.getLogger("query_log")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(QueueHandler(log_queue))
+    return logger
+
+
+def _write_log(entry: dict):
+    if not QUERY_LOG_FILE:
+        return
+    logger = _query_logger()
+    if logger is not None:
+        logger.info(json.dumps(entry))
+
+
+def record_query(sql: str, params, duration_ms: float, rows: int, caller: str, error: str | None = None):
+    """Adds one execution to the statistics and the log file.
+
+    Args:
+        sql (str): The statement as executed.
+        params: Its parameters.
+        duration_ms (float): Time of execute() plus fetching the rows.
+        rows (int): Rows fetched (SELECT) or affected (INSERT/UPDATE/DELETE), -1 if unknown.
+        caller (str): The calling function of the app.
+        error (str | None): Name of the exception if the statement failed.
+
+    Returns:
+        None
+    """
+    statement = normalize_sql(sql)
+    with _stats_lock:
+        stats = _stats.get(statement)
+        if stats is None:
+            if len(_stats) >= MAX_STATEMENTS:
+                # forget the statement that was not seen for the longest time
+                del _stats[min(_stats, key=lambda s: _stats[s]["last_seen"])]
+            stats = _stats[statement] = {
+                "count": 0, "errors": 0, "slow": 0, "rows": 0, "total_ms": 0.0,
+                "samples": deque(maxlen=SAMPLES_PER_STATEMENT), "callers": Counter(), "last_seen": 0.0,
+            }
+        stats["count"] += 1
+        stats["errors"] += error is not None
+        stats["slow"] += duration_ms >= SLOW_QUERY_MS
+        stats["rows"] += max(rows, 0)
+        stats["total_ms"] += duration_ms
+        stats["samples"].append(duration_ms)
+        stats["callers"][caller] += 1
+        stats["last_seen"] = time.time()
+
+    if duration_ms >= SLOW_QUERY_MS:
+        print(f"Slow query ({duration_ms:,.0f} ms, {rows} rows) from {caller}: {statement[:300]}")
+    _write_log({
+        "ts": round(time.time(), 3),
+        "sql": statement,
+        "params": params_fingerprint(params),
+        "ms": round(duration_ms, 2),
+        "rows": rows,
+        "caller": caller,
+        "slow": duration_ms >= SLOW_QUERY_MS,
+        **({"error": error} if error else {}),
+    })
+
+
+def query_stats() -> list:
+    """Returns the statistics per normalized statement, slowest total time first.
+
+    Args:
+        None
+
+    Returns:
+        list: dicts with statement, count, errors, slow, rows, total_ms, p50_ms, p95_ms, p99_ms, max_ms and
+        the top caller with its share of the executions.
+    """
+    with _stats_lock:
+        snapshot = [(statement, dict(s, samples=sorted(s["samples"]), callers=s["callers"].copy()))
+                    for statement, s in _stats.items()]
+
+    def pct(samples, p):
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+    result = []
+    for statement, s in snapshot:
+        caller, calls = s["callers"].most_common(1)[0]
+        result.append({
+            "statement": statement,
+            "count": s["count"],
+            "errors": s["errors"],
+            "slow": s["slow"],
+            "rows": s["rows"],
+            "total_ms": round(s["total_ms"], 1),
+            "p50_ms": round(pct(s["samples"], 50), 1),
+            "p95_ms": round(pct(s["samples"], 95), 1),
+            "p99_ms": round(pct(s["samples"], 99), 1),
+            "max_ms": round(s["samples"][-1], 1),
+            "top_caller": f"{caller} ({calls / s['count']:.0%})",
+        })
+    return sorted(result, key=lambda r: r["total_ms"], reverse=True)
+
+
+def reset_query_stats():
+    """Forgets all statistics, e.g. before measuring one page."""
+    with _stats_lock:
+        _stats.clear()
+
+
+class LoggedCursor:
+    """pyodbc cursor that records its statements. An execution is recorded once its rows are fetched
+    completely, or when the cursor executes the next statement or is closed."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_pending", None)
+
+    def __getattr__(self, name):
+        if name in ("_cursor", "_pending"):
+            raise AttributeError(name)
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # e.g. fast_executemany, set by SQLAlchemy and db_bulk.py
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        object.__setattr__(self, "_pending", None)
+        pending["span"].__exit__(None, None, None)
+        rows = pending["rows"] if pending["fetched"] else pending["rowcount"]
+        record_query(pending["sql"], pending["params"], pending["ms"], rows, pending["caller"])
+
+    def _run(self, method, sql, params, many=False):
+        self._finish()
+        if not many and len(params) == 1 and isinstance(params[0], (tuple, list)):
+            # execute(sql, (a, b)) and execute(sql, a, b) are the same for pyodbc
+            log_params = params[0]
+        else:
+            log_params = params
+        caller = _caller()
+        trace_span = span("db", sql, caller=caller)
+        trace_span.__enter__()
+        start = time.perf_counter()
+        try:
+            if many:
+                method(sql, params)
+            else:
+                method(sql, *params)
+        except BaseException as e:
+            trace_span.__exit__(type(e), e, None)
+            record_query(sql, log_params, (time.perf_counter() - start) * 1000, -1, caller, type(e).__name__)
+            raise
+        object.__setattr__(self, "_pending", {
+            "sql": sql, "params": log_params if not many else (), "caller": caller, "span": trace_span,
+            "ms": (time.perf_counter() - start) * 1000, "rows": 0, "fetched": False,
+            "rowcount": self._cursor.rowcount,
+        })
+        return self
+
+    def _fetched(self, start: float, rows: int, done: bool):
+        pending = self._pending
+        if pending is None:
+            return
+        pending["ms"] += (time.perf_counter() - start) * 1000
+        pending["rows"] += rows
+        pending["fetched"] = True
+        if done:
+            self._finish()
+
+    def execute(self, sql, *params):
+        return self._run(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._run(self._cursor.executemany, sql, seq_of_params, many=True)
+        pending = self._pending
+        if pending is not None:
+            pending["rowcount"] = len(seq_of_params)
+        self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def fetchval(self):
+        start = time.perf_counter()
+        value = self._cursor.fetchval()
+        self._fetched(start, 1, True)
+        return value
+
+    def nextset(self):
+        self._finish()
+        return self._cursor.nextset()
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class LoggedConnection:
+    """pyodbc connection whose cursors are LoggedCursors; everything else is passed through."""
+
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        if name == "_conn":
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.__exit__(*exc)
+
+    def cursor(self):
+        return LoggedCursor(self._conn.cursor())
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+
+def logged_connect(connection_string: str, **kwargs) -> LoggedConnection:
+    """Opens a pyodbc connection whose statements are logged, use it instead of pyodbc.connect().
+
+    Args:
+        connection_string (str): ODBC connection string.
+        **kwargs: Further arguments of pyodbc.connect().
+
+    Returns:
+        LoggedConnection: Behaves like a pyodbc.Connection.
+
+    Raises:
+        pyodbc.Error: If the connection fails.
+    """
+    return LoggedConnection(pyodbc.connect(connection_string, **kwargs))
+
+
+def create_logged_engine(connection_string: str, **kwargs):
+    """Creates a SQLAlchemy engine for SQL Server whose statements are logged, use it instead of create_engine().
+
+    Args:
+        connection_string (str): ODBC connection string.
+        **kwargs: Further arguments of create_engine(), default fast_executemany=True.
+
+    Returns:
+        sqlalchemy.engine.Engine
+    """
+    # SQLAlchemy is imported on first use, the login page does not need it
+    from sqlalchemy import create_engine
+
+    kwargs.setdefault("fast_executemany", True)
+    connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(connection_string)
+    return create_engine(connect_uri, creator=lambda: logged_connect(connection_string), **kwargs)
+
+
+@cache
+def get_engine():
+    """Returns the SQLAlchemy engine of the app database, shared by all modules of this process.
+
+    It is created on the first call with the connection pool of the settings (DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT_S, DB_POOL_RECYCLE_S); connections are checked before they are handed out.
+
+    Args:
+        None
+
+    Returns:
+        sqlalchemy.engine.Engine
+    """
+    settings = get_settings()
+    return create_logged_engine(
+        settings.db.connection_string,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_s,
+        pool_recycle=settings.db_pool_recycle_s,
+        pool_pre_ping=True,
+    )
+
+
+def query_stats_panel(title: str = "SQL queries"):
+    """This function creates the expander with the query statistics of this server process, for admins.
+
+    Args:
+        title (str): The title of the expander.
+
+    Returns:
+        None
+    """
+    import pandas as pd
+    import streamlit as st
+
+    with st.expander(title, expanded=False):
+        stats = query_stats()
+        st.caption(f"Since the start of this server process; slow means at least {SLOW_QUERY_MS:,.0f} ms."
+                   + (f" Every statement is logged to {QUERY_LOG_FILE}." if QUERY_LOG_FILE else ""))
+        if not stats:
+            st.info("No queries recorded yet.")
+            return
+        df = pd.DataFrame(stats)
+        st.dataframe(df, hide_index=True, column_config={"statement": st.column_config.TextColumn(width="large")})
+        if st.button("Reset statistics", key="query_stats_reset"):
+            reset_query_stats()
+            st.rerun()
@@ -0,0 +1,218 @@
+"""seed_org.py is a command line tool which fills the database with a synthetic organization for load tests:
+N managers with M employees each and K trips with their participants. All rows are bulk-loaded in batched
+transactions, and every user gets the same bcrypt hash, which is computed only once.
+
+Usernames start with a prefix (default: lt<timestamp>), so several runs do not collide and the test data can be
+removed again with --delete.
+
+Run it from the repository root:
+    python -m db.seed_org --managers 200 --employees 50 --trips 500000 --seed 1
+    python -m db.seed_org --delete --prefix lt20260101120000
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import bcrypt
+import numpy as np
+
+from db.db_bulk import executemany_fast, insert_returning_ids, chunked
+from db.db_functions_users import connect, create_tables, initialize_data
+from db.db_functions_trips import create_trip_table, create_trip_users_table
+from ml.seed_trips import ALL_CITIES
+
+OCCASIONS = [
+    "Customer meeting", "Workshop", "Trade fair", "Team offsite", "Training",
+    "Project kick-off", "Site visit", "Conference", "Board meeting", "Audit",
+]
+
+TRIP_BATCH_SIZE = 5_000
+
+
+def participant_counts(rng, num_trips: int, team_size: int):
+    """Draws the number of participants per trip: mostly 1-3 people, sometimes a larger group
+    and in about 2 % of the trips a team offsite with a big part of the team.
+
+    Args:
+        rng (np.random.Generator): Random generator.
+        num_trips (int): Number of trips.
+        team_size (int): Number of employees of the manager.
+
+    Returns:
+        np.ndarray: Participants per trip, between 1 and team_size.
+    """
+    counts = rng.geometric(0.55, num_trips)
+    offsite = rng.random(num_trips) < 0.02
+    counts[offsite] = (team_size * rng.uniform(0.3, 0.8, offsite.sum())).astype(int)
+    return np.clip(counts, 1, team_size)
+
+
+def _insert_users(conn, rows: list) -> list:
+    """Inserts (username, password, email, role, manager_ID) rows and returns their user_IDs."""
+    return insert_returning_ids(conn, "users", ["username", "password", "email", "role", "manager_ID"], rows, "user_ID")
+
+
+def populate(managers: int, employees: int, trips: int, prefix: str, password: str, seed=None):
+    """Creates the synthetic organization and its trips.
+
+    Args:
+        managers (int): Number of managers.
+        employees (int): Number of employees per manager.
+        trips (int): Total number of trips, distributed randomly over the managers.
+        prefix (str): Prefix of all usernames.
+        password (str): Password of all generated users.
+        seed (int | None): Seed for reproducible data.
+
+    Returns:
+        dict: Number of created rows per table.
+    """
+    rng = np.random.default_rng(seed)
+    py_rng = random.Random(seed)
+
+    # one hash for all users instead of one bcrypt round per user
+    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+
+    create_tables()
+    initialize_data()
+    create_trip_table()
+    create_trip_users_table()
+
+    conn = connect()
+    if conn is None:
+        raise RuntimeError("No connection to the database.")
+
+    try:
+        # 1) managers, assigned to themselves like in register_main()
+        t0 = time.perf_counter()
+        manager_rows = [(f"{prefix}_m{i}", hashed_pw, f"{prefix}_m{i}@example.com", "Manager", None) for i in range(managers)]
+        manager_ids = _insert_users(conn, manager_rows)
+        executemany_fast(conn, "UPDATE users SET manager_ID = ? WHERE user_ID = ?", [(mid, mid) for mid in manager_ids])
+        conn.commit()
+
+        # 2) employees per manager
+        employee_rows = []
+        for i, mid in enumerate(manager_ids):
+            for j in range(employees):
+                name = f"{prefix}_m{i}_e{j}"
+                employee_rows.append((name, hashed_pw, f"{name}@example.com", "User", mid))
+        employee_ids = _insert_users(conn, employee_rows)
+        conn.commit()
+        team_of = {mid: employee_ids[i * employees:(i + 1) * employees] for i, mid in enumerate(manager_ids)}
+        print(f"Inserted {len(manager_ids)} managers and {len(employee_ids)} employees in {time.perf_counter() - t0:.1f}s")
+
+        # 3) trips and participants, one transaction per batch
+        t0 = time.perf_counter()
+        today = date.today()
+        n_cities = len(ALL_CITIES)
+        n_trips = n_assignments = 0
+
+        for batch_start in range(0, trips, TRIP_BATCH_SIZE):
+            n = min(TRIP_BATCH_SIZE, trips - batch_start)
+            trip_managers = rng.choice(manager_ids, n)
+            origin_idx = rng.integers(0, n_cities, n)
+            dest_idx = rng.integers(0, n_cities - 1, n)
+            dest_idx += dest_idx >= origin_idx
+            start_offsets = rng.integers(-365, 365, n)
+            durations = rng.integers(0, 5, n)
+            start_hours = rng.integers(7, 11, n)
+            end_hours = rng.integers(16, 20, n)
+            methods = rng.integers(0, 2, n)
+            occasions = rng.integers(0, len(OCCASIONS), n)
+
+            trip_rows = []
+            for k in range(n):
+                start = today + timedelta(days=int(start_offsets[k]))
+                trip_rows.append((
+                    ALL_CITIES[origin_idx[k]], ALL_CITIES[dest_idx[k]],
+                    start, start + timedelta(days=int(durations[k])),
+                    f"{start_hours[k]:02d}:00", f"{end_hours[k]:02d}:00",
+                    OCCASIONS[occasions[k]], int(trip_managers[k]), int(methods[k]),
+                ))
+            trip_ids = insert_returning_ids(conn, "trips", [
+                "origin", "destination", "start_date", "end_date", "start_time", "end_time",
+                "occasion", "manager_ID", "method_transport",
+            ], trip_rows, "trip_ID")
+
+            assignments = []
+            counts = participant_counts(rng, n, employees) if employees else np.zeros(n, dtype=int)
+            for k, trip_id in enumerate(trip_ids):
+                team = team_of[int(trip_managers[k])]
+                for user_id in py_rng.sample(team, int(counts[k])):
+                    assignments.append((trip_id, user_id))
+            executemany_fast(conn, "INSERT INTO user_trips (trip_ID, user_ID) VALUES (?, ?)", assignments)
+            conn.commit()
+
+            n_trips += len(trip_ids)
+            n_assignments += len(assignments)
+            print(f"  {n_trips}/{trips} trips, {n_assignments} assignments")
+
+        print(f"Inserted {n_trips} trips and {n_assignments} assignments in {time.perf_counter() - t0:.1f}s")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return {
+        "managers": len(manager_ids),
+        "employees": len(employee_ids),
+        "trips": n_trips,
+        "user_trips": n_assignments,
+    }
+
+
+def delete_population(prefix: str) -> int:
+    """Deletes all trips and users created with the given prefix (participants are removed on cascade).
+
+    Args:
+        prefix (str): The prefix used for populate().
+
+    Returns:
+        int: Number of deleted users.
+    """
+    conn = connect()
+    if conn is None:
+        raise RuntimeError("No connection to the database.")
+
+    c = conn.cursor()
+    pattern = prefix.replace("[", "[[]").replace("_", "[_]").replace("%", "[%]") + "[_]m%"
+    try:
+        c.execute("SELECT user_ID FROM users WHERE username LIKE ? AND role = 'Manager'", (pattern,))
+        manager_ids = [row[0] for row in c.fetchall()]
+        for batch in chunked(manager_ids, 1000):
+            marks = ", ".join("?" * len(batch))
+            # delete in chunks to keep the transaction log small
+            while True:
+                c.execute(f"DELETE TOP (10000) FROM trips WHERE manager_ID IN ({marks})", batch)
+                if c.rowcount < 10000:
+                    break
+                conn.commit()
+        c.execute("DELETE FROM users WHERE username LIKE ?", (pattern,))
+        deleted = c.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate the database with a synthetic organization for load tests.")
+    parser.add_argument("--managers", type=int, default=10, help="number of managers")
+    parser.add_argument("--employees", type=int, default=20, help="employees per manager")
+    parser.add_argument("--trips", type=int, default=1000, help="total number of trips")
+    parser.add_argument("--prefix", default=f"lt{time.strftime('%Y%m%d%H%M%S')}", help="prefix of all usernames")
+    parser.add_argument("--password", default="LoadTest123!", help="password of all generated users")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random generator")
+    parser.add_argument("--delete", action="store_true", help="delete the users and trips with --prefix instead")
+    args = parser.parse_args()
+
+    if args.delete:
+        print(f"Deleted {delete_population(args.prefix)} users with prefix '{args.prefix}'.")
+    else:
+        result = populate(args.managers, args.employees, args.trips, args.prefix, args.password, seed=args.seed)
+        print(f"Done (prefix '{args.prefix}'): {result}")
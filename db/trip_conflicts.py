@@ -0,0 +1,218 @@
+"""trip_conflicts.py contains the detection of double-booked employees: when a manager assigns employees to a
+trip, the participant selections mark everyone who is already on another trip at the same time.
+
+All upcoming trips of the employees of a manager are loaded with one query and kept as an interval index per
+employee (IntervalIndex), so checking a whole team against a trip costs one binary search per employee instead of
+one query per employee and trip. The index is cached like a query result (query_cache.py) and rebuilt when trips,
+participants or users change.
+
+A trip lasts from start_date start_time to end_date end_time; a missing time counts as the start or the end of
+the day. Trips that only touch (one returns at 09:00, the other departs at 09:00) do not conflict.
+"""
+
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from itertools import accumulate
+
+from db.query_cache import cached_query
+
+# trips of all employees of a manager that have not ended yet, also those created by other managers
+UPCOMING_BOOKINGS_SQL = """
+    SELECT ut.user_ID, t.trip_ID, t.origin, t.destination, t.start_date, t.end_date, t.start_time, t.end_time
+    FROM users u
+    JOIN user_trips ut ON ut.user_ID = u.user_ID
+    JOIN trips t ON t.trip_ID = ut.trip_ID
+    WHERE u.manager_ID = ?
+    AND t.end_date >= CAST(GETDATE() AS DATE)
+"""
+
+
+@dataclass(frozen=True)
+class BookedTrip:
+    """A trip an employee participates in."""
+
+    trip_ID: int
+    origin: str
+    destination: str
+    start: datetime
+    end: datetime
+
+
+def _as_date(value) -> date | None:
+    """Converts a DATE column (date, datetime, Timestamp or ISO string) to a date, None if it is empty."""
+    if value is None or value != value:  # None or NaN/NaT
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _as_time(value) -> time | None:
+    """Converts a TIME column (time or a string like "09:00" or "09:00:00.0000000") to a time, None if it is empty."""
+    if value is None or value != value or value == "":
+        return None
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(str(value)[:8])
+
+
+def trip_window(start_date, end_date, start_time=None, end_time=None) -> tuple | None:
+    """Returns the period of a trip.
+
+    Args:
+        start_date: Departure date (date or ISO string).
+        end_date: Return date (date or ISO string).
+        start_time: Departure time (time or "HH:MM"), None for the start of the day.
+        end_time: Return time (time or "HH:MM"), None for the end of the day.
+
+    Returns:
+        tuple: (start, end) as datetimes, None if a date is missing.
+    """
+    start_day, end_day = _as_date(start_date), _as_date(end_date)
+    if start_day is None or end_day is None:
+        return None
+    start = datetime.combine(start_day, _as_time(start_time) or time.min)
+    end = datetime.combine(end_day, _as_time(end_time) or time.max)
+    return start, max(start, end)
+
+
+class IntervalIndex:
+    """Static interval index over the trips of one employee.
+
+    The trips are sorted by their start, and max_end[i] holds the latest end of the first i + 1 trips. A query
+    for the period [start, end) finds the trips that start before end with a binary search and walks them
+    backwards only as long as one of them can still end after start, so it costs O(log n + k) for k hits on
+    the usual, mostly disjoint, trip lists.
+    """
+
+    def __init__(self, trips: list):
+        self._trips = sorted(trips, key=lambda trip: (trip.start, trip.trip_ID))
+        self._starts = [trip.start for trip in self._trips]
+        self._max_end = list(accumulate((trip.end for trip in self._trips), max))
+
+    def __len__(self) -> int:
+        return len(self._trips)
+
+    def overlapping(self, start: datetime, end: datetime) -> list:
+        """Returns the trips that overlap the period [start, end), ordered by their start."""
+        i = bisect_left(self._starts, end)
+        hits = []
+        while i > 0 and self._max_end[i - 1] > start:
+            i -= 1
+            if self._trips[i].end > start:
+                hits.append(self._trips[i])
+        hits.reverse()
+        return hits
+
+
+class TripConflictIndex:
+    """Interval indexes of the upcoming trips of all employees of a manager, see load_conflict_index()."""
+
+    def __init__(self, rows: list):
+        trips_by_user = {}
+        for user_ID, trip_ID, origin, destination, start_date, end_date, start_time, end_time in rows:
+            window = trip_window(start_date, end_date, start_time, end_time)
+            if window is None:
+                continue
+            trips_by_user.setdefault(int(user_ID), []).append(BookedTrip(int(trip_ID), origin, destination, *window))
+        self._indexes = {user_ID: IntervalIndex(trips) for user_ID, trips in trips_by_user.items()}
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+    def conflicts(self, user_ids, start: datetime, end: datetime, exclude_trip_ID: int | None = None) -> dict:
+        """Returns the employees who are already on another trip during [start, end).
+
+        Args:
+            user_ids: The user_IDs to check.
+            start (datetime): Departure of the trip.
+            end (datetime): Return of the trip.
+            exclude_trip_ID (int | None): The trip itself when its participants are edited.
+
+        Returns:
+            dict: user_ID -> list of the overlapping BookedTrips, only for employees with conflicts.
+        """
+        conflicts = {}
+        for user_ID in user_ids:
+            index = self._indexes.get(int(user_ID))
+            if index is None:
+                continue
+            trips = [trip for trip in index.overlapping(start, end) if trip.trip_ID != exclude_trip_ID]
+            if trips:
+                conflicts[int(user_ID)] = trips
+        return conflicts
+
+
+def load_conflict_index(manager_ID: int, connect) -> TripConflictIndex | None:
+    """Returns the conflict index of the employees of a manager, built from one query and cached until trips,
+    participants or users change.
+
+    Args:
+        manager_ID (int): ID of the manager.
+        connect (callable): The connect() function of the calling module, returns a pyodbc connection or None.
+
+    Returns:
+        TripConflictIndex | None: The index, None if there is no connection.
+    """
+    def load():
+        conn = connect()
+        if conn is None:
+            return None
+        try:
+            c = conn.cursor()
+            c.execute(UPCOMING_BOOKINGS_SQL, (manager_ID,))
+            return TripConflictIndex(c.fetchall())
+        finally:
+            conn.close()
+
+    return cached_query(UPCOMING_BOOKINGS_SQL, (manager_ID,), ("users", "trips", "user_trips"), load)
+
+
+def find_conflicts(manager_ID: int, connect, user_ids, window: tuple | None, exclude_trip_ID: int | None = None) -> dict:
+    """Checks employees against the upcoming trips of the team, see TripConflictIndex.conflicts().
+
+    Args:
+        manager_ID (int): ID of the manager of the employees.
+        connect (callable): The connect() function of the calling module.
+        user_ids: The user_IDs to check.
+        window (tuple | None): (start, end) of the trip as returned by trip_window(), None to check nothing.
+        exclude_trip_ID (int | None): The trip itself when its participants are edited.
+
+    Returns:
+        dict: user_ID -> list of the overlapping BookedTrips; empty without a window or a connection.
+    """
+    if window is None:
+        return {}
+    index = load_conflict_index(manager_ID, connect)
+    if index is None:
+        return {}
+    return index.conflicts(user_ids, *window, exclude_trip_ID=exclude_trip_ID)
+
+
+def describe_trips(trips: list) -> str:
+    """Short description of overlapping trips, e.g. "#12 Zürich → Bern (20.10. 09:00 – 22.10. 18:00)"."""
+    def moment(value: datetime) -> str:
+        return value.strftime("%d.%m.") if value.time() in (time.min, time.max) else value.strftime("%d.%m. %H:%M")
+
+    return ", ".join(
+        f"#{trip.trip_ID} {trip.origin} → {trip.destination} ({moment(trip.start)} – {moment(trip.end)})"
+        for trip in trips
+    )
+
+
+def conflict_label(username: str, trips: list | None) -> str:
+    """Label of an employee in a participant selection, marked if the employee is double-booked.
+
+    Args:
+        username (str): Name of the employee.
+        trips (list | None): The overlapping trips of the employee, if any.
+
+    Returns:
+        str: The username, with a warning sign and the overlapping trips for double-booked employees.
+    """
+    if not trips:
+        return username
+    return f"⚠️ {username} — also on {describe_trips(trips)}"
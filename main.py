@@ -4,24 +4,20 @@ db_functions_users.py."""
 
 import streamlit as st
 import time
-import pyodbc
-from db.db_functions_users import create_tables, add_user, get_user_by_credentials, get_role_sortkey, register_main, get_user_ID, get_manager_ID, initialize_data, add_user
-import pandas as pd
-import requests
-from sqlalchemy import create_engine
-import urllib
-from utils import hide_sidebar, load_secrets
+from db.db_functions_users import create_tables, add_user, get_user, get_user_by_credentials, get_role_sortkey, register_main, get_user_ID, get_manager_ID, initialize_data
+from utils import hide_sidebar
+from tracing import start_trace, trace_panel
+from settings import get_settings
 
 # basic page settings
 st.set_page_config(page_title="Login", layout="centered", initial_sidebar_state="collapsed")
+start_trace("login")
 hide_sidebar()
 st.title("Login")
 
 
-CONNECTION_STRING = load_secrets()
-
-# admin password from st.secrets
-ADMIN = st.secrets["dummy"]["ADMIN"]
+# admin password from the secrets ([dummy] ADMIN)
+ADMIN = get_settings().admin_password
 
 #create db and table 'users' if non-existent
 create_tables()
@@ -38,17 +34,12 @@ def create_first_users():
     Returns:
         None"""
     
-    # create engine and connection   
-    connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(CONNECTION_STRING)
-    engine = create_engine(connect_uri, fast_executemany=True)
-
-    ckeck_users_df = pd.read_sql_query("""
-        SELECT username FROM users 
-        WHERE username = ?
-        """, engine, params=('Admin',)
-    )
-
-    if len(ckeck_users_df) == 0:
+    # a plain lookup, so the login page needs neither pandas nor an engine of its own on every run
+    if get_user("Admin") is None:
+        # never create the administrator with an empty password, bcrypt would accept an empty login
+        if not ADMIN:
+            st.error("No password for the first administrator: set ADMIN in the section [dummy] of the secrets.")
+            st.stop()
         add_user("Admin", ADMIN, "a@gmail.com", "Administrator")
     else:
         pass
@@ -89,3 +80,5 @@ if submitted:
 # Registration for new managers
 """Not registered yet? You can register as a manager and start planning your business-trips within your company, create a new account and start inviting your employees. Register now:"""
 register_main()
+
+trace_panel()
@@ -0,0 +1,225 @@
+"""
+This module contains the registry of model backends that ml_model.py can use to predict total trip costs.
+
+Every backend builds an sklearn pipeline on the same four features (tier, dest_city, distance_km, duration_days).
+The backends differ in training and inference cost:
+- "ridge": linear model on one-hot features plus tier x duration interactions, very cheap to fit and predict
+- "forest": random forest with capped depth and number of trees, so the pickled model stays small
+- "hist_gb": HistGradientBoostingRegressor, which scales to large training sets
+
+Which backends are tried depends on the number of training rows. After the candidates were evaluated,
+the most accurate backend that stays within the prediction latency budget is chosen.
+
+scikit-learn takes more than a second to import, so it is only imported when a pipeline is built or evaluated,
+not when the dashboards import this module.
+"""
+import time
+
+import pandas as pd
+
+CATEGORICAL_COLS = ["tier", "dest_city"]
+NUMERIC_COLS = ["distance_km", "duration_days"]
+TIERS = ["T1", "T2", "T3"]
+
+# maximal time (in ms) a single one-row prediction may take in the manager's trip list
+LATENCY_BUDGET_MS = 50.0
+
+
+def _add_interactions(X: pd.DataFrame) -> pd.DataFrame:
+    """Adds one duration column per tier, so a linear model can learn tier-specific costs per day.
+
+    Args:
+        X (pd.DataFrame): Features with at least the columns tier and duration_days.
+
+    Returns:
+        pd.DataFrame: Copy of X with the additional columns dur_T1, dur_T2 and dur_T3.
+    """
+    X = X.copy()
+    for tier in TIERS:
+        X[f"dur_{tier}"] = (X["tier"] == tier) * X["duration_days"]
+    return X
+
+
+def _make_ridge(**params):
+    """Builds a ridge regression on one-hot encoded categories and scaled engineered numeric features."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.linear_model import Ridge
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+
+    numeric = NUMERIC_COLS + [f"dur_{tier}" for tier in TIERS]
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_COLS),
+            ("num", StandardScaler(), numeric),
+        ]
+    )
+    return Pipeline(steps=[
+        ("features", FunctionTransformer(_add_interactions)),
+        ("pre", preprocessor),
+        ("model", Ridge(alpha=params.get("alpha", 1.0))),
+    ])
+
+
+def _make_forest(**params):
+    """Builds a random forest with capped depth and tree count to bound model size and predict latency."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_COLS),
+            ("num", "passthrough", NUMERIC_COLS),
+        ]
+    )
+    return Pipeline(steps=[
+        ("pre", preprocessor),
+        ("model", RandomForestRegressor(
+            n_estimators=params.get("n_estimators", 100),
+            max_depth=params.get("max_depth", 12),
+            min_samples_leaf=params.get("min_samples_leaf", 2),
+            random_state=42,
+            n_jobs=params.get("n_jobs", 1),
+        )),
+    ])
+
+
+def _make_hist_gb(**params):
+    """Builds a HistGradientBoostingRegressor on dense one-hot features."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), CATEGORICAL_COLS),
+            ("num", "passthrough", NUMERIC_COLS),
+        ]
+    )
+    return Pipeline(steps=[
+        ("pre", preprocessor),
+        ("model", HistGradientBoostingRegressor(
+            learning_rate=params.get("learning_rate", 0.1),
+            max_iter=params.get("max_iter", 200),
+            max_leaf_nodes=params.get("max_leaf_nodes", 31),
+            random_state=42,
+        )),
+    ])
+
+
+# Registry of all backends. min_rows/max_rows define for which training set sizes a backend is a candidate
+# (max_rows None = no upper limit).
+MODEL_BACKENDS = {
+    "ridge": {"factory": _make_ridge, "min_rows": 0, "max_rows": None},
+    "forest": {"factory": _make_forest, "min_rows": 0, "max_rows": 50_000},
+    "hist_gb": {"factory": _make_hist_gb, "min_rows": 200, "max_rows": None},
+}
+
+DEFAULT_BACKEND = "forest"
+
+
+def make_backend(name: str, **params):
+    """Builds an unfitted pipeline for the given backend.
+
+    Args:
+        name (str): Key of the backend in MODEL_BACKENDS.
+        **params: Optional hyperparameters passed to the backend factory.
+
+    Returns:
+        sklearn.pipeline.Pipeline: The unfitted pipeline.
+
+    Raises:
+        ValueError: If the backend is not registered.
+    """
+    if name not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}'. Available: {sorted(MODEL_BACKENDS)}")
+    return MODEL_BACKENDS[name]["factory"](**params)
+
+
+def candidate_backends(n_rows: int) -> list:
+    """Returns the names of all backends suitable for a training set with n_rows rows.
+
+    Args:
+        n_rows (int): Number of training rows.
+
+    Returns:
+        list: Backend names, ordered as in MODEL_BACKENDS.
+    """
+    names = []
+    for name, spec in MODEL_BACKENDS.items():
+        if n_rows < spec["min_rows"]:
+            continue
+        if spec["max_rows"] is not None and n_rows > spec["max_rows"]:
+            continue
+        names.append(name)
+    return names
+
+
+def evaluate_backends(names: list, X_tr, y_tr, X_te, y_te) -> tuple:
+    """Fits every backend on the training split and measures fit time, predict latency and MAE.
+
+    The predict latency is measured for a single row, because the app predicts one trip at a time.
+
+    Args:
+        names (list): Backend names to evaluate.
+        X_tr, y_tr: Training features and target.
+        X_te, y_te: Validation features and target.
+
+    Returns:
+        tuple: (report, fitted) where report is a list of dicts with the keys backend, n_rows, fit_s,
+            predict_ms and mae, and fitted maps the backend name to its fitted pipeline.
+    """
+    from sklearn.metrics import mean_absolute_error
+
+    report = []
+    fitted = {}
+    one_row = X_te.iloc[[0]]
+
+    for name in names:
+        pipe = make_backend(name)
+
+        t0 = time.perf_counter()
+        pipe.fit(X_tr, y_tr)
+        fit_s = time.perf_counter() - t0
+
+        mae = mean_absolute_error(y_te, pipe.predict(X_te))
+
+        # best of a few runs, so a single scheduler hiccup does not disqualify a backend
+        latencies = []
+        for _ in range(5):
+            t0 = time.perf_counter()
+            pipe.predict(one_row)
+            latencies.append(time.perf_counter() - t0)
+        predict_ms = min(latencies) * 1000
+
+        report.append({
+            "backend": name,
+            "n_rows": len(X_tr) + len(X_te),
+            "fit_s": round(fit_s, 4),
+            "predict_ms": round(predict_ms, 3),
+            "mae": round(float(mae), 2),
+        })
+        fitted[name] = pipe
+
+    return report, fitted
+
+
+def pick_backend(report: list, latency_budget_ms: float = LATENCY_BUDGET_MS) -> str:
+    """Chooses the backend with the lowest MAE among all candidates within the latency budget.
+
+    If no candidate meets the budget, the fastest one is chosen.
+
+    Args:
+        report (list): Output of evaluate_backends().
+        latency_budget_ms (float): Maximal predict latency for one row in milliseconds.
+
+    Returns:
+        str: Name of the chosen backend.
+    """
+    within_budget = [r for r in report if r["predict_ms"] <= latency_budget_ms]
+    if within_budget:
+        return min(within_budget, key=lambda r: r["mae"])["backend"]
+    return min(report, key=lambda r: r["predict_ms"])["backend"]
@@ -9,75 +9,50 @@ It expects a table called "expenses_user_data" that stores trip records with at
 - total_cost
 
 The model is trained on these data and saved as "model.pkl" in the same directory as this file.
+On every retraining all backends from ml_backends.py that suit the number of rows are compared,
+their fit time, predict latency and MAE are appended to "backend_report.csv".
 If no model exists yet, the module can bootstrap from a CSV file called "seed_trips.csv", the data used for initial training of the model.
 
-In addition, helper functions are provided to classify Swiss cities into three cost tiers.
-Cities that are not explicitly listed in any tier are treated as Tier 3 by default.
+The cost tier of the destination city is a feature of the model, it is determined by tiers.py.
 """
 import pyodbc
 import pickle
+import json
+import os
+import threading
+from functools import lru_cache
 from pathlib import Path
 import streamlit as st
 
 import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error
-from sqlalchemy import create_engine
-from utils import load_secrets
-import urllib
+from ml.tiers import tier_of, use_tier_table
+from ml.ml_backends import DEFAULT_BACKEND, LATENCY_BUDGET_MS, make_backend, candidate_backends, evaluate_backends, pick_backend
+from settings import get_settings
+from db.query_log import logged_connect, get_engine
+from tracing import span, traced
 
-CONNECTION_STRING = load_secrets()
-connect_uri = "mssql+pyodbc:///?odbc_connect=" + urllib.parse.quote_plus(CONNECTION_STRING)
-engine = create_engine(connect_uri, fast_executemany=True)
+CONNECTION_STRING = get_settings().db.connection_string
+
+# optional overrides of the built-in city tiers from the table city_tiers, the engine is created on the first lookup
+use_tier_table(get_engine)
 
 
 BASE_DIR = Path(__file__).resolve().parent
 
 MODEL_PATH = BASE_DIR / "model.pkl"
-TABLE_NAME = "expenses_user_data"
-
-# Tier 1 Cities: Swiss cities considered most expensive for seed data generation
-TIER_1_CITIES = {
-    "Zurich", "Geneva", "Basel", "Lausanne", "Zermatt", "St. Moritz",
-    "Davos", "Klosters", "Verbier", "Gstaad", "Andermatt", "Grindelwald",
-    "Wengen", "Mürren", "Saas-Fee", "Arosa", "Lenzerheide", "Flims", "Laax",
-    "Engelberg", "Crans-Montana", "Montreux", "Lucerne", "Ascona", "Zug"
-}
-
-# Tier 2 Cities: Swiss cities considered moderately expensive for seed data generation
-TIER_2_CITIES = {
-    "Bern", "Winterthur", "St. Gallen", "Biel", "Schaffhausen",
-    "Chur", "Thun", "Neuchâtel", "Fribourg", "Sion", "Brig", "Bellinzona",
-    "Interlaken", "Kloten", "Lugano", "Locarno",
-}
-
-# Tier 3 Cities: Swiss cities considered least expensive for seed data generation
-TIER_3_CITIES = {
-    "Solothurn", "Olten", "Rapperswil", "Uster", "Baden", "Wil", "Arbon",
-    "Romanshorn", "Spiez", "Steffisburg", "Villars-sur-Glâne", "Pfäffikon", "Wetzikon"
-}
-
-
-def get_tier(city: str) -> str:
-    """Determines the cost tier of a given city."""
-    if city in TIER_1_CITIES:
-        return "T1"
-    if city in TIER_2_CITIES:
-        return "T2"
-    if city in TIER_3_CITIES:
-        return "T3"
-    # Fallback: any unknown city is treated as Tier 3
-    return "T3"
+MODEL_META_PATH = BASE_DIR / "model_meta.json"
+BACKEND_REPORT_PATH = BASE_DIR / "backend_report.csv"
+FEATURE_COLS = ["tier", "dest_city", "distance_km", "duration_days"]
 
+# Number of distinct feature tuples whose prediction is memoized per model version
+PREDICTION_CACHE_SIZE = get_settings().prediction_cache_size
+TABLE_NAME = "expenses_user_data"
 
+@traced("db", "connect")
 def connect():
     """Connects to Azure SQL-database and returns a pyodbc.Connection."""
     try:
-        conn = pyodbc.connect(CONNECTION_STRING)
+        conn = logged_connect(CONNECTION_STRING)
         return conn
     except pyodbc.Error as ex:
         sqlstate = ex.args[0]
@@ -115,32 +90,25 @@ def _ensure_table(conn: pyodbc.Connection):
         conn.rollback()
 
 
-def _make_pipeline():
+def _make_pipeline(backend: str = DEFAULT_BACKEND):
     """
-    Build the sklearn pipeline:
+    Build the sklearn pipeline for the given backend (see ml_backends.MODEL_BACKENDS):
     - OneHotEncode tier and dest_city
-    - pass through distance_km and duration_days as numeric
-    - RandomForestRegressor model
+    - distance_km and duration_days as numeric features
+    - ridge, capped-depth forest or histogram gradient boosting as model
     """
-    categorical_cols = ["tier", "dest_city"]
-    numeric_cols = ["distance_km", "duration_days"]
-
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_cols),
-            ("num", "passthrough", numeric_cols),
-        ]
-    )
+    return make_backend(backend)
+
 
-    pipe = Pipeline(steps=[
-        ("pre", preprocessor),
-        ("model", RandomForestRegressor(
-            n_estimators=200,
-            random_state=42,
-            n_jobs=-1
-        )),
-    ])
-    return pipe
+def _record_backend_report(report: list, chosen: str):
+    """Appends the evaluation of all candidate backends to backend_report.csv, marking the chosen one."""
+    df = pd.DataFrame(report)
+    df["chosen"] = df["backend"] == chosen
+    df.insert(0, "trained_at", pd.Timestamp.now().isoformat(timespec="seconds"))
+    try:
+        df.to_csv(BACKEND_REPORT_PATH, mode="a", index=False, header=not BACKEND_REPORT_PATH.exists())
+    except OSError as e:
+        print(f"Could not write backend report: {e}")
 
 
 def initial_train_from_csv(csv_path: str):
@@ -177,19 +145,19 @@ def initial_train_from_csv(csv_path: str):
     conn.close()
 
     # Insert using SQLAlchemy engine (this avoids the pandas DBAPI warnings)
-    df_to_db.to_sql(TABLE_NAME, engine, if_exists="append", index=False)
+    df_to_db.to_sql(TABLE_NAME, get_engine(), if_exists="append", index=False)
 
     # Train + save
     return retrain_model()
 
 
-def retrain_model():
+def load_training_data():
     """
-    Trains or retrains the model on all rows in the table.
+    Loads all rows of the training table and builds the feature matrix.
 
-    The trained pipeline is saved to model.pkl.
     Returns:
-        The MAE on a validation set if there are enough samples; otherwise None.
+        (X, y) with X containing tier, dest_city, distance_km and duration_days and y the total_cost,
+        or None if there is no connection or no data.
     """
     # Ensure table exists
     conn = connect()
@@ -201,37 +169,105 @@ def retrain_model():
     # Load data using SQLAlchemy engine
     df = pd.read_sql_query(
         f"SELECT dest_city, distance_km, duration_days, total_cost FROM {TABLE_NAME}",
-        engine,
+        get_engine(),
     )
 
     if df.empty:
         print("No training data found in expenses_user_data.")
         return None
 
-    df["tier"] = df["dest_city"].apply(get_tier)
+    df["tier"] = tier_of(df["dest_city"])
 
     X = df[["tier", "dest_city", "distance_km", "duration_days"]]
     y = df["total_cost"]
+    return X, y
+
+
+def publish_model(pipe, metadata: dict | None = None) -> str:
+    """
+    Publishes a trained pipeline to the model store (model.pkl plus model_meta.json).
+
+    Both files are written to a temporary file first and then swapped in, so a running app never
+    unpickles a half-written model.
+
+    Args:
+        pipe: The fitted sklearn pipeline.
+        metadata (dict): Optional information about the model (backend, params, MAE, ...).
+
+    Returns:
+        str: The version of the published model.
+    """
+    version = pd.Timestamp.now().strftime("%Y%m%d%H%M%S%f")
+
+    tmp_model = MODEL_PATH.with_suffix(".pkl.tmp")
+    with open(tmp_model, "wb") as f:
+        pickle.dump(pipe, f)
+    os.replace(tmp_model, MODEL_PATH)
+
+    meta = {"version": version, "published_at": pd.Timestamp.now().isoformat(timespec="seconds")}
+    meta.update(metadata or {})
+    tmp_meta = MODEL_META_PATH.with_suffix(".json.tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(tmp_meta, MODEL_META_PATH)
+
+    print(f"Published model version {version}.")
+    return version
+
+
+def get_model_meta() -> dict:
+    """Returns the metadata of the currently published model, or an empty dict if there is none."""
+    try:
+        with open(MODEL_META_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 
-    pipe = _make_pipeline()
+@traced("ml", "retrain model")
+def retrain_model():
+    """
+    Trains or retrains the model on all rows in the table.
+
+    The trained pipeline is published to the model store (model.pkl).
+    Returns:
+        The MAE on a validation set if there are enough samples; otherwise None.
+    """
+    data = load_training_data()
+    if data is None:
+        return None
+    X, y = data
+
+    candidates = candidate_backends(len(X))
+
+    # Hold-out evaluation of all candidate backends if we have enough samples
+    if len(X) >= 8:
+        from sklearn.model_selection import train_test_split
 
-    # Hold-out evaluation if we have enough samples
-    if len(df) >= 8:
         X_tr, X_te, y_tr, y_te = train_test_split(X, y, test_size=0.2, random_state=42)
-        pipe.fit(X_tr, y_tr)
-        mae = mean_absolute_error(y_te, pipe.predict(X_te))
-        print(f"Model retrained with hold-out MAE = {mae:.2f}")
+        report, fitted = evaluate_backends(candidates, X_tr, y_tr, X_te, y_te)
+        for r in report:
+            print(f"Backend {r['backend']}: MAE = {r['mae']:.2f}, fit = {r['fit_s']:.3f}s, predict = {r['predict_ms']:.2f}ms")
+
+        backend = pick_backend(report, LATENCY_BUDGET_MS)
+        _record_backend_report(report, backend)
+        pipe = fitted[backend]
+        mae = next(r["mae"] for r in report if r["backend"] == backend)
+        print(f"Model retrained with backend '{backend}' and hold-out MAE = {mae:.2f}")
     else:
+        # too few rows to compare backends, the cheapest candidate is good enough
+        backend = candidates[0]
+        pipe = _make_pipeline(backend)
         pipe.fit(X, y)
         mae = None
-        print("Model retrained on full data set (not enough rows for hold-out).")
+        print(f"Model retrained with backend '{backend}' on full data set (not enough rows for hold-out).")
 
-    with open(MODEL_PATH, "wb") as f:
-        pickle.dump(pipe, f)
+    publish_model(pipe, {"backend": backend, "mae": mae, "n_rows": len(X), "source": "retrain_model"})
 
     return mae
 
 
+@traced("ml", "load model")
 def load_model():
     """
     Loads the trained model with fallback to seed-based training.
@@ -279,3 +315,97 @@ def load_model():
         except Exception as e2:
             print(f"Failed to load model.pkl even after rebuild: {e2}")
             return None
+
+
+# Model currently held in memory as one (version, model) pair, swapped when a new version is published
+_current = {"entry": (None, None)}
+_current_lock = threading.Lock()
+_version_cache = {"mtime": None, "version": None}
+
+
+def get_model_version() -> str | None:
+    """
+    Returns the version of the published model. It changes whenever publish_model() runs,
+    only a stat() call is needed as long as model_meta.json is unchanged.
+
+    Returns:
+        str: The model version, or None if no model was published yet.
+    """
+    try:
+        meta_mtime = MODEL_META_PATH.stat().st_mtime_ns
+    except OSError:
+        # model.pkl from before the model store existed: its modification time is the version
+        try:
+            return f"mtime-{MODEL_PATH.stat().st_mtime_ns}"
+        except OSError:
+            return None
+
+    if _version_cache["mtime"] != meta_mtime:
+        _version_cache["version"] = get_model_meta().get("version")
+        _version_cache["mtime"] = meta_mtime
+    return _version_cache["version"]
+
+
+def get_current_model():
+    """
+    Returns the published model, unpickling it only when a new version was published.
+    Publishing a new version also clears the prediction cache.
+
+    Returns:
+        (model, version), model is None if no model could be loaded.
+    """
+    version = get_model_version()
+    current_version, current_model = _current["entry"]
+    if version is not None and version == current_version:
+        return current_model, version
+
+    with _current_lock:
+        # another thread may have loaded this version while we waited for the lock
+        current_version, current_model = _current["entry"]
+        version = get_model_version()
+        if version is not None and version == current_version:
+            return current_model, version
+
+        # load_model() may just have trained and published the first model; if another version is published
+        # while loading, load again, so the model always belongs to its version
+        for _ in range(3):
+            model = load_model()
+            loaded_version = get_model_version()
+            if loaded_version == version:
+                break
+            version = loaded_version
+        _current["entry"] = (version, model)
+        _predict_cached.cache_clear()
+    return model, version
+
+
+@lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _predict_cached(features: tuple, version: str, model) -> float:
+    """Runs the given model of the version for one feature tuple, memoized on (features, version, model)."""
+    X_pred = pd.DataFrame([dict(zip(FEATURE_COLS, features))])
+    with span("ml", "model.predict", city=features[1]):
+        return float(model.predict(X_pred)[0])
+
+
+def predict_cost(tier: str, dest_city: str, distance_km: float, duration_days: int) -> float | None:
+    """
+    Predicts the total cost of a trip for one person.
+
+    Predictions are memoized per feature tuple and model version, so rerendering the same trips
+    skips the inference. The distance is rounded to 100 m for the cache key.
+
+    Args:
+        tier (str): Cost tier of the destination ("T1", "T2" or "T3").
+        dest_city (str): Destination city.
+        distance_km (float): Distance between origin and destination in km.
+        duration_days (int): Duration of the trip in days.
+
+    Returns:
+        float: The predicted cost in CHF, or None if no model is available.
+    """
+    model, version = get_current_model()
+    if model is None:
+        return None
+
+    features = (tier, dest_city, round(float(distance_km), 1), int(duration_days))
+    return _predict_cached(features, version, model)
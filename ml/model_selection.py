@@ -0,0 +1,176 @@
+"""
+model_selection.py is an offline job that tunes the cost prediction model and publishes the winner to the model store.
+
+For every backend in ml_backends.py a small hyperparameter grid is evaluated with k-fold cross-validation.
+All (candidate, fold) combinations run in a bounded process pool. The pool has its own core budget, so tuning
+never competes with the Streamlit server for all cores. The best candidate is refitted on the full data set
+and published via ml_model.publish_model(), from where the app picks it up on the next prediction.
+
+Run it from the repository root, e.g. nightly via cron:
+    python -m ml.model_selection --folds 5 --workers 2
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.model_selection import KFold
+from sklearn.metrics import mean_absolute_error
+from threadpoolctl import threadpool_limits
+
+from ml.ml_backends import make_backend, candidate_backends
+
+# Hyperparameter grid per backend. Forests always run single-threaded and the workers cap the native (OpenMP/BLAS)
+# threads of hist_gb and ridge at one, the parallelism comes from the pool.
+PARAM_GRID = {
+    "ridge": [
+        {"alpha": 0.1},
+        {"alpha": 1.0},
+        {"alpha": 10.0},
+    ],
+    "forest": [
+        {"n_estimators": 50, "max_depth": 8, "n_jobs": 1},
+        {"n_estimators": 100, "max_depth": 12, "n_jobs": 1},
+        {"n_estimators": 200, "max_depth": 16, "n_jobs": 1},
+    ],
+    "hist_gb": [
+        {"learning_rate": 0.05, "max_iter": 300, "max_leaf_nodes": 15},
+        {"learning_rate": 0.1, "max_iter": 200, "max_leaf_nodes": 31},
+    ],
+}
+
+# Default core budget: half of the machine, the other half stays with the web server
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+DEFAULT_FOLDS = 5
+
+# training data of the worker process, set once by _init_worker instead of pickling it for every task
+_X = None
+_y = None
+
+
+def _init_worker(X, y, niceness: int):
+    """Initializes a pool worker with the training data, one native thread and a lower scheduling priority."""
+    global _X, _y
+    _X, _y = X, y
+    # OpenMP and BLAS would start a thread per core in every worker, workers x cores threads in total
+    threadpool_limits(limits=1)
+    if niceness and hasattr(os, "nice"):
+        try:
+            os.nice(niceness)
+        except OSError:
+            pass
+
+
+def _score_fold(backend: str, params_idx: int, fold: int, train_idx, test_idx) -> dict:
+    """Fits one candidate on one fold and returns its validation MAE and fit time."""
+    params = PARAM_GRID[backend][params_idx]
+    pipe = make_backend(backend, **params)
+
+    t0 = time.perf_counter()
+    pipe.fit(_X.iloc[train_idx], _y.iloc[train_idx])
+    fit_s = time.perf_counter() - t0
+
+    mae = mean_absolute_error(_y.iloc[test_idx], pipe.predict(_X.iloc[test_idx]))
+    return {"backend": backend, "params_idx": params_idx, "fold": fold, "mae": float(mae), "fit_s": fit_s}
+
+
+def cross_validate_grid(X, y, folds: int = DEFAULT_FOLDS, workers: int = DEFAULT_WORKERS, niceness: int = 10) -> list:
+    """
+    Runs k-fold cross-validation for every backend/hyperparameter combination in a process pool.
+
+    Args:
+        X (pd.DataFrame): Features (tier, dest_city, distance_km, duration_days).
+        y (pd.Series): Target total_cost.
+        folds (int): Number of folds.
+        workers (int): Maximal number of worker processes (core budget of the job).
+        niceness (int): Scheduling priority increment of the workers (POSIX only).
+
+    Returns:
+        list: One dict per candidate with backend, params, mean_mae, std_mae and mean_fit_s,
+            sorted by mean_mae.
+    """
+    folds = max(2, min(folds, len(X)))
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=42).split(X))
+
+    tasks = []
+    for backend in candidate_backends(len(X)):
+        for params_idx in range(len(PARAM_GRID.get(backend, []))):
+            for fold, (train_idx, test_idx) in enumerate(splits):
+                tasks.append((backend, params_idx, fold, train_idx, test_idx))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y, niceness)) as pool:
+        futures = [pool.submit(_score_fold, *task) for task in tasks]
+        scores = [f.result() for f in futures]
+
+    results = []
+    candidates = sorted({(s["backend"], s["params_idx"]) for s in scores})
+    for backend, params_idx in candidates:
+        fold_scores = [s for s in scores if s["backend"] == backend and s["params_idx"] == params_idx]
+        maes = np.array([s["mae"] for s in fold_scores])
+        results.append({
+            "backend": backend,
+            "params": PARAM_GRID[backend][params_idx],
+            "mean_mae": round(float(maes.mean()), 2),
+            "std_mae": round(float(maes.std()), 2),
+            "mean_fit_s": round(float(np.mean([s["fit_s"] for s in fold_scores])), 4),
+        })
+
+    return sorted(results, key=lambda r: r["mean_mae"])
+
+
+def run_model_selection(folds: int = DEFAULT_FOLDS, workers: int = DEFAULT_WORKERS, publish: bool = True):
+    """
+    Loads the training data, cross-validates the grid and publishes the best candidate.
+
+    Args:
+        folds (int): Number of folds.
+        workers (int): Core budget of the process pool.
+        publish (bool): If False, only the ranking is printed (dry run).
+
+    Returns:
+        list: The ranking from cross_validate_grid(), or None if there is not enough data.
+    """
+    # imported here so pool workers do not load the database layer
+    from ml.ml_model import load_training_data, publish_model
+
+    data = load_training_data()
+    if data is None:
+        return None
+    X, y = data
+
+    if len(X) < 4:
+        print("Not enough rows for cross-validation.")
+        return None
+
+    t0 = time.perf_counter()
+    ranking = cross_validate_grid(X, y, folds=folds, workers=workers)
+    print(f"Cross-validated {len(ranking)} candidates with {folds} folds on {workers} workers in {time.perf_counter() - t0:.1f}s")
+    for r in ranking:
+        print(f"  {r['backend']:8s} {r['params']}: MAE = {r['mean_mae']:.2f} ± {r['std_mae']:.2f}, fit = {r['mean_fit_s']:.3f}s")
+
+    if publish:
+        best = ranking[0]
+        pipe = make_backend(best["backend"], **best["params"])
+        pipe.fit(X, y)
+        publish_model(pipe, {
+            "backend": best["backend"],
+            "params": best["params"],
+            "mae": best["mean_mae"],
+            "n_rows": len(X),
+            "folds": folds,
+            "source": "model_selection",
+        })
+
+    return ranking
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated model selection for the trip cost model.")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS, help="number of CV folds")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="core budget of the process pool")
+    parser.add_argument("--dry-run", action="store_true", help="only print the ranking, do not publish")
+    args = parser.parse_args()
+
+    run_model_selection(folds=args.folds, workers=args.workers, publish=not args.dry_run)
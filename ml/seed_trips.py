@@ -4,39 +4,28 @@ Swiss cities and towns are grouped into three cost tiers. For each generated
 trip, the script selects an origin and a destination at random and assigns:
 - a hotel cost based on real scraped example rates for the respective tier,
 - a daily meal cost within the tier-specific range,
-- and an estimated SBB ticket price derived from the geodesic distance.
+- and an estimated SBB ticket price derived from the great-circle distance.
 
-The output is a CSV file (seed_trips.csv), which serves as the initial training dataset for the machine learning model.
+All trips are generated at once with NumPy from a seeded random generator and offline city coordinates,
+so millions of rows can be produced in seconds (e.g. for training and DB load benchmarks). Large data sets
+are written in chunks to CSV or Parquet (needs pyarrow, see requirements.txt).
+
+The default output is a CSV file (seed_trips.csv) with 75 trips, which serves as the initial training dataset for the machine learning model.
+    python -m ml.seed_trips
+    python -m ml.seed_trips --rows 5000000 --out trips_5m.parquet --seed 42
 """
 
-import random
+import argparse
+import time
+from pathlib import Path
 from typing import Dict, Tuple, List, Optional
 
+import numpy as np
 import pandas as pd
 from geopy.distance import geodesic
 
-from api.api_city_lookup import get_city_coords
-
-# Tier 1 Cities: Swiss cities considered most expensive for seed data generation
-TIER_1_CITIES = {
-    "Zurich", "Geneva", "Basel", "Lausanne", "Zermatt", "St. Moritz",
-    "Davos", "Klosters", "Verbier", "Gstaad", "Andermatt", "Grindelwald",
-    "Wengen", "Mürren", "Saas-Fee", "Arosa", "Lenzerheide", "Flims", "Laax",
-    "Engelberg", "Crans-Montana", "Montreux", "Lucerne", "Ascona", "Zug"
-}
-
-# Tier 2 Cities: Swiss cities considered moderately expensive for seed data generation
-TIER_2_CITIES = {
-    "Bern", "Winterthur", "St. Gallen", "Biel", "Schaffhausen",
-    "Chur", "Thun", "Neuchâtel", "Fribourg", "Sion", "Brig", "Bellinzona",
-    "Interlaken", "Kloten", "Lugano", "Locarno",
-}
-
-# Tier 3 Cities: Swiss cities considered least expensive for seed data generation
-TIER_3_CITIES = {
-    "Solothurn", "Olten", "Rapperswil", "Uster", "Baden", "Wil", "Arbon",
-    "Romanshorn", "Spiez", "Steffisburg", "Villars-sur-Glâne", "Pfäffikon", "Wetzikon"
-}
+from api.api_city_lookup import get_city_coords, get_offline_coords, OFFLINE_CITY_COORDS
+from ml.tiers import TIER_1_CITIES, TIER_2_CITIES, TIER_3_CITIES, get_tier
 
 TIER_HOTEL_RATES = {
     "T1": [332.00, 203.00, 360.65, 223.75, 190.55, 169.80, 215.00],
@@ -44,6 +33,10 @@ TIER_HOTEL_RATES = {
     "T3": [161.00, 179.00, 154.00, 223.50, 223.00, 150.00, 142.00],
 }
 
+# SBB estimate of both generators: (BASE_FARE + PER_KM * km) per direction
+BASE_FARE = 5.0
+PER_KM = 0.40
+
 TIER_BASELINES = {
     "T1": {"meals_min": 80.0, "meals_max": 100.0},
     "T2": {"meals_min": 75.0, "meals_max": 95.0},
@@ -53,31 +46,9 @@ TIER_BASELINES = {
 # Distance and SBB fares
 _coords_cache: Dict[str, Tuple[float, float]] = {}
 
-def get_tier(city: str) -> str:
-    """
-    Determines the cost tier of a given city.
-
-    The function checks whether the city is listed in the Tier 1, Tier 2,
-    or Tier 3 city sets and returns the corresponding tier label. Cities
-    not found in any of the predefined sets are assigned to Tier 3 by default.
-
-    Args:
-        city (str): Name of the city.
-
-    Returns:
-        str: The tier label ("T1", "T2", or "T3") associated with the city.
-    """
-    if city in TIER_1_CITIES:
-        return "T1"
-    if city in TIER_2_CITIES:
-        return "T2"
-    if city in TIER_3_CITIES:
-        return "T3"
-    return "T3"
-
 def get_coords_cached(city: str):
     """
-    Returns coordinates for a city, using a simple caching mechanism to reduce repeated external lookups.
+    Returns coordinates for a city from the offline table, or via a cached live lookup for other cities.
 
     Args:
         city: Name of the city.
@@ -88,7 +59,7 @@ def get_coords_cached(city: str):
     if city in _coords_cache:
         return _coords_cache[city]
 
-    coords = get_city_coords(city)
+    coords = get_offline_coords(city) or get_city_coords(city)
     if coords is not None:
         _coords_cache[city] = coords
     return coords
@@ -120,11 +91,8 @@ def estimate_distance_and_ticket(origin: str, dest: str):
 
     distance_km = geodesic(origin_coords, dest_coords).km
 
-    base_fare = 5.0
-    per_km = 0.40
-
-    # Always round trip for seed data
-    ticket_cost = (base_fare + per_km * distance_km) * 2
+    # Always round trip for seed data, same fare as generate_random_seed_trips()
+    ticket_cost = (BASE_FARE + PER_KM * distance_km) * 2
 
     return distance_km, ticket_cost
 
@@ -133,8 +101,37 @@ def estimate_distance_and_ticket(origin: str, dest: str):
 ALL_CITIES: List[str] = sorted(TIER_1_CITIES | TIER_2_CITIES | TIER_3_CITIES)
 
 NUM_TRIPS= 75
+CHUNK_SIZE = 1_000_000
+
+EARTH_RADIUS_KM = 6371.0088
+
+TIER_LABELS = np.array(["T1", "T2", "T3"])
 
-def generate_random_seed_trips():
+# lookup arrays indexed by position in ALL_CITIES resp. tier code (0 = T1, 1 = T2, 2 = T3)
+_CITY_LAT = np.array([OFFLINE_CITY_COORDS[c][0] for c in ALL_CITIES])
+_CITY_LON = np.array([OFFLINE_CITY_COORDS[c][1] for c in ALL_CITIES])
+_CITY_TIER_CODES = np.array([int(get_tier(c)[1]) - 1 for c in ALL_CITIES])
+_HOTEL_RATES = np.array([TIER_HOTEL_RATES[t] for t in TIER_LABELS])
+_MEALS_MIN = np.array([TIER_BASELINES[t]["meals_min"] for t in TIER_LABELS])
+_MEALS_MAX = np.array([TIER_BASELINES[t]["meals_max"] for t in TIER_LABELS])
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great-circle distance in km. Deviates less than 0.5 % from the geodesic distance.
+
+    Args:
+        lat1, lon1, lat2, lon2 (np.ndarray): Coordinates in degrees.
+
+    Returns:
+        np.ndarray: Distances in kilometers.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def generate_random_seed_trips(num_trips: int = NUM_TRIPS, seed=None) -> pd.DataFrame:
     """
     Generates a dataset of synthetic business trips across all tiers.
 
@@ -145,54 +142,115 @@ def generate_random_seed_trips():
         - meal costs are sampled from the tier-specific range,
         - distance and ticket costs are computed.
 
+    Args:
+        num_trips (int): Number of trips to generate.
+        seed (int | np.random.Generator | None): Seed or generator for reproducible data.
+
     Returns:
         pd.DataFrame: A DataFrame containing the generated trip records.
     """
-    rows = []
+    rng = np.random.default_rng(seed)
+    n = int(num_trips)
+    n_cities = len(ALL_CITIES)
 
-    for _ in range(NUM_TRIPS):
-        origin = random.choice(ALL_CITIES)
-        dest = random.choice([c for c in ALL_CITIES if c != origin])
+    origin_idx = rng.integers(0, n_cities, n)
+    # draw from all other cities: shift every index at or above the origin by one
+    dest_idx = rng.integers(0, n_cities - 1, n)
+    dest_idx += dest_idx >= origin_idx
 
-        duration_days = random.randint(1, 5)
-        tier_label = get_tier(dest)
-        base = TIER_BASELINES[tier_label]
+    duration_days = rng.integers(1, 6, n)
+    tier_codes = _CITY_TIER_CODES[dest_idx]
 
-        # Pick a random real scraped rate for the tier
-        nightly_hotel = random.choice(TIER_HOTEL_RATES[tier_label])
-        nightly_hotel *= random.uniform(0.95, 1.05)
+    # Pick a random real scraped rate for the tier
+    nightly_hotel = _HOTEL_RATES[tier_codes, rng.integers(0, _HOTEL_RATES.shape[1], n)]
+    nightly_hotel = nightly_hotel * rng.uniform(0.95, 1.05, n)
+    hotel_cost = np.round(nightly_hotel * duration_days, 2)
 
-        hotel_cost = round(nightly_hotel * duration_days, 2)
+    # meals
+    meals_per_day = np.round(rng.uniform(_MEALS_MIN[tier_codes], _MEALS_MAX[tier_codes]), 2)
+    meals_cost = np.round(meals_per_day * duration_days, 2)
 
-        # meals
-        meals_per_day = round(random.uniform(base["meals_min"], base["meals_max"]), 2)
-        meals_cost = round(meals_per_day * duration_days, 2)
+    distance_km = haversine_km(_CITY_LAT[origin_idx], _CITY_LON[origin_idx], _CITY_LAT[dest_idx], _CITY_LON[dest_idx])
 
-        try:
-            distance_km, ticket_cost = estimate_distance_and_ticket(origin, dest)
-        except ValueError as e:
-            print(f"Skipping trip {origin} -> {dest}: {e}")
-            continue
+    # Always round trip for seed data
+    ticket_cost = (BASE_FARE + PER_KM * distance_km) * 2
+
+    total_cost = hotel_cost + meals_cost + ticket_cost
+
+    cities = pd.Categorical.from_codes(np.arange(n_cities), categories=ALL_CITIES)
+    return pd.DataFrame({
+        "origin_city": cities.take(origin_idx),
+        "dest_city": cities.take(dest_idx),
+        "tier": TIER_LABELS[tier_codes],
+        "duration_days": duration_days,
+        "distance_km": np.round(distance_km, 2),
+        "hotel_cost": hotel_cost,
+        "meals_per_day": meals_per_day,
+        "meals_cost": meals_cost,
+        "ticket_cost": np.round(ticket_cost, 2),
+        "total_cost": np.round(total_cost, 2),
+    })
+
+
+def write_seed_trips(output_path, num_trips: int, chunk_size: int = CHUNK_SIZE, seed=None) -> int:
+    """
+    Generates num_trips trips in chunks and writes them to a CSV or Parquet file (by file suffix),
+    so the memory use is bounded by chunk_size rows.
 
-        total_cost = hotel_cost + meals_cost + ticket_cost
+    Args:
+        output_path (str | Path): Target file, ".parquet" writes Parquet (needs pyarrow), everything else CSV.
+        num_trips (int): Total number of trips.
+        chunk_size (int): Number of trips generated and written at once.
+        seed (int | None): Seed for reproducible data.
 
-        rows.append({
-            "origin_city": origin,
-            "dest_city": dest,
-            "tier": tier_label,
-            "duration_days": duration_days,
-            "distance_km": round(distance_km, 2),
-            "hotel_cost": round(hotel_cost, 2),
-            "meals_per_day": round(meals_per_day, 2),
-            "meals_cost": round(meals_cost, 2),
-            "ticket_cost": round(ticket_cost, 2),
-            "total_cost": round(total_cost, 2),
-        })
-    return pd.DataFrame(rows)
+    Returns:
+        int: Number of written rows.
+
+    Raises:
+        ValueError: If chunk_size is smaller than 1.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}.")
+    output_path = Path(output_path)
+    rng = np.random.default_rng(seed)
+    as_parquet = output_path.suffix.lower() == ".parquet"
+
+    writer = None
+    written = 0
+    try:
+        while written < num_trips:
+            df = generate_random_seed_trips(min(chunk_size, num_trips - written), seed=rng)
+            df["origin_city"] = df["origin_city"].astype(str)
+            df["dest_city"] = df["dest_city"].astype(str)
+
+            if as_parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                df.to_csv(output_path, mode="w" if written == 0 else "a", header=written == 0, index=False)
+            written += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return written
 
 
 if __name__ == "__main__":
-    df = generate_random_seed_trips()
-    output_path = "seed_trips.csv"
-    df.to_csv(output_path, index=False)
-    print(f"Wrote {len(df)} seed trips to {output_path}")
+    parser = argparse.ArgumentParser(description="Generate synthetic business trips.")
+    parser.add_argument("--rows", type=int, default=NUM_TRIPS, help="number of trips")
+    parser.add_argument("--out", default="seed_trips.csv", help="output file (.csv or .parquet)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows generated and written at once")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random generator")
+    args = parser.parse_args()
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    t0 = time.perf_counter()
+    n = write_seed_trips(args.out, args.rows, chunk_size=args.chunk_size, seed=args.seed)
+    print(f"Wrote {n} seed trips to {args.out} in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,197 @@
+"""
+tiers.py classifies Swiss cities into three cost tiers. It is used by the ML model (features) and by
+the seed data generator (hotel and meal prices).
+
+Lookups go through a normalized index, so "Zürich", "zurich", "ZURICH" and the alias "Zuerich" all map to Tier 1.
+Normalization removes diacritics, case, dots and hyphens. tier_of() classifies a whole pandas Series by looking up
+each distinct city once and mapping the categorical codes, so feature building on large training sets is one array
+operation. Optionally, a database table "city_tiers" (city, tier) can override or extend the built-in lists.
+Cities that are not listed in any tier are treated as Tier 3 by default.
+"""
+
+import threading
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+from settings import get_settings
+
+DEFAULT_TIER = "T3"
+TIER_TABLE = "city_tiers"
+TIER_TABLE_TTL_S = get_settings().tier_table_ttl_s
+
+# Tier 1 Cities: Swiss cities considered most expensive
+TIER_1_CITIES = {
+    "Zurich", "Geneva", "Basel", "Lausanne", "Zermatt", "St. Moritz",
+    "Davos", "Klosters", "Verbier", "Gstaad", "Andermatt", "Grindelwald",
+    "Wengen", "Mürren", "Saas-Fee", "Arosa", "Lenzerheide", "Flims", "Laax",
+    "Engelberg", "Crans-Montana", "Montreux", "Lucerne", "Ascona", "Zug"
+}
+
+# Tier 2 Cities: Swiss cities considered moderately expensive
+TIER_2_CITIES = {
+    "Bern", "Winterthur", "St. Gallen", "Biel", "Schaffhausen",
+    "Chur", "Thun", "Neuchâtel", "Fribourg", "Sion", "Brig", "Bellinzona",
+    "Interlaken", "Kloten", "Lugano", "Locarno",
+}
+
+# Tier 3 Cities: Swiss cities considered least expensive
+TIER_3_CITIES = {
+    "Solothurn", "Olten", "Rapperswil", "Uster", "Baden", "Wil", "Arbon",
+    "Romanshorn", "Spiez", "Steffisburg", "Villars-sur-Glâne", "Pfäffikon", "Wetzikon"
+}
+
+# German, French and Italian names as well as common spellings, mapped to the name used in the tier sets
+CITY_ALIASES = {
+    "Zürich": "Zurich", "Zuerich": "Zurich",
+    "Genf": "Geneva", "Genève": "Geneva", "Ginevra": "Geneva",
+    "Bâle": "Basel", "Basilea": "Basel",
+    "Luzern": "Lucerne", "Lucerna": "Lucerne",
+    "Sankt Moritz": "St. Moritz", "San Murezzan": "St. Moritz",
+    "Zoug": "Zug",
+    "Berne": "Bern", "Berna": "Bern",
+    "Sankt Gallen": "St. Gallen", "Saint-Gall": "St. Gallen",
+    "Biel/Bienne": "Biel", "Bienne": "Biel",
+    "Neuenburg": "Neuchâtel",
+    "Freiburg im Üechtland": "Fribourg",
+    "Sitten": "Sion",
+    "Bellenz": "Bellinzona",
+    "Lauis": "Lugano",
+    "Soleure": "Solothurn",
+    "Rapperswil-Jona": "Rapperswil",
+    "Muerren": "Mürren",
+}
+
+
+def normalize_city(name) -> str:
+    """
+    Normalizes a city name for lookups: strips diacritics, case, dots, hyphens and repeated whitespace
+    and writes "Sankt"/"Saint" as "st".
+
+    Args:
+        name (str): City name as entered by a user or stored in the database.
+
+    Returns:
+        str: The normalized key, e.g. "st moritz" for "St. Moritz". Empty string for missing names.
+    """
+    if not isinstance(name, str):
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    key = stripped.casefold().replace(".", " ").replace("-", " ").replace("/", " ")
+    words = key.split()
+    words = ["st" if w in ("sankt", "saint") else w for w in words]
+    return " ".join(words)
+
+
+def _build_index() -> dict:
+    """Builds the normalized lookup index from the tier sets and the aliases."""
+    index = {}
+    for tier, cities in (("T3", TIER_3_CITIES), ("T2", TIER_2_CITIES), ("T1", TIER_1_CITIES)):
+        for city in cities:
+            index[normalize_city(city)] = tier
+    for alias, city in CITY_ALIASES.items():
+        index[normalize_city(alias)] = index[normalize_city(city)]
+    return index
+
+
+_BUILTIN_INDEX = _build_index()
+_index = dict(_BUILTIN_INDEX)
+
+# optional database-backed overrides, loaded lazily on first lookup (see use_tier_table)
+_tier_table = {"engine": None, "loaded_at": None}
+_tier_table_lock = threading.Lock()
+
+
+def use_tier_table(engine):
+    """
+    Registers a SQLAlchemy engine whose table "city_tiers" (city, tier) extends or overrides the built-in tiers.
+    Nothing is queried here; the table is read on the next lookup and then every TIER_TABLE_TTL_S seconds.
+    If the table does not exist, only the built-in tiers are used.
+
+    Args:
+        engine: SQLAlchemy engine of the application database, or a function that returns it.
+
+    Returns:
+        None
+    """
+    _tier_table["engine"] = engine
+    _tier_table["loaded_at"] = None
+
+
+def refresh_tier_table():
+    """Reloads the database overrides immediately (e.g. after the city_tiers table was edited)."""
+    with _tier_table_lock:
+        _tier_table["loaded_at"] = None
+    _ensure_tier_table()
+
+
+def _ensure_tier_table():
+    """Loads the database overrides into the index if an engine is registered and the TTL expired."""
+    engine = _tier_table["engine"]
+    if engine is None:
+        return
+    loaded_at = _tier_table["loaded_at"]
+    if loaded_at is not None and time.monotonic() - loaded_at < TIER_TABLE_TTL_S:
+        return
+
+    global _index
+    with _tier_table_lock:
+        if _tier_table["loaded_at"] is not None and time.monotonic() - _tier_table["loaded_at"] < TIER_TABLE_TTL_S:
+            return
+        # set before querying, so a missing table does not trigger a query on every lookup
+        _tier_table["loaded_at"] = time.monotonic()
+        if callable(engine):
+            engine = engine()
+        try:
+            df = pd.read_sql_query(f"""
+                IF OBJECT_ID('{TIER_TABLE}', 'U') IS NOT NULL
+                    SELECT city, tier FROM {TIER_TABLE}
+                ELSE
+                    SELECT CAST(NULL AS NVARCHAR(100)) AS city, CAST(NULL AS CHAR(2)) AS tier WHERE 1 = 0
+            """, engine)
+        except Exception as e:
+            print(f"Could not load table '{TIER_TABLE}', using built-in tiers: {e}")
+            return
+
+        index = dict(_BUILTIN_INDEX)
+        for city, tier in zip(df["city"], df["tier"]):
+            key = normalize_city(city)
+            if key and tier in ("T1", "T2", "T3"):
+                index[key] = tier
+        _index = index
+
+
+def get_tier(city: str) -> str:
+    """
+    Determines the cost tier of a given city.
+
+    Args:
+        city (str): Name of the city, in any case, with or without diacritics, or one of its aliases.
+
+    Returns:
+        str: The tier label ("T1", "T2", or "T3"); unknown cities are Tier 3.
+    """
+    _ensure_tier_table()
+    return _index.get(normalize_city(city), DEFAULT_TIER)
+
+
+def tier_of(cities: pd.Series) -> pd.Series:
+    """
+    Vectorized tier classification of a Series of city names.
+
+    Each distinct city is normalized and looked up once; the result is spread to all rows
+    through the categorical codes (missing names get code -1 and therefore the default tier).
+
+    Args:
+        cities (pd.Series): City names.
+
+    Returns:
+        pd.Series: Tier labels with the same index as cities.
+    """
+    _ensure_tier_table()
+    cat = pd.Categorical(cities)
+    # last element is picked by code -1 (missing values)
+    lookup = np.array([_index.get(normalize_city(c), DEFAULT_TIER) for c in cat.categories] + [DEFAULT_TIER], dtype=object)
+    return pd.Series(lookup[cat.codes], index=cities.index, name="tier")
@@ -4,10 +4,15 @@ imported from db_functions_users.py."""
 import streamlit as st
 import pandas as pd
 from db.db_functions_users import register_user_dropdown_admin, edit_user_dropdown_admin, get_users_under_me, del_user_dropdown_admin
+from db.bulk_users import bulk_user_dropdown
+from db.export import export_dropdown
+from db.query_log import query_stats_panel
 from utils import hide_sidebar, logout 
+from tracing import start_trace, trace_panel
 
 
 st.set_page_config(page_title="Admin Dashboard", layout="wide")
+start_trace("admin")
 hide_sidebar()
 left2, right2 = st.columns([5, 1], gap="large")
 with left2:
@@ -21,6 +26,8 @@ if "role" not in st.session_state or st.session_state["role"] != "Administrator"
     st.stop()
 
 
+st.page_link("pages/analytics_overview.py", label="Cost analytics", icon="📊")
+
 left, right = st.columns([4, 2], gap="large")
 with left:
     st.subheader("Table")
@@ -35,5 +42,12 @@ with left:
 with right:
     st.subheader("User Management")
     register_user_dropdown_admin()
+    bulk_user_dropdown(admin=True)
     edit_user_dropdown_admin(title="Edit user")
     del_user_dropdown_admin()
+    st.subheader("Export")
+    export_dropdown(admin=True)
+    st.subheader("Performance")
+    query_stats_panel()
+
+trace_panel()
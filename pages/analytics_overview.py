@@ -0,0 +1,84 @@
+"""analytics_overview.py contains the cost analytics page for managers (their team) and admins (all teams).
+The spend is read from the precomputed summary of analytics.py, not from the expense reports."""
+
+import streamlit as st
+from db.analytics import create_summary_tables, load_summary, last_refresh, refresh_expense_summary, start_summary_scheduler
+from utils import hide_sidebar, logout
+from tracing import start_trace, trace_panel
+
+st.set_page_config(page_title="Cost Analytics", layout="wide")
+start_trace("analytics")
+hide_sidebar()
+left2, right2 = st.columns([5, 1], gap="large")
+with left2:
+    st.title("Cost Analytics")
+with right2:
+    logout()
+
+# Access control, so only managers and admins can access this page
+role = st.session_state.get("role")
+if role not in ("Manager", "Administrator"):
+    st.error("Access denied. Please log in as Manager or Administrator.")
+    st.stop()
+
+back = "pages/admin_overview.py" if role == "Administrator" else "pages/manager_overview.py"
+st.page_link(back, label="Back to the dashboard", icon="⬅️")
+
+create_summary_tables()
+# the summary is refreshed in the background, new expense reports show up after at most one interval
+start_summary_scheduler()
+
+if role == "Administrator":
+    df = load_summary()
+    teams = sorted(df["manager"].unique())
+    selected = st.multiselect("Teams", teams, placeholder="All teams")
+    if selected:
+        df = df[df["manager"].isin(selected)]
+else:
+    df = load_summary(int(st.session_state["user_ID"]))
+
+refreshed_at = last_refresh()
+info, button = st.columns([5, 1])
+info.caption(f"Summary refreshed at {refreshed_at:%Y-%m-%d %H:%M} UTC" if refreshed_at is not None
+             else "The summary has not been refreshed yet.")
+if role == "Administrator" and button.button("Refresh now"):
+    with st.spinner("Refreshing summary..."):
+        result = refresh_expense_summary()
+    if result is None:
+        st.toast("A refresh is already running.")
+    else:
+        st.toast(f"Added {result['summarized']} expense reports.")
+        st.rerun()
+
+if df.empty:
+    st.info("No expense reports yet.")
+    st.stop()
+
+total = df["total_cost"].sum()
+reports = int(df["expenses"].sum())
+m1, m2, m3 = st.columns(3)
+m1.metric("Total spend", f"CHF {total:,.2f}")
+m2.metric("Expense reports", f"{reports:,}")
+m3.metric("Average per report", f"CHF {total / reports:,.2f}")
+
+st.subheader("Spend per month")
+st.bar_chart(df.groupby("month")["total_cost"].sum(), y_label="CHF")
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("Spend per tier")
+    st.bar_chart(df.groupby("tier")["total_cost"].sum(), y_label="CHF")
+with col2:
+    st.subheader("Spend per team")
+    st.bar_chart(df.groupby("manager")["total_cost"].sum(), y_label="CHF")
+
+st.subheader("Spend per destination")
+by_city = (
+    df.groupby(["dest_city", "tier"], as_index=False)
+    .agg(expenses=("expenses", "sum"), total_cost=("total_cost", "sum"), total_days=("total_days", "sum"))
+    .sort_values("total_cost", ascending=False)
+)
+by_city["cost_per_day"] = (by_city["total_cost"] / by_city["total_days"].where(by_city["total_days"] > 0)).round(2)
+st.dataframe(by_city, hide_index=True, width="stretch")
+
+trace_panel()
@@ -3,11 +3,18 @@ imported from db_functions_users.py, db_functions_trips.py and create_trip_dropd
 
 import streamlit as st
 from db.db_functions_users import register_user_dropdown, del_user_dropdown, edit_user_dropdown
-from db.db_functions_trips import del_trip_dropdown, create_trip_table, create_trip_users_table, trip_list_view, past_trip_list_view, del_trip_forever
+from db.db_functions_trips import del_trip_dropdown, create_trip_table, create_trip_users_table, trip_list_view, past_trip_list_view
+from db.maintenance import start_scheduler
 from db.create_trip_dropdown import create_trip_dropdown
+from db.bulk_import import bulk_import_dropdown
+from db.bulk_users import bulk_user_dropdown
+from db.export import export_dropdown
+from db.carpool import carpool_dropdown
 from utils import logout, hide_sidebar
+from tracing import start_trace, trace_panel
 
 st.set_page_config(page_title="Manager Overview", layout="wide")
+start_trace("manager")
 hide_sidebar()
 left2, right2 = st.columns([5, 1], gap="large")
 with left2:
@@ -18,16 +25,22 @@ with right2:
 create_trip_table()
 create_trip_users_table()
 
+# archival and purge of old trips run in the background, not during the page render
+start_scheduler()
+
 # Access control, so only managers can access this page
 if "role" not in st.session_state or st.session_state["role"] != "Manager":
     st.error("Access denied. Please log in as Manager.")
     st.stop()
 
+st.page_link("pages/analytics_overview.py", label="Cost analytics", icon="📊")
+
 left, right = st.columns([4, 2], gap="large")
 
 with right:
     st.subheader("User-Management")
     register_user_dropdown()
+    bulk_user_dropdown()
     edit_user_dropdown()
     del_user_dropdown()
 
@@ -35,7 +48,11 @@ with left:
     st.subheader("Trip-Overview")
     trip_list_view()
     past_trip_list_view()
-    del_trip_forever()
     st. subheader("Trip-Management")
     create_trip_dropdown()
+    carpool_dropdown()
+    bulk_import_dropdown()
     del_trip_dropdown()
+    export_dropdown()
+
+trace_panel()
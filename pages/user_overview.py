@@ -5,8 +5,10 @@ import streamlit as st
 from db.db_functions_users import edit_own_profile
 from db.db_functions_employees import employee_listview, past_trip_view_employee
 from utils import logout, hide_sidebar
+from tracing import start_trace, trace_panel
 
 st.set_page_config(page_title="User Dashboard", layout="wide")
+start_trace("employee")
 left2, right2 = st.columns([5, 1], gap="large")
 with left2:
     st.title("Employee Dashboard")
@@ -28,3 +30,5 @@ with left:
 
 with right:
     edit_own_profile()
+
+trace_panel()
@@ -0,0 +1,204 @@
+"""settings.py contains the configuration of the app, read once per process into a typed Settings object that all
+modules share via get_settings().
+
+Sources, the first one that sets a value wins:
+
+1. environment variables with the upper-case name of the setting, e.g. DB_POOL_SIZE=20 or SLOW_QUERY_MS=250,
+2. the section [settings] of the Streamlit secrets with the same upper-case names,
+3. the defaults below.
+
+The database credentials come from [azure_db] of the secrets (SERVER_NAME, DATABASE_NAME, USERNAME, PASSWORD and
+optionally DRIVER and TRUST_SERVER_CERTIFICATE), the API keys from GOOGLE_API_KEY and MEDIASTACK_API_KEY (the
+latter also from the environment; without it the news widget is hidden) and the password of the first
+administrator from [dummy] ADMIN. The login page refuses to create the first administrator without this password.
+
+Example for a deployment with more concurrent sessions, in .streamlit/secrets.toml:
+
+    [settings]
+    DB_POOL_SIZE = 20
+    DB_MAX_OVERFLOW = 20
+    QUERY_CACHE_TTL_S = 120
+    EXPENSE_SUMMARY_IN_APP = false
+"""
+
+import os
+from dataclasses import dataclass, field, fields
+from functools import cache
+from pathlib import Path
+
+import streamlit as st
+
+APP_ROOT = Path(__file__).resolve().parent
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """Connection data of the Azure SQL database."""
+
+    server: str = ""
+    database: str = ""
+    username: str = ""
+    password: str = field(default="", repr=False)
+    driver: str = "ODBC Driver 17 for SQL Server"
+    # "yes" e.g. for a local SQL Server with a self-signed certificate (benchmarks/)
+    trust_server_certificate: str = "no"
+
+    @property
+    def connection_string(self) -> str:
+        """The ODBC connection string for pyodbc.connect() and create_logged_engine()."""
+        return (
+            f"DRIVER={{{self.driver}}};"
+            f"SERVER={self.server};"
+            f"DATABASE={self.database};"
+            f"UID={self.username};"
+            f"PWD={self.password};"
+            "Encrypt=yes;"
+            f"TrustServerCertificate={self.trust_server_certificate};"
+        )
+
+
+@dataclass(frozen=True)
+class Settings:
+    """All settings of the app; every field except db and the secrets can be overridden by name (see above)."""
+
+    db: DatabaseSettings = field(default_factory=DatabaseSettings)
+    google_api_key: str = field(default="", repr=False)
+    mediastack_api_key: str = field(default="", repr=False)  # empty: no news widget
+    admin_password: str = field(default="", repr=False)
+
+    # connection pool of the shared SQLAlchemy engine (db/query_log.py get_engine()); pool_size + max_overflow is
+    # the maximum number of concurrent queries of one process
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_s: float = 30
+    # Azure SQL closes idle connections after 30 minutes
+    db_pool_recycle_s: int = 1800
+
+    # caches
+    query_cache_ttl_s: float = 300
+    query_cache_max_entries: int = 256
+    roles_ttl_s: float = 3600
+    tier_table_ttl_s: float = 3600
+    prediction_cache_size: int = 4096
+
+    # external services
+    http_timeout_s: float = 10
+    nominatim_min_interval_s: float = 1.0
+    directions_cache_ttl_s: float = 3600
+
+    # pages and bulk operations
+    page_size: int = 10
+    export_chunk_rows: int = 10_000
+    password_hash_workers: int = 4  # threads per bulk upload, at most the number of cores
+
+    # background jobs, switch them off in the app if they run as separate processes
+    trip_maintenance_in_app: bool = True
+    maintenance_interval_s: float = 6 * 3600
+    # retention of db/maintenance.py, in days after the end of a trip; 0: off
+    archive_after_days: int = 0           # hide from the manager lists (off by default)
+    archive_employee_after_days: int = 0  # hide from the employee lists, also ends the expense wizard of the trip
+    purge_after_days: int = 365           # delete trips that a manager archived by hand
+    expense_summary_in_app: bool = True
+    summary_refresh_interval_s: float = 300
+    summary_batch_rows: int = 50_000
+
+    # observability
+    slow_query_ms: float = 500
+    query_log_file: str = ""  # e.g. logs/query_log.jsonl; empty: no log file
+    trace_panel: bool = False
+    trace_dir: str = ""
+
+
+_SECRET_FIELDS = ("db", "google_api_key", "mediastack_api_key", "admin_password")
+
+
+def _secrets_section(name: str) -> dict:
+    """Returns a section of the Streamlit secrets, an empty dict if it or the secrets file does not exist."""
+    try:
+        return dict(st.secrets.get(name, {}))
+    except FileNotFoundError:
+        return {}
+
+
+def _secret(name: str, default: str = "") -> str:
+    """Returns a top-level value of the Streamlit secrets."""
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:
+        return default
+
+
+def _convert(name: str, raw, type_):
+    """Converts a value from the environment or the secrets to the type of the setting.
+
+    Raises:
+        ValueError: If the value cannot be converted.
+    """
+    if type_ is bool:
+        if isinstance(raw, bool):
+            return raw
+        value = str(raw).strip().lower()
+        if value in ("1", "true", "yes", "on"):
+            return True
+        if value in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"Setting {name.upper()}: expected true or false, got {raw!r}")
+    try:
+        return type_(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"Setting {name.upper()}: expected {type_.__name__}, got {raw!r}") from None
+
+
+def load_settings() -> Settings:
+    """Reads the settings from the environment, the secrets and the defaults (see above).
+
+    Args:
+        None
+
+    Returns:
+        Settings: The settings.
+
+    Raises:
+        ValueError: If an override has the wrong type.
+    """
+    azure_db = _secrets_section("azure_db")
+    db_defaults = DatabaseSettings()
+    db = DatabaseSettings(
+        server=azure_db.get("SERVER_NAME", ""),
+        database=azure_db.get("DATABASE_NAME", ""),
+        username=azure_db.get("USERNAME", ""),
+        password=azure_db.get("PASSWORD", ""),
+        driver=azure_db.get("DRIVER", db_defaults.driver),
+        trust_server_certificate=azure_db.get("TRUST_SERVER_CERTIFICATE", db_defaults.trust_server_certificate),
+    )
+
+    overrides = _secrets_section("settings")
+    values = {}
+    for f in fields(Settings):
+        if f.name in _SECRET_FIELDS:
+            continue
+        key = f.name.upper()
+        raw = os.environ.get(key, overrides.get(key))
+        if raw is not None:
+            values[f.name] = _convert(f.name, raw, f.type)
+
+    return Settings(
+        db=db,
+        google_api_key=_secret("GOOGLE_API_KEY"),
+        mediastack_api_key=os.environ.get("MEDIASTACK_API_KEY") or _secret("MEDIASTACK_API_KEY"),
+        admin_password=_secrets_section("dummy").get("ADMIN", ""),
+        **values,
+    )
+
+
+@cache
+def get_settings() -> Settings:
+    """Returns the settings of this process; they are read on the first call only.
+
+    Args:
+        None
+
+    Returns:
+        Settings: The shared settings.
+    """
+    return load_settings()
@@ -0,0 +1,234 @@
+"""tracing.py contains a lightweight tracing layer to find out where the seconds of a page render go.
+
+Slow steps are wrapped in span() or decorated with @traced: database connects and queries ("db"), calls of
+external services ("http": Nominatim, Open-Meteo, Google, SBB, Mediastack) and the ML model ("ml"). Every span
+records its start and duration relative to the start of the current Streamlit run. Pages call start_trace() at
+the top, which starts a new trace for the run, and trace_panel() at the bottom, which shows the spans as a
+waterfall. Fragment reruns add their spans to the trace of the last full run.
+
+The panel is shown to administrators, and on every page if the setting TRACE_PANEL is on (see settings.py). A
+trace can be downloaded as JSON in the Chrome trace event format (chrome://tracing, https://ui.perfetto.dev); if
+TRACE_DIR is set, every trace shown in the panel is also written to that directory.
+
+Outside a Streamlit run (command line tools, background threads) spans cost almost nothing and are not recorded.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from settings import get_settings
+
+SPAN_KINDS = ("db", "http", "ml", "app")
+# longest span label in the panel and the JSON file, SQL texts are cut
+MAX_LABEL = 120
+MAX_SPANS = 2_000
+
+
+def _trace():
+    """Returns the trace of the current run, None outside a Streamlit run."""
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    return st.session_state.get("_trace")
+
+
+def start_trace(page: str):
+    """Starts a new trace for the current run of a page. Call it at the top of every page.
+
+    Args:
+        page (str): Name of the page, shown in the panel.
+
+    Returns:
+        None
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return
+    st.session_state["_trace"] = {
+        "page": page,
+        "started_at": time.time(),
+        "t0": time.perf_counter(),
+        "spans": [],
+        "depth": 0,
+    }
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """Records the duration of the enclosed block as a span of the current trace.
+
+    Args:
+        kind (str): One of SPAN_KINDS.
+        name (str): What is done, e.g. "GET nominatim search" or the first line of a query.
+        **attrs: Further details shown in the panel (e.g. rows=12).
+
+    Yields:
+        dict: The attributes of the span; the block can add entries, e.g. the number of rows returned.
+    """
+    trace = _trace()
+    if trace is None:
+        yield attrs
+        return
+
+    start = time.perf_counter()
+    depth = trace["depth"]
+    trace["depth"] = depth + 1
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        trace["depth"] = depth
+        if len(trace["spans"]) < MAX_SPANS:
+            trace["spans"].append({
+                "kind": kind,
+                "name": " ".join(str(name).split())[:MAX_LABEL],
+                "start_ms": (start - trace["t0"]) * 1000,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+                "depth": depth,
+                "thread": threading.current_thread().name,
+                "error": error,
+                "attrs": {key: str(value)[:MAX_LABEL] for key, value in attrs.items()},
+            })
+
+
+def traced(kind: str, name: str | None = None):
+    """Decorator that records every call of a function as a span.
+
+    Args:
+        kind (str): One of SPAN_KINDS.
+        name (str | None): Label of the span, default: module.function.
+
+    Returns:
+        The decorator.
+    """
+    def decorator(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_to_json(trace: dict) -> str:
+    """Converts a trace to the Chrome trace event format.
+
+    Args:
+        trace (dict): A trace as started by start_trace().
+
+    Returns:
+        str: The JSON document.
+    """
+    pid = os.getpid()
+    events = [{
+        "name": s["name"],
+        "cat": s["kind"],
+        "ph": "X",
+        "ts": round(s["start_ms"] * 1000),
+        "dur": round(s["duration_ms"] * 1000),
+        "pid": pid,
+        "tid": s["thread"],
+        "args": {**s["attrs"], **({"error": s["error"]} if s["error"] else {})},
+    } for s in trace["spans"]]
+    return json.dumps({
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"page": trace["page"], "started_at": trace["started_at"]},
+    })
+
+
+def write_trace(trace: dict, directory: str) -> Path:
+    """Writes a trace as JSON file to a directory.
+
+    Args:
+        trace (dict): A trace as started by start_trace().
+        directory (str): Target directory, created if missing.
+
+    Returns:
+        Path: The written file.
+    """
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(trace["started_at"]))
+    file = path / f"trace-{trace['page']}-{stamp}-{int(trace['started_at'] * 1000) % 1000:03d}.json"
+    file.write_text(trace_to_json(trace), encoding="utf-8")
+    return file
+
+
+def trace_panel():
+    """Shows the spans of the current run as a waterfall, for administrators or if TRACE_PANEL is on.
+    Call it at the bottom of every page, after all other elements.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    trace = _trace()
+    if trace is None:
+        return
+    if st.session_state.get("role") != "Administrator" and not get_settings().trace_panel:
+        return
+
+    # copy, the spans of the panel itself are not part of the trace
+    trace = {**trace, "spans": list(trace["spans"])}
+    total_ms = (time.perf_counter() - trace["t0"]) * 1000
+    spans = trace["spans"]
+
+    with st.expander(f"Trace: {total_ms:,.0f} ms, {len(spans)} spans", expanded=False):
+        if not spans:
+            st.caption("No spans recorded in this run.")
+            return
+
+        import pandas as pd
+        import plotly.graph_objects as go
+
+        df = pd.DataFrame(spans)
+        totals = df[df["depth"] == 0].groupby("kind")["duration_ms"].sum()
+        cols = st.columns(len(SPAN_KINDS) + 1)
+        cols[0].metric("Run", f"{total_ms:,.0f} ms")
+        for col, kind in zip(cols[1:], SPAN_KINDS):
+            col.metric(kind, f"{totals.get(kind, 0):,.0f} ms")
+
+        df = df.sort_values("start_ms").reset_index(drop=True)
+        labels = [f"{i + 1}. {'  ' * d}{n}" for i, (d, n) in enumerate(zip(df["depth"], df["name"]))]
+        fig = go.Figure()
+        for kind in SPAN_KINDS:
+            mask = df["kind"] == kind
+            if mask.any():
+                fig.add_trace(go.Bar(
+                    y=[labels[i] for i in df.index[mask]],
+                    x=df.loc[mask, "duration_ms"],
+                    base=df.loc[mask, "start_ms"],
+                    orientation="h",
+                    name=kind,
+                    hovertemplate="%{y}<br>start %{base:.1f} ms, %{x:.1f} ms<extra></extra>",
+                ))
+        fig.update_layout(
+            barmode="overlay",
+            height=min(120 + 22 * len(df), 2_000),
+            xaxis_title="ms since start of the run",
+            yaxis={"autorange": "reversed", "categoryorder": "array", "categoryarray": labels},
+            margin={"l": 10, "r": 10, "t": 10, "b": 10},
+        )
+        st.plotly_chart(fig, width="stretch")
+
+        slowest = df.nlargest(10, "duration_ms")[["kind", "name", "start_ms", "duration_ms", "attrs"]]
+        st.dataframe(slowest.round(1), hide_index=True)
+
+        st.download_button("Download trace (JSON)", trace_to_json(trace), mime="application/json",
+                           file_name=f"trace-{trace['page']}.json", key="trace_download")
+        if get_settings().trace_dir:
+            st.caption(f"Written to {write_trace(trace, get_settings().trace_dir)}")
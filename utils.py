@@ -1,7 +1,5 @@
-"""utils.py contains utility functions for the Streamlit application, including user logout,
-hiding the sidebar, and loading secrets based on the operating system."""
-
-import platform
+"""utils.py contains utility functions for the Streamlit application, including user logout and
+hiding the sidebar. The secrets and all other configuration are read by settings.py."""
 
 def logout():
     """Logs out the user and redirects to main.py.
@@ -53,21 +51,4 @@ def hide_sidebar():
     """
     st.markdown(hide_sidebar_css, unsafe_allow_html=True)
 
-def load_secrets():
-    SERVER_NAME = st.secrets["azure_db"]["SERVER_NAME"]
-    DATABASE_NAME = st.secrets["azure_db"]["DATABASE_NAME"]
-    USERNAME = st.secrets["azure_db"]["USERNAME"]
-    PASSWORD = st.secrets["azure_db"]["PASSWORD"]
-    
-    CONNECTION_STRING = (
-        'DRIVER={ODBC Driver 17 for SQL Server};'
-        f'SERVER={SERVER_NAME};'
-        f'DATABASE={DATABASE_NAME};'
-        f'UID={USERNAME};'
-        f'PWD={PASSWORD};'
-        'Encrypt=yes;'  
-        'TrustServerCertificate=no;'
-    )
-    return CONNECTION_STRING
-
    